@@ -9,6 +9,7 @@ from flask_login import LoginManager, current_user
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import config
 
 # Inicialização das extensões
@@ -43,6 +44,11 @@ def create_app(config_name='default'):
     # Carrega a configuração correta (development, testing, etc.)
     app.config.from_object(config[config_name])
 
+    # Atrás de proxy reverso, request.remote_addr passa a ser o cliente informado pelos
+    # PROXY_FIX_X_FOR proxies confiáveis (ver config.py)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
     # Associa as extensões à instância do app
     db.init_app(app)
     migrate.init_app(app, db)
@@ -52,12 +58,31 @@ def create_app(config_name='default'):
 
     app.jinja_env.filters['localtime'] = format_datetime_local
 
-    from .models import Usuario
+    from .cache_usuarios import init_cache_usuarios, carregar_usuario
+    init_cache_usuarios(app)
+
+    from .busca import init_busca
+    init_busca(app)
+
+    from .email import init_fila_emails
+    init_fila_emails(app)
+
+    from .ad_diretorio import init_diretorio_ad
+    init_diretorio_ad(app)
+
+    from .limite_login import init_limitador_login
+    init_limitador_login(app)
+
+    from .armazenamento import init_armazenamento
+    init_armazenamento(app)
+
+    from .ad_espelho import init_espelho_ad
+    init_espelho_ad(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        # AVISO DE LEGADO: A forma moderna é db.session.get(Usuario, int(user_id))
-        return db.session.get(Usuario, int(user_id))
+        # Usuário, funcionário e permissões vêm de um cache com TTL curto (ver cache_usuarios.py)
+        return carregar_usuario(int(user_id))
 
     # --- Registro dos Blueprints ---
     from .routes import main as main_blueprint
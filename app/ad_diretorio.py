@@ -0,0 +1,144 @@
+# app/ad_diretorio.py
+
+import ssl
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from ldap3 import Server, Connection, ALL, SYNC, Tls
+from ldap3.core.exceptions import LDAPBindError, LDAPException
+from ldap3.utils.conv import escape_filter_chars
+
+ATRIBUTOS_LOGIN = ['cn', 'mail', 'sAMAccountName']
+
+
+def dominio_de_base_dn(base_dn):
+    """'DC=mdr,DC=local' -> 'mdr.local' (só os componentes DC, na ordem)."""
+    if not base_dn:
+        return ''
+    partes = [rdn.split('=', 1) for rdn in base_dn.split(',') if '=' in rdn]
+    return '.'.join(valor.strip() for chave, valor in partes if chave.strip().upper() == 'DC')
+
+
+class DiretorioAD:
+    """
+    Configuração do AD interpretada uma única vez na inicialização do app: DNs base, domínio
+    derivado do LDAP_BASE_DN e o objeto Server compartilhado. O schema e as informações do DSA
+    são lidos no primeiro bind e ficam guardados no Server, então os binds seguintes (pool da
+    conta de serviço e logins) não repetem essa leitura.
+
+    Os atributos lidos no login (cn/mail/sAMAccountName) ficam em um cache LRU com TTL por
+    username: enquanto válidos, o login é só o bind, que continua validando a senha no AD.
+    """
+
+    def __init__(self, config, servidor=None, estrategia=SYNC):
+        self.host = config.get('LDAP_HOST')
+        self.porta = int(config['LDAP_PORT']) if config.get('LDAP_PORT') else None
+        self.base_dn = config.get('LDAP_BASE_DN') or ''
+        self.users_dn = config.get('LDAP_USERS_DN') or ''
+        self.dominio = dominio_de_base_dn(self.base_dn)
+        self.formato_bind = config.get('LDAP_FORMATO_BIND') or '{username}@{dominio}'
+        self.estrategia = estrategia
+        self._servidor = servidor
+        self._lock = threading.Lock()
+        self.ttl_atributos = config.get('LOGIN_CACHE_ATRIBUTOS_TTL', 300)
+        self.tamanho_cache_atributos = config.get('LOGIN_CACHE_ATRIBUTOS_TAMANHO', 4096)
+        self._atributos = OrderedDict()  # username em minúsculas -> (expira_em, dados)
+        self._lock_atributos = threading.Lock()
+
+    @property
+    def servidor(self):
+        if self._servidor is None and not self.host:
+            raise LDAPException("LDAP_HOST não configurado.")
+        if self._servidor is None:
+            with self._lock:
+                if self._servidor is None:
+                    self._servidor = Server(self.host, port=self.porta, get_info=ALL,
+                                            use_ssl=True, tls=Tls(validate=ssl.CERT_NONE))
+        return self._servidor
+
+    def upn(self, username):
+        return f'{username}@{self.dominio}'
+
+    def conectar(self, usuario, senha, estrategia=None):
+        """Abre e autentica uma conexão; só o primeiro bind do processo lê schema/DSE."""
+        servidor = self.servidor
+        conexao = Connection(servidor, user=usuario, password=senha, client_strategy=estrategia or self.estrategia)
+        conexao.open()
+        if not conexao.bind(read_server_info=servidor.info is None and servidor.schema is None):
+            erro = conexao.result.get('description') or conexao.last_error
+            conexao.unbind()
+            raise LDAPBindError(f"Falha no bind de '{usuario}': {erro}")
+        return conexao
+
+    # --- Cache dos atributos do login ---
+
+    def _atributos_em_cache(self, username):
+        chave = username.lower()
+        with self._lock_atributos:
+            entrada = self._atributos.get(chave)
+            if entrada is None:
+                return None
+            expira_em, dados = entrada
+            if expira_em < time.monotonic():
+                del self._atributos[chave]
+                return None
+            self._atributos.move_to_end(chave)
+            return dados
+
+    def _guardar_atributos(self, username, dados):
+        if self.ttl_atributos <= 0:
+            return
+        with self._lock_atributos:
+            self._atributos[username.lower()] = (time.monotonic() + self.ttl_atributos, dados)
+            self._atributos.move_to_end(username.lower())
+            while len(self._atributos) > self.tamanho_cache_atributos:
+                self._atributos.popitem(last=False)
+
+    def invalidar_atributos(self, username=None):
+        """Descarta os atributos de um username (ou de todos) após alterações no AD."""
+        with self._lock_atributos:
+            if username is None:
+                self._atributos.clear()
+            else:
+                self._atributos.pop(username.lower(), None)
+
+    def autenticar(self, username, senha):
+        """
+        Valida usuário e senha com um bind e busca cn/mail/sAMAccountName (uma busca, dispensada
+        quando os atributos estão no cache). Retorna um dicionário com 'nome', 'email' e
+        'username'; lança LDAPException em caso de falha.
+        """
+        conexao = self.conectar(self.formato_bind.format(username=username, dominio=self.dominio), senha)
+        try:
+            dados = self._atributos_em_cache(username)
+            if dados is not None:
+                return dict(dados)
+            conexao.search(
+                search_base=self.base_dn,
+                search_filter=f'(&(objectClass=person)(sAMAccountName={escape_filter_chars(username)}))',
+                attributes=ATRIBUTOS_LOGIN
+            )
+            if not conexao.entries:
+                raise LDAPException(f"Usuário {username} autenticado, mas não foi possível buscar seus dados no AD.")
+            entrada = conexao.entries[0]
+            dados = {
+                'nome': entrada.cn.value,
+                'email': entrada.mail.value if entrada.mail else self.upn(username),
+                'username': entrada.sAMAccountName.value,
+            }
+            self._guardar_atributos(username, dados)
+            return dict(dados)
+        finally:
+            conexao.unbind()
+
+
+def get_diretorio_ad():
+    return current_app.extensions['diretorio_ad']
+
+
+def init_diretorio_ad(app, servidor=None, estrategia=SYNC):
+    app.extensions['diretorio_ad'] = DiretorioAD(app.config, servidor=servidor, estrategia=estrategia)
+    # O pool da conta de serviço usa o mesmo Server; é recriado no próximo uso
+    app.extensions.pop('pool_ad', None)
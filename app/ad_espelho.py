@@ -0,0 +1,378 @@
+# app/ad_espelho.py
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import current_app
+from ldap3 import BASE, SUBTREE
+from ldap3.core.exceptions import LDAPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .ad_sync import get_ad_connection, liberar_conexao_ad
+from .importacao import insert_ignorando_conflitos
+from .models import UsuarioADEspelho, EstadoEspelhoAD
+
+# Contas de pessoas (objetos 'computer' também são da classe 'user' no AD)
+FILTRO_USUARIOS = '(&(objectClass=person)(objectClass=user)(!(objectClass=computer)))'
+ATRIBUTOS = ['objectGUID', 'sAMAccountName', 'displayName', 'mail', 'userAccountControl', 'uSNChanged', 'isDeleted']
+# LDAP_SERVER_SHOW_DELETED_OID: inclui os tombstones, para que exclusões também cheguem no delta
+CONTROLES_DELTA = [('1.2.840.113556.1.4.417', True, None)]
+TAMANHO_PAGINA = 500
+
+
+class EspelhoADIndisponivel(Exception):
+    """O espelho nunca foi sincronizado."""
+
+
+@dataclass
+class ResultadoSincronizacao:
+    completa: bool
+    inseridos: int = 0
+    atualizados: int = 0
+    removidos: int = 0
+    usn_maximo: int = 0
+    duracao: float = 0.0
+
+    @property
+    def alteracoes(self):
+        return self.inseridos + self.atualizados + self.removidos
+
+
+# --- Leitura das entradas do AD ---
+
+def _valor(atributos, nome):
+    valor = atributos.get(nome)
+    if isinstance(valor, list):
+        return valor[0] if valor else None
+    return valor
+
+
+def _guid(entrada):
+    bruto = entrada.get('raw_attributes', {}).get('objectGUID')
+    if bruto and len(bruto[0]) == 16:
+        return str(uuid.UUID(bytes_le=bruto[0]))
+    return str(_valor(entrada['attributes'], 'objectGUID') or '').strip('{}').lower() or None
+
+
+def _para_inteiro(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _excluido(atributos):
+    return str(_valor(atributos, 'isDeleted')).upper() == 'TRUE'
+
+
+def _dados_da_entrada(entrada, agora):
+    """Colunas do espelho (exceto object_guid) a partir de uma entrada de busca do AD."""
+    atributos = entrada['attributes']
+    return {
+        'sam_account_name': _valor(atributos, 'sAMAccountName') or '',
+        'display_name': _valor(atributos, 'displayName'),
+        'mail': _valor(atributos, 'mail'),
+        'user_account_control': _para_inteiro(_valor(atributos, 'userAccountControl')),
+        'usn_changed': _para_inteiro(_valor(atributos, 'uSNChanged')) or 0,
+        'distinguished_name': entrada.get('dn'),
+        'atualizado_em': agora,
+    }
+
+
+def _estado_do_diretorio(conn):
+    """Lê highestCommittedUSN e dnsHostName do rootDSE (None quando o servidor não expõe)."""
+    try:
+        conn.search('', '(objectClass=*)', search_scope=BASE, attributes=['highestCommittedUSN', 'dnsHostName'])
+    except LDAPException:
+        return None, None
+    if not conn.entries:
+        return None, None
+    atributos = conn.entries[0].entry_attributes_as_dict
+    return _para_inteiro(_valor(atributos, 'highestCommittedUSN')), _valor(atributos, 'dnsHostName')
+
+
+def _buscar_paginado(conn, filtro, controles=None):
+    return conn.extend.standard.paged_search(
+        search_base=current_app.config['LDAP_BASE_DN'],
+        search_filter=filtro,
+        search_scope=SUBTREE,
+        attributes=ATRIBUTOS,
+        controls=controles,
+        paged_size=TAMANHO_PAGINA,
+        generator=True
+    )
+
+
+# --- Sincronização ---
+
+def _estado_bloqueado():
+    """
+    Linha única de estado, criada se preciso (INSERT ... ON CONFLICT DO NOTHING) e lida com
+    FOR UPDATE: duas sincronizações simultâneas (dois servidores, cron sobreposto) são
+    serializadas aqui, em vez de disputarem os mesmos GUIDs.
+    """
+    db.session.execute(insert_ignorando_conflitos(EstadoEspelhoAD.__table__).values(id=1, usn_maximo=0, geracao=0))
+    return db.session.query(EstadoEspelhoAD).filter_by(id=1).with_for_update().one()
+
+
+def _gravar_novas(contas):
+    """
+    INSERT das contas novas com ON CONFLICT (object_guid) DO UPDATE: uma conta que outro
+    processo acabou de inserir é atualizada, em vez de derrubar a sincronização com IntegrityError.
+    """
+    if not contas:
+        return
+    tabela = UsuarioADEspelho.__table__
+    dialeto = db.engine.dialect.name
+    if dialeto not in ('postgresql', 'sqlite'):
+        db.session.add_all(UsuarioADEspelho(**conta) for conta in contas)
+        return
+    comando = (postgresql.insert(tabela) if dialeto == 'postgresql' else sqlite.insert(tabela)).values(contas)
+    colunas = [c for c in contas[0] if c != 'object_guid']
+    db.session.execute(comando.on_conflict_do_update(
+        index_elements=['object_guid'], set_={c: comando.excluded[c] for c in colunas}
+    ))
+
+
+def sincronizar_espelho(completa=False):
+    """
+    Atualiza o espelho local a partir do AD. Chamada só fora das requisições ('flask
+    ad-espelho-sync', periódico); as consultas leem apenas a tabela (ver EspelhoAD).
+
+    Incremental: busca paginada só das contas com uSNChanged acima da marca d'água,
+    incluindo tombstones (contas excluídas), e aplica o delta. Completa: relê todas as
+    contas e remove do espelho as que não existem mais. A marca d'água passa a ser o
+    highestCommittedUSN lido ANTES da busca, então nada alterado durante a varredura se
+    perde. Como USNs são locais a cada DC, uma troca de servidor força a sincronização completa.
+    """
+    inicio = time.monotonic()
+    conn = get_ad_connection()
+    if not conn:
+        raise LDAPException("Falha na conexão com o AD.")
+
+    try:
+        estado = _estado_bloqueado()
+        usn_diretorio, servidor = _estado_do_diretorio(conn)
+        if not completa and (estado.ultima_sincronizacao_completa is None
+                             or (servidor and estado.servidor and servidor != estado.servidor)):
+            completa = True
+
+        resultado = ResultadoSincronizacao(completa=completa)
+        existentes = {u.object_guid: u for u in UsuarioADEspelho.query}
+        novas = {}
+        vistos = set()
+        maior_usn = estado.usn_maximo
+
+        if completa:
+            entradas = _buscar_paginado(conn, FILTRO_USUARIOS)
+        else:
+            filtro = f'(&{FILTRO_USUARIOS}(uSNChanged>={estado.usn_maximo + 1}))'
+            entradas = _buscar_paginado(conn, filtro, list(CONTROLES_DELTA))
+
+        agora = datetime.utcnow()
+        for entrada in entradas:
+            if entrada.get('type') != 'searchResEntry':
+                continue
+            atributos = entrada['attributes']
+            guid = _guid(entrada)
+            if not guid:
+                continue
+            usn = _para_inteiro(_valor(atributos, 'uSNChanged')) or 0
+            maior_usn = max(maior_usn, usn)
+
+            registro = existentes.get(guid)
+            if _excluido(atributos):
+                if registro is not None:
+                    db.session.delete(registro)
+                    existentes.pop(guid)
+                    resultado.removidos += 1
+                elif novas.pop(guid, None) is not None:
+                    resultado.inseridos -= 1
+                continue
+
+            vistos.add(guid)
+            dados = _dados_da_entrada(entrada, agora)
+            if registro is None:
+                if guid not in novas:
+                    resultado.inseridos += 1
+                novas[guid] = {'object_guid': guid, **dados}
+            elif registro.usn_changed != usn or registro.sam_account_name != dados['sam_account_name']:
+                for chave, valor in dados.items():
+                    setattr(registro, chave, valor)
+                resultado.atualizados += 1
+
+        if completa:
+            for guid, registro in existentes.items():
+                if guid not in vistos:
+                    db.session.delete(registro)
+                    resultado.removidos += 1
+            estado.ultima_sincronizacao_completa = agora
+
+        db.session.flush()
+        _gravar_novas(list(novas.values()))
+        estado.usn_maximo = max(usn_diretorio or 0, maior_usn)
+        estado.servidor = servidor or estado.servidor
+        estado.ultima_sincronizacao = agora
+        if resultado.alteracoes:
+            estado.geracao += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        liberar_conexao_ad(conn)
+
+    resultado.usn_maximo = estado.usn_maximo
+    resultado.duracao = time.monotonic() - inicio
+    espelho = current_app.extensions.get('espelho_ad')
+    if espelho is not None:
+        espelho.invalidar()
+    current_app.logger.info(
+        f"Espelho do AD sincronizado ({'completa' if completa else 'incremental'}): "
+        f"{resultado.inseridos} novos, {resultado.atualizados} alterados, {resultado.removidos} removidos "
+        f"em {resultado.duracao:.2f}s (USN {resultado.usn_maximo})."
+    )
+    return resultado
+
+
+def sincronizar_continuamente(intervalo=None):
+    """Laço de 'flask ad-espelho-sync --continuo': uma sincronização incremental a cada ESPELHO_AD_INTERVALO segundos."""
+    intervalo = intervalo or current_app.config['ESPELHO_AD_INTERVALO']
+    while True:
+        try:
+            sincronizar_espelho()
+        except Exception as e:
+            current_app.logger.error(f"Falha ao sincronizar o espelho do AD: {e}")
+        finally:
+            db.session.remove()
+        time.sleep(intervalo)
+
+
+# --- Alterações feitas pelo próprio sistema ---
+
+def _nova_geracao():
+    db.session.execute(update(EstadoEspelhoAD).where(EstadoEspelhoAD.id == 1)
+                       .values(geracao=EstadoEspelhoAD.geracao + 1))
+
+
+def _entradas(conn):
+    return [e for e in (conn.response or []) if e.get('type') == 'searchResEntry']
+
+
+def guid_da_busca(conn):
+    """objectGUID da primeira entrada da última busca feita na conexão (None se não houver)."""
+    entradas = _entradas(conn)
+    return _guid(entradas[0]) if entradas else None
+
+
+def registrar_conta_alterada(conn, dn):
+    """
+    Relê no AD (pela mesma conexão) a conta que acabou de ser criada ou alterada, grava-a no
+    espelho (upsert por object_guid) e avança a geração, para que as consultas a vejam sem
+    esperar a próxima sincronização. Entra na transação de quem chama, sem commit; uma falha
+    aqui só é registrada no log, e a sincronização periódica corrige o espelho depois.
+    """
+    try:
+        conn.search(dn, '(objectClass=*)', search_scope=BASE, attributes=ATRIBUTOS)
+        guid = guid_da_busca(conn)
+        if not guid:
+            return
+        entradas = _entradas(conn)
+        _gravar_novas([{'object_guid': guid, **_dados_da_entrada(entradas[0], datetime.utcnow())}])
+        _nova_geracao()
+    except (LDAPException, SQLAlchemyError) as e:
+        current_app.logger.warning(f"Não foi possível atualizar o espelho do AD com a conta {dn}: {e}")
+
+
+def registrar_conta_removida(guid):
+    """Remove do espelho a conta excluída do AD e avança a geração (mesmas regras de registrar_conta_alterada)."""
+    if not guid:
+        return
+    try:
+        if db.session.execute(delete(UsuarioADEspelho).where(UsuarioADEspelho.object_guid == guid)).rowcount:
+            _nova_geracao()
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Não foi possível remover a conta {guid} do espelho do AD: {e}")
+
+
+# --- Consulta em memória ---
+
+class EspelhoAD:
+    """
+    Índice em memória (sAMAccountName minúsculo -> registro) carregado da tabela do espelho.
+
+    As consultas são um acesso a dicionário e nunca vão ao AD nem gravam no banco: quem
+    mantém a tabela em dia é a sincronização fora das requisições ('flask ad-espelho-sync
+    --continuo'). A cada 'intervalo' segundos, a próxima consulta lê só a geração gravada
+    e recarrega o índice se ela mudou.
+    """
+
+    def __init__(self, intervalo=60, atraso_maximo=300):
+        self.intervalo = intervalo
+        self.atraso_maximo = atraso_maximo
+        self.por_username = {}
+        self._geracao = None
+        self._ultima_sincronizacao = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        """Confere a geração na próxima consulta (ex.: após alterar uma conta no AD)."""
+        self._verificado_em = 0.0
+
+    def _carregar(self, geracao):
+        linhas = db.session.query(
+            UsuarioADEspelho.sam_account_name, UsuarioADEspelho.display_name, UsuarioADEspelho.mail,
+            UsuarioADEspelho.user_account_control, UsuarioADEspelho.distinguished_name
+        )
+        self.por_username = {
+            sam.lower(): {'sAMAccountName': sam, 'displayName': nome, 'mail': mail,
+                          'userAccountControl': uac, 'dn': dn}
+            for sam, nome, mail, uac, dn in linhas
+        }
+        self._geracao = geracao
+
+    def garantir_atualizado(self):
+        """
+        Recarrega o índice se outra sincronização mudou a tabela. Só leitura: não faz commit
+        nem toca a transação de quem chama além dos SELECTs. Lança EspelhoADIndisponivel se o
+        espelho nunca foi sincronizado.
+        """
+        if time.monotonic() - self._verificado_em < self.intervalo:
+            return
+        with self._lock:
+            if time.monotonic() - self._verificado_em < self.intervalo:
+                return
+            estado = db.session.execute(
+                select(EstadoEspelhoAD.geracao, EstadoEspelhoAD.ultima_sincronizacao).where(EstadoEspelhoAD.id == 1)
+            ).first()
+            if estado is None or estado.ultima_sincronizacao is None:
+                raise EspelhoADIndisponivel("O espelho do AD ainda não foi sincronizado ('flask ad-espelho-sync').")
+            if estado.geracao != self._geracao:
+                self._carregar(estado.geracao)
+            self._ultima_sincronizacao = estado.ultima_sincronizacao
+            self._verificado_em = time.monotonic()
+
+    def desatualizado(self):
+        """True se a última sincronização com o AD é mais antiga que 'atraso_maximo' segundos."""
+        return (self._ultima_sincronizacao is None
+                or datetime.utcnow() - self._ultima_sincronizacao > timedelta(seconds=self.atraso_maximo))
+
+    def obter(self, username):
+        self.garantir_atualizado()
+        return self.por_username.get((username or '').lower())
+
+
+def get_espelho_ad():
+    return current_app.extensions['espelho_ad']
+
+
+def init_espelho_ad(app):
+    app.extensions['espelho_ad'] = EspelhoAD(intervalo=app.config.get('ESPELHO_AD_INTERVALO', 60),
+                                             atraso_maximo=app.config.get('ESPELHO_AD_ATRASO_MAXIMO', 300))
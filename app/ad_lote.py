@@ -0,0 +1,221 @@
+# app/ad_lote.py
+
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from flask import current_app
+from ldap3 import MODIFY_REPLACE
+from ldap3.core.exceptions import LDAPException
+from ldap3.utils.conv import escape_filter_chars
+
+from . import db
+from .ad_pool import get_pool_ad
+from .ad_sync import invalidar_espelho_ad
+from .models import Funcionario, Usuario, Cargo, Setor
+
+ATRIBUTOS_SINCRONIZADOS = ['sAMAccountName', 'displayName', 'title', 'department', 'userAccountControl']
+ATRIBUTOS_ALTERAVEIS = ('displayName', 'title', 'department', 'userAccountControl')
+CONTA_DESABILITADA = 2  # bit ACCOUNTDISABLE de userAccountControl
+
+
+@dataclass
+class ResultadoUsuarioAD:
+    funcionario_id: int
+    nome: str
+    username: str = None
+    situacao: str = 'sem_alteracao'  # atualizado, sem_alteracao, nao_encontrado, sem_usuario, erro
+    alteracoes: list = field(default_factory=list)
+    mensagem: str = ''
+
+    @property
+    def sucesso(self):
+        return self.situacao != 'erro'
+
+    def to_dict(self):
+        return {'funcionario_id': self.funcionario_id, 'nome': self.nome, 'username': self.username,
+                'situacao': self.situacao, 'alteracoes': self.alteracoes, 'mensagem': self.mensagem}
+
+
+@dataclass
+class RelatorioSincronizacaoAD:
+    resultados: list = field(default_factory=list)
+
+    @property
+    def resumo(self):
+        return dict(Counter(r.situacao for r in self.resultados))
+
+    @property
+    def falhas(self):
+        return [r for r in self.resultados if not r.sucesso]
+
+    def ids_com_sucesso(self):
+        return {r.funcionario_id for r in self.resultados if r.sucesso}
+
+
+# --- Estado desejado x estado no AD ---
+
+def _primeiro(valor):
+    if isinstance(valor, list):
+        return valor[0] if valor else None
+    return valor
+
+
+def _alteracoes(desejado, atributos, forcar_desabilitado, alteraveis=ATRIBUTOS_ALTERAVEIS):
+    """Monta o dicionário de MODIFY_REPLACE só com os atributos (entre os alteráveis) que diferem do AD."""
+    modificacoes = {}
+    for nome in ('displayName', 'title', 'department'):
+        if nome not in alteraveis:
+            continue
+        valor = desejado[nome] or None
+        if (_primeiro(atributos.get(nome)) or None) != valor:
+            # Lista vazia apaga o atributo (o AD não aceita string vazia)
+            modificacoes[nome] = [(MODIFY_REPLACE, [valor] if valor else [])]
+
+    uac = _primeiro(atributos.get('userAccountControl'))
+    if uac is not None and 'userAccountControl' in alteraveis:
+        uac = int(uac)
+        habilitar = desejado['status'] == 'Ativo' and not forcar_desabilitado
+        # Só o bit ACCOUNTDISABLE muda; os demais (senha não expira, etc.) são preservados
+        novo = uac & ~CONTA_DESABILITADA if habilitar else uac | CONTA_DESABILITADA
+        if novo != uac:
+            modificacoes['userAccountControl'] = [(MODIFY_REPLACE, [str(novo)])]
+    return modificacoes
+
+
+# --- Pipeline de requisições na conexão assíncrona ---
+
+def _em_pipeline(conn, envios, janela):
+    """
+    Envia as requisições mantendo até 'janela' delas em voo na mesma conexão e gera
+    (chave, resposta, resultado) à medida que as respostas chegam, na ordem de envio.
+    'envios' é um iterável de (chave, função que envia a requisição e devolve o message id).
+    """
+    em_voo = deque()
+
+    def receber():
+        chave, message_id = em_voo.popleft()
+        try:
+            resposta, resultado = conn.get_response(message_id)
+        except LDAPException as e:
+            resposta, resultado = [], {'result': -1, 'description': str(e), 'message': ''}
+        return chave, resposta, resultado
+
+    for chave, enviar in envios:
+        em_voo.append((chave, enviar()))
+        if len(em_voo) >= janela:
+            yield receber()
+    while em_voo:
+        yield receber()
+
+
+def _carregar_funcionarios(ids):
+    return db.session.query(
+        Funcionario.id, Funcionario.nome, Funcionario.status, Usuario.username, Cargo.nome, Setor.nome
+    ).outerjoin(Usuario, Usuario.funcionario_id == Funcionario.id) \
+     .outerjoin(Cargo, Funcionario.cargo_id == Cargo.id) \
+     .outerjoin(Setor, Funcionario.setor_id == Setor.id) \
+     .filter(Funcionario.id.in_(ids)).order_by(Funcionario.id).all()
+
+
+def sincronizar_funcionarios_ad(ids, forcar_desabilitado=False, simular=False, concorrencia=None,
+                                atributos=ATRIBUTOS_ALTERAVEIS):
+    """
+    Leva para o AD o nome, cargo (title), setor (department) e a situação (conta habilitada
+    só para status 'Ativo') de um conjunto de funcionários, em uma única conexão.
+
+    As contas são localizadas com buscas agrupadas (um filtro OR por bloco de usernames) e
+    só os atributos que diferem recebem MODIFY; buscas e modificações são enviadas em
+    pipeline pela estratégia assíncrona do ldap3, com no máximo 'concorrencia' requisições
+    em voo. 'forcar_desabilitado' desabilita todas as contas (remoção em lote) e 'simular'
+    apenas calcula as alterações. 'atributos' limita o que pode ser alterado (por exemplo, só
+    title/department na edição de cargo/setor, sem tocar no nome nem na situação da conta).
+    Retorna um RelatorioSincronizacaoAD, um resultado por funcionário.
+    """
+    config = current_app.config
+    janela = concorrencia or config['AD_LOTE_CONCORRENCIA']
+    relatorio = RelatorioSincronizacaoAD()
+    por_username = {}
+    for funcionario_id, nome, status, username, cargo, setor in _carregar_funcionarios(ids):
+        resultado = ResultadoUsuarioAD(funcionario_id, nome, username)
+        relatorio.resultados.append(resultado)
+        if not username:
+            resultado.situacao = 'sem_usuario'
+            resultado.mensagem = 'Funcionário sem usuário vinculado ao AD.'
+            continue
+        por_username[username.lower()] = (resultado, {
+            'displayName': nome, 'title': cargo, 'department': setor, 'status': status,
+        })
+    if not por_username:
+        return relatorio
+
+    try:
+        conn = get_pool_ad().conexao_dedicada()
+    except LDAPException as e:
+        current_app.logger.error(f"Falha ao conectar ao AD para a sincronização em lote: {e}")
+        for resultado, _ in por_username.values():
+            resultado.situacao = 'erro'
+            resultado.mensagem = 'Falha na conexão com o AD.'
+        return relatorio
+
+    try:
+        # 1. Localiza as contas (DN e atributos atuais)
+        usernames = list(por_username)
+        tamanho_bloco = config['AD_LOTE_BUSCA']
+        blocos = [usernames[i:i + tamanho_bloco] for i in range(0, len(usernames), tamanho_bloco)]
+
+        def envio_busca(bloco):
+            filtro = '(|' + ''.join(f'(sAMAccountName={escape_filter_chars(u)})' for u in bloco) + ')'
+            return lambda: conn.search(config['LDAP_BASE_DN'], f'(&(objectClass=user){filtro})',
+                                       attributes=ATRIBUTOS_SINCRONIZADOS)
+
+        encontrados = {}
+        for bloco, resposta, resultado_busca in _em_pipeline(conn, ((b, envio_busca(b)) for b in blocos), janela):
+            if resultado_busca['result'] != 0:
+                for username in bloco:
+                    por_username[username][0].situacao = 'erro'
+                    por_username[username][0].mensagem = f"Erro na busca: {resultado_busca['description']}"
+                continue
+            for entrada in resposta:
+                if entrada.get('type') != 'searchResEntry':
+                    continue
+                sam = str(_primeiro(entrada['attributes'].get('sAMAccountName')) or '').lower()
+                if sam in por_username:
+                    encontrados[sam] = (entrada['dn'], entrada['attributes'])
+
+        # 2. Calcula as diferenças e envia os MODIFYs
+        modificacoes = []
+        for username, (resultado, desejado) in por_username.items():
+            if resultado.situacao == 'erro':
+                continue
+            if username not in encontrados:
+                resultado.situacao = 'nao_encontrado'
+                resultado.mensagem = f"Usuário '{resultado.username}' não encontrado no AD."
+                continue
+            dn, atributos_ad = encontrados[username]
+            alteracoes = _alteracoes(desejado, atributos_ad, forcar_desabilitado, atributos)
+            resultado.alteracoes = sorted(alteracoes)
+            if alteracoes:
+                modificacoes.append((resultado, dn, alteracoes))
+
+        if simular:
+            for resultado, _, _ in modificacoes:
+                resultado.situacao = 'atualizado'
+                resultado.mensagem = 'Simulação: nenhuma alteração enviada.'
+            return relatorio
+
+        envios = ((resultado, lambda dn=dn, alt=alteracoes: conn.modify(dn, alt))
+                  for resultado, dn, alteracoes in modificacoes)
+        for resultado, _, resultado_modify in _em_pipeline(conn, envios, janela):
+            if resultado_modify['result'] == 0:
+                resultado.situacao = 'atualizado'
+            else:
+                resultado.situacao = 'erro'
+                resultado.mensagem = f"{resultado_modify['description']}: {resultado_modify.get('message', '')}".strip(': ')
+    finally:
+        conn.unbind()
+
+    if any(r.situacao == 'atualizado' for r in relatorio.resultados):
+        invalidar_espelho_ad()
+    for falha in relatorio.falhas:
+        current_app.logger.warning(f"Sincronização com o AD falhou para '{falha.username}': {falha.mensagem}")
+    return relatorio
@@ -0,0 +1,219 @@
+# app/ad_pool.py
+
+import threading
+import time
+
+from flask import current_app
+from ldap3 import Connection, ASYNC, BASE, SYNC
+from ldap3.core.exceptions import LDAPException
+
+from .ad_diretorio import get_diretorio_ad
+
+
+class PoolADEsgotado(LDAPException):
+    """Nenhuma conexão ficou livre dentro do tempo de espera."""
+
+
+class PoolConexoesAD:
+    """
+    Pool de conexões autenticadas com a conta de serviço do AD, compartilhado pelo processo.
+
+    - O Server é criado uma vez; o schema/DSE é lido só no bind da primeira conexão e fica
+      guardado no próprio objeto Server, reaproveitado pelas demais.
+    - Conexões devolvidas continuam abertas e autenticadas (sem novo handshake TLS + bind).
+    - Cada conexão é emprestada com exclusividade: uma Connection do ldap3 não pode ser usada
+      por duas greenlets ao mesmo tempo. As primitivas de threading são cooperativas sob o
+      monkey-patch do gevent, então a espera por uma conexão livre não bloqueia o worker.
+    - Antes de reutilizar uma conexão ociosa há mais de 'verificar_apos' segundos, uma busca
+      BASE barata confirma que ela ainda responde; ociosas há mais de 'ociosidade_maxima'
+      segundos são descartadas (o AD encerra conexões paradas, por padrão, após 15 minutos).
+    """
+
+    def __init__(self, criar_servidor, usuario, senha, tamanho_maximo=4, espera_maxima=10.0,
+                 ociosidade_maxima=300.0, verificar_apos=30.0, base_verificacao='', estrategia=SYNC,
+                 estrategia_dedicada=ASYNC):
+        self._criar_servidor = criar_servidor
+        self._servidor = None
+        self.usuario = usuario
+        self.senha = senha
+        self.tamanho_maximo = tamanho_maximo
+        self.espera_maxima = espera_maxima
+        self.ociosidade_maxima = ociosidade_maxima
+        self.verificar_apos = verificar_apos
+        self.base_verificacao = base_verificacao
+        self.estrategia = estrategia
+        self.estrategia_dedicada = estrategia_dedicada
+
+        self._livres = []      # [(conexao, devolvida_em)], a mais recente no fim
+        self._em_uso = {}      # id(conexao) -> emprestada_em
+        self._total = 0
+        self._cond = threading.Condition()
+        self._lock_servidor = threading.Lock()
+        self._metricas = dict.fromkeys([
+            'criadas', 'reutilizadas', 'descartadas', 'falhas_conexao', 'falhas_verificacao',
+            'esperas', 'esgotamentos', 'emprestimos'
+        ], 0)
+        self._tempo_espera_total = 0.0
+
+    # --- Ciclo de vida das conexões ---
+
+    def _servidor_compartilhado(self):
+        with self._lock_servidor:
+            if self._servidor is None:
+                self._servidor = self._criar_servidor()
+            return self._servidor
+
+    def _nova_conexao(self, estrategia=None):
+        servidor = self._servidor_compartilhado()
+        conexao = Connection(servidor, user=self.usuario, password=self.senha, client_strategy=estrategia or self.estrategia)
+        conexao.open()
+        # Só o primeiro bind lê o schema/DSE; as próximas conexões usam o que ficou no Server
+        ler_info = servidor.info is None and servidor.schema is None
+        if not conexao.bind(read_server_info=ler_info):
+            erro = conexao.last_error or conexao.result
+            conexao.unbind()
+            raise LDAPException(f"Falha no bind da conta de serviço: {erro}")
+        return conexao
+
+    def _saudavel(self, conexao, ociosa_ha):
+        if conexao.closed or not conexao.bound or ociosa_ha > self.ociosidade_maxima:
+            return False
+        if ociosa_ha <= self.verificar_apos:
+            return True
+        try:
+            # Qualquer resposta serve; só interessa saber se o socket ainda está vivo
+            conexao.search(self.base_verificacao, '(objectClass=*)', search_scope=BASE, attributes=['1.1'])
+            return True
+        except LDAPException:
+            with self._cond:
+                self._metricas['falhas_verificacao'] += 1
+            return False
+
+    def _fechar(self, conexao):
+        try:
+            conexao.unbind()
+        except LDAPException:
+            pass
+
+    # --- Empréstimo ---
+
+    def adquirir(self):
+        """Empresta uma conexão autenticada; devolva-a com 'liberar'."""
+        inicio = time.monotonic()
+        limite = inicio + self.espera_maxima
+        while True:
+            conexao = None
+            criar = False
+            with self._cond:
+                while not self._livres and self._total >= self.tamanho_maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._metricas['esgotamentos'] += 1
+                        raise PoolADEsgotado(f"Nenhuma conexão com o AD livre após {self.espera_maxima}s.")
+                    self._metricas['esperas'] += 1
+                    self._cond.wait(restante)
+                if self._livres:
+                    conexao, devolvida_em = self._livres.pop()
+                else:
+                    self._total += 1
+                    criar = True
+
+            if criar:
+                try:
+                    conexao = self._nova_conexao()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._metricas['falhas_conexao'] += 1
+                        self._cond.notify()
+                    raise
+                reutilizada = False
+            elif self._saudavel(conexao, time.monotonic() - devolvida_em):
+                reutilizada = True
+            else:
+                self._descartar(conexao)
+                continue
+
+            with self._cond:
+                self._em_uso[id(conexao)] = time.monotonic()
+                self._metricas['emprestimos'] += 1
+                self._metricas['reutilizadas' if reutilizada else 'criadas'] += 1
+                self._tempo_espera_total += time.monotonic() - inicio
+            return conexao
+
+    def conexao_dedicada(self):
+        """
+        Conexão avulsa (fora do limite do pool) com a estratégia assíncrona, para operações em
+        lote que enviam várias requisições antes de ler as respostas. Reaproveita o Server
+        compartilhado; quem abre deve encerrá-la com unbind().
+        """
+        return self._nova_conexao(self.estrategia_dedicada)
+
+    def pertence(self, conexao):
+        with self._cond:
+            return id(conexao) in self._em_uso
+
+    def liberar(self, conexao, descartar=False):
+        """Devolve a conexão ao pool; conexões fechadas ou marcadas como quebradas são descartadas."""
+        with self._cond:
+            if self._em_uso.pop(id(conexao), None) is None:
+                return
+            if not descartar and not conexao.closed and conexao.bound:
+                self._livres.append((conexao, time.monotonic()))
+                self._cond.notify()
+                return
+        self._descartar(conexao)
+
+    def _descartar(self, conexao):
+        self._fechar(conexao)
+        with self._cond:
+            self._total -= 1
+            self._metricas['descartadas'] += 1
+            self._cond.notify()
+
+    def fechar(self):
+        """Encerra as conexões ociosas (ex.: após trocar a senha da conta de serviço)."""
+        with self._cond:
+            livres, self._livres = self._livres, []
+        for conexao, _ in livres:
+            self._descartar(conexao)
+
+    def metricas(self):
+        with self._cond:
+            dados = dict(self._metricas)
+            dados.update({
+                'tamanho_maximo': self.tamanho_maximo,
+                'abertas': self._total,
+                'em_uso': len(self._em_uso),
+                'livres': len(self._livres),
+                'espera_media_ms': round(self._tempo_espera_total * 1000 / dados['emprestimos'], 3) if dados['emprestimos'] else 0.0,
+                'schema_em_cache': self._servidor is not None and self._servidor.schema is not None,
+            })
+        return dados
+
+
+def criar_pool_ad(config, diretorio):
+    # O Server (e o schema/DSE lido no primeiro bind) é o mesmo usado no login
+    return PoolConexoesAD(
+        lambda: diretorio.servidor,
+        config['LDAP_BIND_USER_DN'],
+        config['LDAP_BIND_USER_PASSWORD'],
+        tamanho_maximo=config.get('LDAP_POOL_TAMANHO', 4),
+        espera_maxima=config.get('LDAP_POOL_ESPERA_MAXIMA', 10),
+        ociosidade_maxima=config.get('LDAP_POOL_OCIOSIDADE_MAXIMA', 300),
+        verificar_apos=config.get('LDAP_POOL_VERIFICAR_APOS', 30),
+        base_verificacao=config.get('LDAP_BASE_DN') or '',
+    )
+
+
+_lock_criacao = threading.Lock()
+
+
+def get_pool_ad():
+    """Pool do app atual, criado no primeiro uso (a configuração do AD pode não existir em dev/testes)."""
+    extensoes = current_app.extensions
+    if 'pool_ad' not in extensoes:
+        with _lock_criacao:
+            if 'pool_ad' not in extensoes:
+                extensoes['pool_ad'] = criar_pool_ad(current_app.config, get_diretorio_ad())
+    return extensoes['pool_ad']
@@ -1,35 +1,63 @@
 import os
 import uuid
 from flask import current_app
-from ldap3 import Server, Connection, ALL, Tls, MODIFY_REPLACE
+from ldap3 import MODIFY_REPLACE
 from ldap3.core.exceptions import LDAPException
-import ssl
 from unidecode import unidecode
+from .ad_diretorio import get_diretorio_ad
+from .ad_pool import get_pool_ad
 
 def get_ad_connection():
-    """Cria e retorna uma conexão autenticada com o AD usando a conta de serviço."""
+    """Empresta uma conexão autenticada (conta de serviço) do pool do processo; devolva com liberar_conexao_ad."""
     try:
-        tls_config = Tls(validate=ssl.CERT_NONE)
-        server = Server(
-            current_app.config['LDAP_HOST'],
-            port=int(current_app.config['LDAP_PORT']),
-            get_info=ALL,
-            use_ssl=True,
-            tls=tls_config
-        )
-        conn = Connection(
-            server,
-            user=current_app.config['LDAP_BIND_USER_DN'],
-            password=current_app.config['LDAP_BIND_USER_PASSWORD'],
-            auto_bind=True
-        )
-        return conn
+        return get_pool_ad().adquirir()
     except LDAPException as e:
         current_app.logger.error(f"Falha ao conectar ao AD com a conta de serviço: {e}")
         return None
 
+def liberar_conexao_ad(conn):
+    """Devolve a conexão ao pool; conexões que não vieram do pool são simplesmente encerradas."""
+    if not conn:
+        return
+    pool = current_app.extensions.get('pool_ad')
+    if pool is not None and pool.pertence(conn):
+        pool.liberar(conn)
+    else:
+        conn.unbind()
+
+def invalidar_espelho_ad():
+    """
+    Após alterar contas no AD, faz a próxima consulta deste processo conferir a geração do
+    espelho (e recarregá-lo se ela mudou). Só descarta caches: a tabela do espelho é atualizada
+    por registrar_conta_alterada/registrar_conta_removida (ver ad_espelho.py) e pela
+    sincronização periódica ('flask ad-espelho-sync --continuo').
+    """
+    espelho = current_app.extensions.get('espelho_ad')
+    if espelho is not None:
+        espelho.invalidar()
+    # Os atributos guardados para o login também podem ter mudado (nome, e-mail)
+    diretorio = current_app.extensions.get('diretorio_ad')
+    if diretorio is not None:
+        diretorio.invalidar_atributos()
+
 def verificar_usuario_ad(username):
-    """Verifica se um sAMAccountName já existe no AD."""
+    """Verifica se um sAMAccountName já existe no AD, consultando o espelho local (ver ad_espelho.py)."""
+    from .ad_espelho import get_espelho_ad, EspelhoADIndisponivel
+    espelho = get_espelho_ad()
+    try:
+        registro = espelho.obter(username)
+    except EspelhoADIndisponivel:
+        # Espelho ainda não sincronizado: tenta a consulta direta ao AD
+        return buscar_usuario_ad(username)
+    if espelho.desatualizado():
+        # A sincronização parou (ESPELHO_AD_ATRASO_MAXIMO): o espelho pode não ter contas recentes
+        return buscar_usuario_ad(username)
+    if registro:
+        return {'existe': True, 'displayName': registro['displayName']}
+    return {'existe': False}
+
+def buscar_usuario_ad(username):
+    """Consulta direta (sem o espelho) de um sAMAccountName no AD."""
     conn = get_ad_connection()
     if not conn:
         return {'existe': False, 'error': 'Falha na conexão com o AD.'}
@@ -49,19 +77,19 @@ def verificar_usuario_ad(username):
         current_app.logger.error(f"Erro ao verificar usuário no AD: {e}")
         return {'existe': False, 'error': str(e)}
     finally:
-        if conn:
-            conn.unbind()
+        liberar_conexao_ad(conn)
 
 def provisionar_usuario_ad(funcionario, username_manual=None, vincular=False):
     """
     Garante que um usuário exista no AD, com suporte para username manual e vinculação.
     """
+    from .ad_espelho import registrar_conta_alterada
     if vincular:
         nome_parts = funcionario.nome.lower().split()
         primeiro_nome = nome_parts[0]
         sobrenome = nome_parts[-1] if len(nome_parts) > 1 else ''
         username = f"{primeiro_nome}.{sobrenome}" if sobrenome else primeiro_nome
-        domain = '.'.join([dc.split('=')[1] for dc in current_app.config['LDAP_BASE_DN'].split(',')])
+        domain = get_diretorio_ad().dominio
         email_ad = f"{username}@{domain}"
         return True, "Vinculação manual solicitada.", email_ad
 
@@ -82,7 +110,7 @@ def provisionar_usuario_ad(funcionario, username_manual=None, vincular=False):
             else:
                 username = primeiro_nome_unidecoded
 
-        domain = '.'.join([dc.split('=')[1] for dc in current_app.config['LDAP_BASE_DN'].split(',')])
+        domain = get_diretorio_ad().dominio
         user_principal_name = f"{username}@{domain}"
         user_dn = f"CN={funcionario.nome},{current_app.config['LDAP_USERS_DN']}"
 
@@ -105,6 +133,7 @@ def provisionar_usuario_ad(funcionario, username_manual=None, vincular=False):
 
             if modificacoes_finais:
                 conn.modify(user_dn_existente, modificacoes_finais)
+            user_dn = user_dn_existente
         else:
             # Fluxo de criação de novo usuário
             conn.add(
@@ -145,20 +174,22 @@ def provisionar_usuario_ad(funcionario, username_manual=None, vincular=False):
             if not conn.result['result'] == 0:
                 raise LDAPException(f"Falha ao forçar troca de senha: {conn.result['description']} - {conn.result['message']}")
 
+        registrar_conta_alterada(conn, user_dn)
+        invalidar_espelho_ad()
         return True, "Usuário provisionado no AD com sucesso.", user_principal_name
 
     except LDAPException as e:
         current_app.logger.error(f"Erro de LDAP ao provisionar/sincronizar usuário: {e}")
         return False, f"Erro de LDAP: {e}", None
     finally:
-        if conn:
-            conn.unbind()
+        liberar_conexao_ad(conn)
 
 def _alterar_status_usuario_ad(username, habilitar=True):
     """
     Função interna para habilitar ou desabilitar uma conta de usuário no AD.
     AGORA BUSCA PELO sAMAccountName (username).
     """
+    from .ad_espelho import registrar_conta_alterada
     conn = get_ad_connection()
     if not conn:
         return False, "Falha na conexão com o AD."
@@ -182,6 +213,8 @@ def _alterar_status_usuario_ad(username, habilitar=True):
         conn.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [novo_status])]})
 
         if conn.result.get('result') == 0:
+            registrar_conta_alterada(conn, user_dn)
+            invalidar_espelho_ad()
             return True, f"Usuário {username} {'habilitado' if habilitar else 'desabilitado'} com sucesso no AD."
         else:
             raise LDAPException(f"Falha ao modificar o atributo: {conn.result.get('description')}")
@@ -190,8 +223,7 @@ def _alterar_status_usuario_ad(username, habilitar=True):
         current_app.logger.error(f"Erro de LDAP ao alterar status do usuário {username}: {e}")
         return False, f"Erro de LDAP: {e}"
     finally:
-        if conn:
-            conn.unbind()
+        liberar_conexao_ad(conn)
 
 def habilitar_usuario_ad(email):
     return _alterar_status_usuario_ad(email, habilitar=True)
@@ -200,22 +232,27 @@ def desabilitar_usuario_ad(username):
     return _alterar_status_usuario_ad(username, habilitar=False)
 
 def remover_usuario_ad(email):
+    from .ad_espelho import guid_da_busca, registrar_conta_removida
     conn = get_ad_connection()
     if not conn:
         return False, "Falha na conexão com o AD."
 
     try:
-        conn.search(search_base=current_app.config['LDAP_BASE_DN'], search_filter=f'(userPrincipalName={email})')
+        conn.search(search_base=current_app.config['LDAP_BASE_DN'], search_filter=f'(userPrincipalName={email})',
+                    attributes=['objectGUID'])
         if not conn.entries:
             return True, "Usuário não encontrado no AD, nenhuma ação necessária."
 
         user_dn = conn.entries[0].entry_dn
+        guid = guid_da_busca(conn)
         conn.delete(user_dn)
+        if conn.result.get('result') == 0:
+            registrar_conta_removida(guid)
+        invalidar_espelho_ad()
         return True, f"Usuário {email} removido do AD com sucesso."
     except LDAPException as e:
         current_app.logger.error(f"Erro ao remover usuário {email} do AD: {e}")
         return False, "Erro ao remover usuário do AD."
     finally:
-        if conn:
-            conn.unbind()
+        liberar_conexao_ad(conn)
 
@@ -0,0 +1,181 @@
+# app/analise_ad.py
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+
+from . import db
+from .ad_espelho import get_espelho_ad, EspelhoADIndisponivel
+from .correspondencia import IndiceCorrespondencia
+from .models import AnaliseVinculoAD, Funcionario, Usuario, VinculoADSugestao
+
+LIMIAR_SUGESTAO = 80  # % de similaridade mínima para sugerir um vínculo
+
+
+class AnaliseEmAndamento(Exception):
+    """Já existe uma análise pendente ou executando."""
+
+    def __init__(self, analise):
+        super().__init__(f"A análise {analise.id} ainda está em andamento.")
+        self.analise = analise
+
+
+def analise_em_andamento():
+    """
+    Análise pendente/executando mais recente, se houver. Execuções iniciadas há mais de
+    ANALISE_AD_EXPIRA segundos (processo que morreu no meio) são marcadas como falhas.
+    """
+    analise = AnaliseVinculoAD.query.filter(
+        AnaliseVinculoAD.status.in_(['pendente', 'executando'])
+    ).order_by(AnaliseVinculoAD.id.desc()).first()
+    if analise is None:
+        return None
+    limite = datetime.utcnow() - timedelta(seconds=current_app.config['ANALISE_AD_EXPIRA'])
+    if (analise.iniciado_em or analise.criado_em) < limite:
+        analise.status = 'falhou'
+        analise.erro = 'Execução abandonada (tempo limite excedido).'
+        analise.concluido_em = datetime.utcnow()
+        db.session.commit()
+        return None
+    return analise
+
+
+def ultima_analise():
+    return AnaliseVinculoAD.query.order_by(AnaliseVinculoAD.id.desc()).first()
+
+
+def _atualizar_progresso(analise, processados):
+    analise.processados = processados
+    analise.progresso = int(processados * 100 / analise.total_funcionarios) if analise.total_funcionarios else 100
+    db.session.commit()
+
+
+class Cronometro:
+    """Acumula o tempo gasto em cada etapa nomeada: 'with cronometro.etapa("x"): ...'."""
+
+    def __init__(self):
+        self.tempos = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tempos[nome] = self.tempos.get(nome, 0.0) + time.perf_counter() - inicio
+
+    def resumo(self):
+        return ', '.join(f'{nome} {segundos * 1000:.0f} ms' for nome, segundos in self.tempos.items())
+
+
+def funcionarios_a_analisar(usernames_ad):
+    """
+    (id, nome) dos funcionários com usuário cujo username não corresponde a nenhuma conta do AD.
+    Uma única consulta com JOIN traz só as colunas usadas; 'usernames_ad' é o conjunto (ou
+    dicionário) de sAMAccountNames em minúsculas, então a checagem de vínculo é O(1).
+    """
+    linhas = db.session.query(Funcionario.id, Funcionario.nome, Usuario.username).join(
+        Usuario, Usuario.funcionario_id == Funcionario.id
+    ).order_by(Funcionario.id)
+    # Pula a análise se o username já parece estar vinculado corretamente
+    return [(id_, nome) for id_, nome, username in linhas if not (username and username.lower() in usernames_ad)]
+
+
+def executar_analise_vinculos(analise_id):
+    """
+    Lê o espelho do AD (mantido por 'flask ad-espelho-sync'), pontua os funcionários com usuário contra as contas e troca as
+    sugestões antigas pelas novas. O progresso é gravado na linha da análise a cada lote de
+    funcionários; as sugestões antigas só são apagadas no commit final, junto com os INSERTs
+    em lote das novas, então a página de revisão nunca fica vazia durante a execução.
+    O tempo de cada etapa (AD, banco, pontuação, gravação) é registrado no log.
+    """
+    config = current_app.config
+    analise = db.session.get(AnaliseVinculoAD, analise_id)
+    analise.status = 'executando'
+    analise.iniciado_em = datetime.utcnow()
+    db.session.commit()
+    cronometro = Cronometro()
+
+    try:
+        with cronometro.etapa('AD'):
+            espelho = get_espelho_ad()
+            espelho.garantir_atualizado()
+            usuarios_ad = espelho.por_username
+        with cronometro.etapa('banco'):
+            pendentes = funcionarios_a_analisar(usuarios_ad)
+        analise.total_funcionarios = len(pendentes)
+        _atualizar_progresso(analise, 0)
+
+        novas = []
+        lote = config['ANALISE_AD_LOTE']
+        with cronometro.etapa('pontuação'):
+            indice = IndiceCorrespondencia(usuarios_ad.values())
+            for numero, (funcionario_id, nome) in enumerate(pendentes, start=1):
+                match, pontuacao = indice.melhor(nome, limiar=LIMIAR_SUGESTAO)
+                if match:
+                    novas.append({
+                        'funcionario_id': funcionario_id, 'funcionario_nome': nome,
+                        'ad_username': match['sAMAccountName'], 'ad_display_name': match['displayName'],
+                        'pontuacao': pontuacao,
+                    })
+                if numero % lote == 0:
+                    _atualizar_progresso(analise, numero)
+
+        with cronometro.etapa('gravação'):
+            VinculoADSugestao.query.delete(synchronize_session=False)
+            for inicio in range(0, len(novas), lote):
+                db.session.execute(insert(VinculoADSugestao), novas[inicio:inicio + lote])
+            analise.sugestoes = len(novas)
+            analise.processados = len(pendentes)
+            analise.progresso = 100
+            analise.status = 'concluida'
+            analise.concluido_em = datetime.utcnow()
+            db.session.commit()
+        current_app.logger.info(
+            f"Análise de vínculos {analise.id} concluída: {len(pendentes)} funcionário(s), "
+            f"{len(novas)} sugestão(ões) em {analise.duracao:.2f}s ({cronometro.resumo()})."
+        )
+    except Exception as e:
+        db.session.rollback()
+        analise = db.session.get(AnaliseVinculoAD, analise_id)
+        analise.status = 'falhou'
+        analise.erro = "O espelho do Active Directory ainda não foi sincronizado." if isinstance(e, EspelhoADIndisponivel) else str(e)[:2000]
+        analise.concluido_em = datetime.utcnow()
+        db.session.commit()
+        current_app.logger.error(f"Análise de vínculos {analise_id} falhou após {cronometro.resumo() or '0 ms'}: {e}")
+    return analise
+
+
+def _executar_em_segundo_plano(app, analise_id):
+    with app.app_context():
+        try:
+            executar_analise_vinculos(analise_id)
+        finally:
+            db.session.remove()
+
+
+def iniciar_analise(usuario_id=None):
+    """
+    Registra uma nova análise e a executa fora da requisição (thread em segundo plano).
+    Com ANALISE_AD_ASSINCRONA desligado (testes), executa na hora. Lança
+    AnaliseEmAndamento se já houver uma em curso.
+    """
+    em_andamento = analise_em_andamento()
+    if em_andamento is not None:
+        raise AnaliseEmAndamento(em_andamento)
+
+    analise = AnaliseVinculoAD(solicitado_por_id=usuario_id)
+    db.session.add(analise)
+    db.session.commit()
+
+    if not current_app.config['ANALISE_AD_ASSINCRONA']:
+        return executar_analise_vinculos(analise.id)
+
+    app = current_app._get_current_object()
+    threading.Thread(target=_executar_em_segundo_plano, args=(app, analise.id),
+                     name=f'analise-ad-{analise.id}', daemon=True).start()
+    return analise
@@ -0,0 +1,393 @@
+# app/armazenamento.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from urllib.parse import quote
+
+from flask import abort, current_app, request
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename, send_file
+
+from . import db
+from .models import ArquivoArmazenado, ArquivoBlob, PreviaArquivo, AvisoAnexo, DenunciaAnexo, Documento, Funcionario, Ponto
+
+PASTA_BLOBS = 'blobs'
+PASTA_TEMPORARIA = 'tmp'
+MODOS_ENVIO = ('direto', 'x-sendfile', 'x-accel')
+# Arquivos derivados gravados ao lado do blob (<caminho><sufixo>), apagados junto com ele
+SUFIXO_PREVIA = '.previa.webp'
+SUFIXOS_DERIVADOS = (SUFIXO_PREVIA,)
+
+
+class ArquivoGrandeDemais(ValueError):
+    """O upload passou de ARMAZENAMENTO_TAMANHO_MAXIMO."""
+
+    def __init__(self, tamanho_maximo):
+        super().__init__(f"O arquivo excede o tamanho máximo de {tamanho_maximo // (1024 * 1024)} MB.")
+        self.tamanho_maximo = tamanho_maximo
+
+
+class ArmazenamentoArquivos:
+    """
+    Arquivos enviados ficam em UPLOAD_FOLDER/blobs/ab/cd/<sha256>-<geração>, um por conteúdo.
+
+    O upload é copiado em blocos de tamanho fixo para um arquivo temporário, calculando o
+    SHA-256 e o tamanho no caminho (sem carregar o arquivo inteiro na memória); o arquivo
+    é recusado assim que passa do tamanho máximo. Se o conteúdo já existe, o temporário é
+    descartado e o blob ganha mais uma referência; senão, é movido (os.replace, atômico no
+    mesmo sistema de arquivos) para o caminho do blob.
+
+    Cada linha de ArquivoBlob criada ganha uma geração própria no caminho. Assim, quando a
+    última referência de um conteúdo é removida e o mesmo conteúdo é enviado de novo antes
+    do commit, o arquivo da geração antiga (apagado após o commit) nunca é o da nova.
+
+    Nas tabelas continuam os nomes únicos de sempre ('<uuid>.pdf'); ArquivoArmazenado liga
+    cada nome ao blob. Nomes sem esse vínculo são arquivos antigos, procurados em
+    UPLOAD_FOLDER/<pasta>/<nome> como antes, até serem migrados (flask migrar-uploads).
+    """
+
+    def __init__(self, raiz, tamanho_bloco=1024 * 1024, tamanho_maximo=None, cache_max_age=0,
+                 envio='direto', prefixo_x_accel='/_uploads/'):
+        if envio not in MODOS_ENVIO:
+            raise ValueError(f"ARMAZENAMENTO_ENVIO inválido: {envio!r} (use um de {', '.join(MODOS_ENVIO)}).")
+        self.raiz = os.path.abspath(raiz)
+        self.tamanho_bloco = tamanho_bloco
+        self.tamanho_maximo = tamanho_maximo
+        self.cache_max_age = cache_max_age
+        self.envio = envio
+        self.prefixo_x_accel = prefixo_x_accel.rstrip('/') + '/'
+
+    @staticmethod
+    def caminho_blob(sha256, geracao=None):
+        geracao = geracao or uuid.uuid4().hex[:12]
+        return '/'.join([PASTA_BLOBS, sha256[:2], sha256[2:4], f'{sha256}-{geracao}'])
+
+    def absoluto(self, relativo):
+        return os.path.join(self.raiz, *relativo.split('/'))
+
+    def gravar_temporario(self, stream):
+        """Copia o stream em blocos para um temporário; retorna (sha256, tamanho, caminho do temporário)."""
+        pasta = os.path.join(self.raiz, PASTA_TEMPORARIA)
+        os.makedirs(pasta, exist_ok=True)
+        descritor, caminho = tempfile.mkstemp(dir=pasta, suffix='.upload')
+        resumo, tamanho = hashlib.sha256(), 0
+        try:
+            with os.fdopen(descritor, 'wb') as destino:
+                while True:
+                    bloco = stream.read(self.tamanho_bloco)
+                    if not bloco:
+                        break
+                    tamanho += len(bloco)
+                    if self.tamanho_maximo and tamanho > self.tamanho_maximo:
+                        raise ArquivoGrandeDemais(self.tamanho_maximo)
+                    resumo.update(bloco)
+                    destino.write(bloco)
+        except BaseException:
+            os.remove(caminho)
+            raise
+        return resumo.hexdigest(), tamanho, caminho
+
+    def importar_temporario(self, caminho):
+        """
+        Como gravar_temporario, mas a partir de um arquivo já em disco (sem limite de tamanho).
+        O temporário é um hard link quando possível, para não copiar os bytes.
+        """
+        pasta = os.path.join(self.raiz, PASTA_TEMPORARIA)
+        os.makedirs(pasta, exist_ok=True)
+        temporario = os.path.join(pasta, f"{uuid.uuid4().hex}.importacao")
+        try:
+            os.link(caminho, temporario)
+        except OSError:
+            shutil.copyfile(caminho, temporario)
+        resumo, tamanho = hashlib.sha256(), 0
+        with open(temporario, 'rb') as origem:
+            while bloco := origem.read(self.tamanho_bloco):
+                tamanho += len(bloco)
+                resumo.update(bloco)
+        return resumo.hexdigest(), tamanho, temporario
+
+    def publicar(self, temporario, relativo):
+        """Move o temporário para o caminho definitivo (o conteúdo é o mesmo se ele já existir)."""
+        destino = self.absoluto(relativo)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(temporario, destino)
+
+
+def get_armazenamento():
+    return current_app.extensions['armazenamento']
+
+
+def init_armazenamento(app):
+    app.extensions['armazenamento'] = ArmazenamentoArquivos(
+        app.config['UPLOAD_FOLDER'],
+        tamanho_bloco=app.config.get('ARMAZENAMENTO_TAMANHO_BLOCO', 1024 * 1024),
+        tamanho_maximo=app.config.get('ARMAZENAMENTO_TAMANHO_MAXIMO'),
+        cache_max_age=app.config.get('ARMAZENAMENTO_CACHE_MAX_AGE', 0),
+        envio=app.config.get('ARMAZENAMENTO_ENVIO') or 'direto',
+        prefixo_x_accel=app.config.get('ARMAZENAMENTO_X_ACCEL_PREFIXO') or '/_uploads/',
+    )
+
+
+# --- Referências ---
+
+def _incrementar(blob_id):
+    """+1 referência; False se o blob foi apagado nesse meio-tempo (última referência removida)."""
+    return db.session.execute(
+        update(ArquivoBlob).where(ArquivoBlob.id == blob_id).values(referencias=ArquivoBlob.referencias + 1)
+    ).rowcount == 1
+
+
+def _registrar_blob(armazenamento, sha256, tamanho, temporario):
+    """Retorna o id do blob com este conteúdo, criando-o ou somando uma referência."""
+    existente = db.session.execute(
+        select(ArquivoBlob.id, ArquivoBlob.caminho).where(ArquivoBlob.sha256 == sha256)
+    ).first()
+    if existente and _incrementar(existente.id):
+        if os.path.exists(armazenamento.absoluto(existente.caminho)):
+            os.remove(temporario)
+        else:
+            armazenamento.publicar(temporario, existente.caminho)
+        return existente.id
+
+    caminho = armazenamento.caminho_blob(sha256)
+    armazenamento.publicar(temporario, caminho)
+    remover_apos_rollback(armazenamento.absoluto(caminho))
+    try:
+        with db.session.begin_nested():
+            blob = ArquivoBlob(sha256=sha256, tamanho=tamanho, caminho=caminho, referencias=1)
+            db.session.add(blob)
+        return blob.id
+    except IntegrityError:
+        # Outro upload do mesmo conteúdo criou o blob entre a consulta e o INSERT: vale o dele
+        os.remove(armazenamento.absoluto(caminho))
+        blob_id = db.session.scalar(select(ArquivoBlob.id).where(ArquivoBlob.sha256 == sha256))
+        _incrementar(blob_id)
+        return blob_id
+
+
+def salvar_upload(arquivo, pasta='', nome=None):
+    """
+    Grava um upload (FileStorage) no armazenamento e retorna o nome único a guardar na
+    tabela. 'nome' padrão: '<uuid>.<extensão original>'. 'pasta' é a categoria do arquivo
+    (documentos na raiz, 'pontos', 'denuncias', 'fotos_perfil'). Não faz commit; lança
+    ArquivoGrandeDemais se o arquivo passar do limite.
+    """
+    armazenamento = get_armazenamento()
+    nome_original = secure_filename(arquivo.filename or '')
+    if nome is None:
+        extensao = nome_original.rsplit('.', 1)[1].lower() if '.' in nome_original else 'bin'
+        nome = f"{uuid.uuid4()}.{extensao}"
+
+    sha256, tamanho, temporario = armazenamento.gravar_temporario(arquivo.stream)
+    blob_id = _registrar_blob(armazenamento, sha256, tamanho, temporario)
+    db.session.add(ArquivoArmazenado(nome=nome, pasta=pasta, blob_id=blob_id, nome_original=nome_original or None))
+    db.session.flush()
+    return nome
+
+
+def _localizar(nome, pasta):
+    """
+    (caminho relativo a UPLOAD_FOLDER ou None, registro ou None, sha256 ou None) do arquivo
+    gravado com este nome nesta pasta. Um nome gravado em outra pasta não é encontrado: cada
+    rota só enxerga a sua categoria de arquivos, como quando cada uma servia a sua pasta.
+    """
+    registro = db.session.execute(
+        select(ArquivoArmazenado, ArquivoBlob.caminho, ArquivoBlob.sha256).join(ArquivoBlob)
+        .where(ArquivoArmazenado.nome == nome, ArquivoArmazenado.pasta == pasta)
+    ).first()
+    if registro:
+        return registro[1], registro[0], registro[2]
+    # Arquivo antigo: só um nome simples dentro da pasta (nunca 'blobs/...' ou outra subpasta)
+    if not nome or nome in ('.', '..') or '/' in nome or '\\' in nome:
+        return None, None, None
+    if db.session.scalar(select(ArquivoArmazenado.id).where(ArquivoArmazenado.nome == nome)):
+        return None, None, None  # gravado pelo armazenamento, mas em outra pasta
+    return '/'.join(p for p in (pasta, nome) if p), None, None
+
+
+def caminho_arquivo(nome, pasta=''):
+    """Caminho absoluto do arquivo gravado com este nome (blob ou arquivo antigo em <pasta>/<nome>); None se não houver."""
+    relativo, _, _ = _localizar(nome, pasta)
+    return get_armazenamento().absoluto(relativo) if relativo else None
+
+
+def enviar_arquivo(nome, pasta='', as_attachment=False, download_name=None):
+    """
+    Resposta de download do arquivo; o nome de download (e o Content-Type) vêm do nome gravado.
+
+    Blobs têm ETag forte (o SHA-256 do conteúdo; o conteúdo de um nome nunca muda) e
+    Last-Modified; If-None-Match/If-Modified-Since respondem 304 e Range responde 206, o que
+    permite ao leitor de PDF carregar só as páginas abertas. Cache-Control é 'private' (são
+    documentos pessoais) com max-age de ARMAZENAMENTO_CACHE_MAX_AGE. Com ARMAZENAMENTO_ENVIO
+    'x-sendfile' ou 'x-accel', o worker só devolve os cabeçalhos e o servidor web envia os bytes.
+    """
+    relativo, _, sha256 = _localizar(nome, pasta)
+    return enviar_relativo(relativo, download_name or nome, as_attachment=as_attachment, etag=sha256 or True)
+
+
+def enviar_relativo(relativo, download_name, as_attachment=False, etag=True, max_age=None, imutavel=False):
+    """Envia o arquivo no caminho relativo a UPLOAD_FOLDER (ver enviar_arquivo); 404 se ele não existe."""
+    armazenamento = get_armazenamento()
+    caminho = safe_join(armazenamento.raiz, relativo) if relativo else None
+    if caminho is None or not os.path.isfile(caminho):
+        abort(404)
+
+    direto = armazenamento.envio == 'direto'
+    resposta = send_file(
+        caminho, request.environ, download_name=download_name, as_attachment=as_attachment, etag=etag,
+        max_age=armazenamento.cache_max_age if max_age is None else max_age, conditional=direto,
+        use_x_sendfile=not direto, response_class=current_app.response_class,
+    )
+    resposta.cache_control.public = None
+    resposta.cache_control.private = True
+    if imutavel:
+        resposta.cache_control.immutable = True
+    if not direto:
+        # O 304 sai daqui mesmo; o Range fica com o servidor web, que é quem lê o arquivo
+        resposta = resposta.make_conditional(request.environ)
+        if armazenamento.envio == 'x-accel':
+            del resposta.headers['X-Sendfile']
+            resposta.headers['X-Accel-Redirect'] = armazenamento.prefixo_x_accel + quote(relativo)
+    return resposta
+
+
+def remover_arquivo(nome, pasta=''):
+    """
+    Remove a referência deste nome. O arquivo físico só é apagado quando o blob fica sem
+    referências, e só depois do commit (um rollback mantém o arquivo). Não faz commit.
+    """
+    if not nome:
+        return
+    relativo, registro, _ = _localizar(nome, pasta)
+    if relativo is None:
+        return
+    if registro is not None:
+        db.session.delete(registro)
+        restantes = db.session.execute(
+            update(ArquivoBlob).where(ArquivoBlob.id == registro.blob_id)
+            .values(referencias=ArquivoBlob.referencias - 1).returning(ArquivoBlob.referencias)
+        ).scalar()
+        if restantes is None or restantes > 0:
+            return
+        db.session.execute(delete(PreviaArquivo).where(PreviaArquivo.blob_id == registro.blob_id))
+        db.session.execute(delete(ArquivoBlob).where(ArquivoBlob.id == registro.blob_id, ArquivoBlob.referencias <= 0))
+        for sufixo in SUFIXOS_DERIVADOS:
+            remover_apos_commit(get_armazenamento().absoluto(relativo + sufixo))
+    remover_apos_commit(get_armazenamento().absoluto(relativo))
+
+
+def remover_apos_commit(caminho):
+    """Agenda a remoção do arquivo (caminho absoluto) para depois do commit da sessão atual."""
+    db.session.info.setdefault('arquivos_a_remover', []).append(caminho)
+
+
+def remover_apos_rollback(caminho):
+    """
+    Agenda a remoção de um arquivo recém-publicado (caminho absoluto) caso a sessão atual
+    sofra rollback: sem a linha do blob, ninguém mais chegaria a ele.
+    """
+    db.session.info.setdefault('arquivos_publicados', []).append(caminho)
+
+
+def _remover_arquivos(caminhos):
+    for caminho in caminhos:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            current_app.logger.error(f"Erro ao remover o arquivo {caminho}: {e}")
+
+
+# Os dois eventos também disparam ao liberar/desfazer um SAVEPOINT (begin_nested); só o
+# fim da transação externa decide o destino dos arquivos
+@event.listens_for(Session, 'after_commit')
+def _remover_arquivos_apos_commit(sessao):
+    if sessao.in_nested_transaction():
+        return
+    sessao.info.pop('arquivos_publicados', None)
+    _remover_arquivos(sessao.info.pop('arquivos_a_remover', []))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_remocoes(sessao):
+    if sessao.in_nested_transaction():
+        return
+    sessao.info.pop('arquivos_a_remover', None)
+    _remover_arquivos(sessao.info.pop('arquivos_publicados', []))
+
+
+# --- Migração dos arquivos antigos ---
+
+# (tabela, coluna com o nome do arquivo, pasta onde os arquivos antigos ficam)
+FONTES_LEGADAS = [
+    ('documento', Documento.path_armazenamento, ''),
+    ('aviso_anexo', AvisoAnexo.path_armazenamento, ''),
+    ('denuncia_anexo', DenunciaAnexo.path_armazenamento, 'denuncias'),
+    ('ponto', Ponto.path_assinado, 'pontos'),
+    ('funcionario', Funcionario.foto_perfil, 'fotos_perfil'),
+]
+
+
+def _nomes_legados(coluna, depois, tamanho_lote):
+    """Próximo lote (ordenado, após 'depois') de nomes da coluna ainda sem vínculo em ArquivoArmazenado."""
+    return db.session.scalars(
+        select(coluna).distinct()
+        .where(coluna.is_not(None), coluna != '', coluna > depois,
+               ~select(ArquivoArmazenado.id).where(ArquivoArmazenado.nome == coluna).exists())
+        .order_by(coluna).limit(tamanho_lote)
+    ).all()
+
+
+def migrar_arquivo_legado(nome, pasta=''):
+    """
+    Passa o arquivo antigo <pasta>/<nome> para o armazenamento por conteúdo: cria (ou
+    referencia) o blob e o vínculo do nome. O arquivo antigo só é apagado depois do commit,
+    então ele continua sendo servido até lá. Não faz commit; False se o arquivo não existe.
+    """
+    armazenamento = get_armazenamento()
+    antigo = armazenamento.absoluto('/'.join(p for p in (pasta, nome) if p))
+    if not os.path.isfile(antigo):
+        return False
+    sha256, tamanho, temporario = armazenamento.importar_temporario(antigo)
+    blob_id = _registrar_blob(armazenamento, sha256, tamanho, temporario)
+    db.session.add(ArquivoArmazenado(nome=nome, pasta=pasta, blob_id=blob_id))
+    db.session.flush()
+    remover_apos_commit(antigo)
+    return True
+
+
+def migrar_arquivos_legados(tamanho_lote=500, pausa=0.0, simular=False, ao_concluir_lote=None):
+    """
+    Migra, em lotes com um commit cada, todos os arquivos antigos das pastas planas para
+    blobs/ab/cd/<sha256>-<geração>. Pode rodar com o sistema no ar e ser interrompida e retomada:
+    cada nome é resolvido pelo vínculo depois do commit do seu lote e pelo caminho antigo
+    antes dele. 'pausa' (segundos) alivia o disco entre os lotes. Os nomes nas tabelas não
+    mudam. Retorna {tabela: {'migrados': n, 'ausentes': n}}.
+    """
+    resumo = {}
+    for tabela, coluna, pasta in FONTES_LEGADAS:
+        contagem = resumo[tabela] = {'migrados': 0, 'ausentes': 0}
+        depois = ''
+        while nomes := _nomes_legados(coluna, depois, tamanho_lote):
+            for nome in nomes:
+                if simular:
+                    existe = os.path.isfile(get_armazenamento().absoluto('/'.join(p for p in (pasta, nome) if p)))
+                else:
+                    existe = migrar_arquivo_legado(nome, pasta)
+                contagem['migrados' if existe else 'ausentes'] += 1
+            depois = nomes[-1]
+            if not simular:
+                db.session.commit()
+            if ao_concluir_lote:
+                ao_concluir_lote(tabela, contagem)
+            if pausa:
+                time.sleep(pausa)
+    return resumo
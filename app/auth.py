@@ -1,18 +1,20 @@
 # app/auth.py
 
 from datetime import datetime, timezone
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app # type: ignore
+from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, jsonify # type: ignore
 from flask_login import login_user, logout_user, login_required, current_user # type: ignore
 from flask_mail import Message
 from sqlalchemy import func # <-- ADICIONADO: Import necessário para a correção
 from . import mail
-from app.models import TipoDocumento, RequisicaoDocumento, Funcionario, Usuario 
+from app.models import TipoDocumento, Funcionario, Usuario
 from . import db
 
 
 from ldap3.core.exceptions import LDAPBindError, LDAPException # LDAPException adicionado aqui
-from flask import current_app
-from ldap3 import Server, Connection, ALL
+from .ad_diretorio import get_diretorio_ad
+from .decorators import permission_required
+from .limite_login import get_limitador_login
+from .pendencias_admissao import gerar_pendencias_admissao
 import uuid
 
 
@@ -34,31 +36,25 @@ def login_post():
         flash('Usuário e senha são obrigatórios.')
         return redirect(url_for('auth.login_get'))
 
+    # Tentativas demais com falha: recusa antes de qualquer bind no AD ou hash de senha
+    # Com PROXY_FIX_X_FOR configurado, remote_addr já é o cliente resolvido, e não o proxy
+    ip_cliente = request.remote_addr
+    limitador = get_limitador_login()
+    espera = limitador.verificar(username, ip_cliente)
+    if espera:
+        current_app.logger.warning(f"Login de '{username}' ({ip_cliente}) recusado pelo limite de tentativas.")
+        flash(f'Muitas tentativas de login sem sucesso. Tente novamente em {espera} segundos.', 'danger')
+        return render_template('login.html'), 429, {'Retry-After': str(espera)}
+
     # --- TENTATIVA 1: Autenticação via Active Directory ---
     try:
-        domain = '.'.join([dc.split('=')[1] for dc in current_app.config['LDAP_BASE_DN'].split(',')])
-        user_for_bind = f'{username}@{domain}'
-
-        server = Server(current_app.config['LDAP_HOST'], get_info=ALL)
-        conn = Connection(server, user=user_for_bind, password=password, auto_bind=True)
-        
-        conn.search(
-            search_base=current_app.config['LDAP_BASE_DN'],
-            search_filter=f'(&(objectClass=person)(sAMAccountName={username}))',
-            attributes=['cn', 'mail', 'sAMAccountName']
-        )
-
-        if not conn.entries:
-            conn.unbind()
-            raise LDAPException(f"Usuário {username} autenticado, mas não foi possível buscar seus dados no AD.")
+        # Um bind + uma busca no Server compartilhado (domínio e schema/DSE já resolvidos)
+        dados_ad = get_diretorio_ad().autenticar(username, password)
+        ad_full_name = dados_ad['nome']
+        ad_email = dados_ad['email']
+        ad_username = dados_ad['username']
 
-        ad_user = conn.entries[0]
-        ad_full_name = ad_user.cn.value
-        ad_email = ad_user.mail.value if ad_user.mail else f"{username}@{domain}"
-        ad_username = ad_user.sAMAccountName.value
-        conn.unbind()
-
-        user = Usuario.query.filter(func.lower(Usuario.username) == func.lower(ad_username)).first()
+        user = Usuario.query.filter(func.lower(Usuario.username) == ad_username.lower()).first()
 
         if user:
             # Usuário encontrado! Sincroniza e corrige os dados.
@@ -121,8 +117,10 @@ def login_post():
 
     # --- TENTATIVA 2: Fallback para Autenticação Local ---
     if not user:
-        user = Usuario.query.filter(func.lower(Usuario.username) == func.lower(username)).first()
+        # O lower() fica só na coluna, o que permite usar o índice ix_usuario_username_lower
+        user = Usuario.query.filter(func.lower(Usuario.username) == username.lower()).first()
         if not user or not user.check_password(password):
+            limitador.registrar_falha(username, ip_cliente)
             flash('Usuário ou senha inválidos.')
             return redirect(url_for('auth.login_get'))
 
@@ -133,14 +131,9 @@ def login_post():
     
     # Processo de primeiro login para gerar pendências
     if not user.primeiro_login_completo and user.funcionario:
-        tipos_obrigatorios = TipoDocumento.query.filter_by(obrigatorio_na_admissao=True).all()
-        if tipos_obrigatorios:
-            for tipo in tipos_obrigatorios:
-                existe = RequisicaoDocumento.query.filter_by(
-                    destinatario_id=user.funcionario.id, tipo_documento_id=tipo.id
-                ).first()
-                if not existe:
-                    db.session.add(RequisicaoDocumento(destinatario_id=user.funcionario.id, tipo_documento_id=tipo.id, status='Pendente'))
+        # Um INSERT ... SELECT com as pendências que faltam (ver pendencias_admissao.py)
+        gerar_pendencias_admissao([user.funcionario.id])
+        if db.session.query(TipoDocumento.query.filter_by(obrigatorio_na_admissao=True).exists()).scalar():
             flash('Detectamos que este é seu primeiro acesso! Verifique suas pendências de documentos de admissão.', 'info')
         user.primeiro_login_completo = True
 
@@ -155,10 +148,19 @@ def login_post():
         flash('Ocorreu um erro ao finalizar o processo de login. Contate o suporte.', 'danger')
         return redirect(url_for('auth.login_get'))
 
+    limitador.registrar_sucesso(username)
     login_user(user)
     return redirect(url_for('main.index'))
 
 
+@auth.route('/api/limite-login/metricas')
+@login_required
+@permission_required(['admin_ti'])
+def metricas_limite_login():
+    """Métricas do limite de tentativas de login deste processo (worker)."""
+    return jsonify(get_limitador_login().metricas())
+
+
 @auth.route('/logout')
 @login_required # Garante que apenas usuários logados podem deslogar
 def logout():
@@ -0,0 +1,314 @@
+# app/busca.py
+
+import hashlib
+import heapq
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import current_app
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session, joinedload, lazyload
+from unidecode import unidecode
+
+from . import db
+from .models import Funcionario, Cargo, Setor
+from .utils import normalizar_nome
+
+
+# --- Normalização ---
+
+def normalizar_busca(texto):
+    """Remove acentos, converte para minúsculas e colapsa espaços (mantém dígitos e pontuação)."""
+    if not texto:
+        return ""
+    return re.sub(r'\s+', ' ', unidecode(texto).lower()).strip()
+
+
+def normalizar_termo(termo):
+    """Normaliza o termo digitado; termos que parecem CPF são reduzidos aos dígitos."""
+    termo = normalizar_busca(termo)
+    if termo and re.fullmatch(r'[\d.\-/ ]+', termo):
+        return re.sub(r'\D', '', termo)
+    return termo
+
+
+def texto_busca_funcionario(funcionario):
+    """Conteúdo da coluna 'Funcionario.busca': nome, apelido, e-mail e dígitos do CPF."""
+    partes = [
+        normalizar_nome(funcionario.nome),
+        normalizar_nome(funcionario.apelido),
+        normalizar_busca(funcionario.email),
+        re.sub(r'\D', '', funcionario.cpf or ''),
+    ]
+    return ' '.join(p for p in partes if p)
+
+
+def usa_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+# --- Índice de n-gramas em memória (fallback para SQLite) ---
+
+def ngramas(texto, n=3):
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+class IndiceNgramas:
+    """
+    Índice invertido trigrama -> ids, construído a partir da coluna 'busca' e dos
+    nomes de cargo/setor. Um termo só pode ocorrer como substring de um texto se
+    todos os seus trigramas estiverem nele, então a interseção das listas reduz os
+    candidatos antes da verificação final.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.textos = {}
+        self.total_gramas = {}
+        self.postings = defaultdict(set)
+
+    def construir(self, linhas):
+        for funcionario_id, texto in linhas:
+            gramas = ngramas(texto, self.n)
+            self.textos[funcionario_id] = texto
+            self.total_gramas[funcionario_id] = len(gramas)
+            for grama in gramas:
+                self.postings[grama].add(funcionario_id)
+        return self
+
+    def buscar(self, termo, limite=None):
+        gramas = ngramas(termo, self.n)
+        if gramas:
+            listas = sorted((self.postings.get(g, set()) for g in gramas), key=len)
+            candidatos = set(listas[0]).intersection(*listas[1:])
+        else:
+            # Termos curtos demais para formar um trigrama: varredura simples
+            candidatos = self.textos.keys()
+
+        resultados = []
+        for funcionario_id in candidatos:
+            texto = self.textos[funcionario_id]
+            posicao = texto.find(termo)
+            if posicao < 0:
+                continue
+            inicio_de_palavra = posicao == 0 or texto[posicao - 1] == ' '
+            # Todo trigrama do termo está no texto (veio da interseção), então a
+            # similaridade se reduz a |termo| / |texto|, sem montar os conjuntos de novo
+            total = self.total_gramas[funcionario_id]
+            pontuacao = (len(gramas) / total if total else 0.0) + (1.0 if inicio_de_palavra else 0.0)
+            resultados.append((-pontuacao, funcionario_id))
+
+        if limite:
+            return [(-p, i) for p, i in heapq.nsmallest(limite, resultados)]
+        resultados.sort()
+        return [(-p, i) for p, i in resultados]
+
+
+class GerenciadorIndiceBusca:
+    """
+    Mantém o índice em memória do app, reconstruindo-o quando os dados mudam.
+
+    Gravações neste processo incrementam a geração (ver _invalidar_indice). As feitas por
+    outros workers não são vistas aqui, então o índice também é refeito quando tem mais de
+    'ttl' segundos; ao expirar, a geração avança e o cache de sugestões cai junto.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.geracao = 0
+        self._indice = None
+        self._geracao_indice = -1
+        self._expira_em = 0.0
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        self.geracao += 1
+
+    def _valido(self):
+        return (self._indice is not None and self._geracao_indice == self.geracao
+                and time.monotonic() < self._expira_em)
+
+    def indice(self):
+        if self._valido():
+            return self._indice
+        with self._lock:
+            if not self._valido():
+                if self._indice is not None and self._geracao_indice == self.geracao:
+                    self.invalidar()  # expirado pelo TTL
+                geracao = self.geracao
+                self._indice = IndiceNgramas().construir(_linhas_para_indice())
+                self._geracao_indice = geracao
+                self._expira_em = time.monotonic() + self.ttl
+        return self._indice
+
+
+class CacheSugestoes:
+    """
+    Cache LRU, com TTL curto, das respostas do typeahead, por (termo normalizado, limite).
+
+    Cada entrada guarda a geração do índice de busca em que foi calculada; qualquer
+    gravação de Funcionario/Cargo/Setor neste processo incrementa a geração e descarta
+    as entradas. Gravações feitas por outros workers só aparecem após o TTL expirar.
+    """
+
+    def __init__(self, gerenciador, tamanho_maximo=512, ttl=30):
+        self.gerenciador = gerenciador
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # (termo, limite) -> (geracao, expira_em, itens, etag)
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            geracao, expira_em, itens, etag = entrada
+            if geracao != self.gerenciador.geracao or expira_em < agora:
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return itens, etag
+
+    def guardar(self, chave, geracao, itens, etag):
+        with self._lock:
+            # Se os dados mudaram durante a consulta, o resultado já nasce obsoleto
+            if geracao != self.gerenciador.geracao:
+                return
+            self._entradas[chave] = (geracao, time.monotonic() + self.ttl, itens, etag)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+
+def _linhas_para_indice():
+    linhas = db.session.query(Funcionario.id, Funcionario.busca, Cargo.nome, Setor.nome).outerjoin(
+        Cargo, Funcionario.cargo_id == Cargo.id
+    ).outerjoin(Setor, Funcionario.setor_id == Setor.id)
+    for funcionario_id, busca, cargo, setor in linhas:
+        texto = ' '.join(p for p in (busca, normalizar_busca(cargo), normalizar_busca(setor)) if p)
+        yield funcionario_id, texto
+
+
+def get_indice_busca():
+    return current_app.extensions['indice_busca']
+
+
+def get_cache_sugestoes():
+    return current_app.extensions['cache_sugestoes']
+
+
+# --- API pública ---
+
+def _ids_por_nome(modelo, termo):
+    """Ids de cargos/setores cujo nome contém o termo (tabelas pequenas, filtradas em memória)."""
+    return [i for i, nome in db.session.query(modelo.id, modelo.nome) if termo in normalizar_busca(nome)]
+
+
+def filtro_busca(termo):
+    """
+    Critério SQL para filtrar funcionários pelo termo, sem depender de JOIN com cargo/setor.
+    No PostgreSQL, o LIKE sobre a coluna normalizada é atendido pelo índice GIN pg_trgm.
+    """
+    termo = normalizar_termo(termo)
+    if not termo:
+        return None
+    return or_(
+        Funcionario.busca.contains(termo, autoescape=True),
+        Funcionario.cargo_id.in_(_ids_por_nome(Cargo, termo)),
+        Funcionario.setor_id.in_(_ids_por_nome(Setor, termo)),
+    )
+
+
+def buscar_funcionarios(termo, limite=50, filtros=()):
+    """Retorna até 'limite' funcionários que casam com o termo, ordenados por relevância."""
+    termo = normalizar_termo(termo)
+    if not termo:
+        return []
+
+    query = Funcionario.query.options(
+        joinedload(Funcionario.cargo),
+        joinedload(Funcionario.setor),
+        lazyload(Funcionario.sistemas)
+    ).filter(*filtros)
+
+    if usa_postgres():
+        relevancia = func.word_similarity(termo, Funcionario.busca)
+        return query.filter(filtro_busca(termo)).order_by(
+            relevancia.desc(), Funcionario.nome
+        ).limit(limite).all()
+
+    # SQLite: ranqueia no índice em memória e busca só os ids vencedores.
+    # Com filtros adicionais, pedimos mais candidatos para compensar os descartados.
+    candidatos = get_indice_busca().indice().buscar(termo, None if filtros else limite)
+    ids = [funcionario_id for _, funcionario_id in candidatos]
+    por_id = {}
+    for inicio in range(0, len(ids), 500):
+        lote = ids[inicio:inicio + 500]
+        por_id.update({f.id: f for f in query.filter(Funcionario.id.in_(lote))})
+        if limite and len(por_id) >= limite:
+            break
+    resultado = [por_id[i] for i in ids if i in por_id]
+    return resultado[:limite] if limite else resultado
+
+
+def sugestoes_funcionarios(termo, limite=10):
+    """
+    Resultados do typeahead: os 'limite' melhores funcionários já serializados, mais
+    um ETag calculado sobre o conteúdo (igual entre workers para os mesmos dados).
+    """
+    termo = normalizar_termo(termo)
+    if not termo:
+        return [], None
+
+    cache = get_cache_sugestoes()
+    chave = (termo, limite)
+    encontrado = cache.obter(chave)
+    if encontrado is not None:
+        return encontrado
+
+    geracao = get_indice_busca().geracao
+    itens = [{
+        "id": f.id,
+        "nome": f.nome,
+        "cpf": f.cpf,
+        "cargo": f.cargo.nome if f.cargo else 'N/A',
+        "setor": f.setor.nome if f.setor else 'N/A'
+    } for f in buscar_funcionarios(termo, limite=limite)]
+    etag = hashlib.sha1(json.dumps(itens, sort_keys=True).encode('utf-8')).hexdigest()
+    cache.guardar(chave, geracao, itens, etag)
+    return itens, etag
+
+
+def init_busca(app):
+    gerenciador = GerenciadorIndiceBusca(ttl=app.config.get('BUSCA_INDICE_TTL', 60))
+    app.extensions['indice_busca'] = gerenciador
+    app.extensions['cache_sugestoes'] = CacheSugestoes(
+        gerenciador,
+        tamanho_maximo=app.config.get('TYPEAHEAD_CACHE_MAXSIZE', 512),
+        ttl=app.config.get('TYPEAHEAD_CACHE_TTL', 30)
+    )
+
+
+# --- Manutenção da coluna normalizada e do índice ---
+
+@event.listens_for(Funcionario, 'before_insert')
+@event.listens_for(Funcionario, 'before_update')
+def _atualizar_coluna_busca(mapper, connection, funcionario):
+    funcionario.busca = texto_busca_funcionario(funcionario)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidar_indice(sessao, contexto):
+    alterados = list(sessao.new) + list(sessao.dirty) + list(sessao.deleted)
+    if not any(isinstance(obj, (Funcionario, Cargo, Setor)) for obj in alterados):
+        return
+    try:
+        get_indice_busca().invalidar()
+    except (RuntimeError, KeyError):
+        # Fora de um contexto de aplicação não há índice em memória a invalidar
+        pass
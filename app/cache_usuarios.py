@@ -0,0 +1,137 @@
+# app/cache_usuarios.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+
+from . import db
+
+
+class CacheUsuarios:
+    """
+    Cache LRU, com TTL curto, das identidades carregadas pelo user_loader.
+
+    Guarda um "retrato" desanexado (detached) de cada Usuario com o funcionário e as
+    permissões já carregados. A cada requisição o retrato é anexado à sessão com
+    merge(load=False), que não faz nenhuma consulta ao banco.
+
+    A chave inclui um contador de versão por usuário, incrementado sempre que o
+    Usuario, seu Funcionario ou suas permissões são gravados neste processo. Alterações
+    feitas por outros workers (inclusive permissões retiradas e desligamentos) só aparecem
+    após o TTL expirar: esse é o atraso máximo, ajustável por USER_CACHE_TTL.
+    """
+
+    def __init__(self, ttl=30, tamanho_maximo=1024):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._entradas = OrderedDict()  # user_id -> (versao, expira_em, retrato)
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def versao(self, user_id):
+        return self._versoes.get(user_id, 0)
+
+    def invalidar(self, user_id=None):
+        """Invalida um usuário (incrementando sua versão) ou o cache inteiro."""
+        with self._lock:
+            if user_id is None:
+                self._entradas.clear()
+                for uid in list(self._versoes):
+                    self._versoes[uid] += 1
+                return
+            self._versoes[user_id] = self._versoes.get(user_id, 0) + 1
+            self._entradas.pop(user_id, None)
+
+    def invalidar_funcionario(self, funcionario_id):
+        with self._lock:
+            alvos = [uid for uid, (_, _, retrato) in self._entradas.items()
+                     if retrato.funcionario_id == funcionario_id]
+        for uid in alvos:
+            self.invalidar(uid)
+
+    def obter(self, user_id):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is None:
+                return None
+            versao, expira_em, retrato = entrada
+            if versao != self._versoes.get(user_id, 0) or expira_em < agora:
+                del self._entradas[user_id]
+                return None
+            self._entradas.move_to_end(user_id)
+            return retrato
+
+    def guardar(self, user_id, versao, retrato):
+        with self._lock:
+            # Se o usuário foi alterado enquanto era carregado, o retrato já nasce obsoleto
+            if versao != self._versoes.get(user_id, 0):
+                return
+            self._entradas[user_id] = (versao, time.monotonic() + self.ttl, retrato)
+            self._entradas.move_to_end(user_id)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+
+def carregar_usuario_completo(user_id):
+    """Carrega usuário, funcionário e permissões em uma única consulta, fora da sessão da requisição."""
+    from .models import Usuario
+
+    with Session(db.engine, expire_on_commit=False) as sessao:
+        return sessao.query(Usuario).options(
+            joinedload(Usuario.funcionario),
+            joinedload(Usuario.permissoes)
+        ).filter(Usuario.id == user_id).first()
+
+
+def get_cache_usuarios(app=None):
+    app = app or current_app
+    return app.extensions['cache_usuarios']
+
+
+def carregar_usuario(user_id):
+    """Implementação do user_loader: usa o cache e anexa o retrato à sessão atual."""
+    if not current_app.config.get('USER_CACHE_ENABLED', True):
+        from .models import Usuario
+        return db.session.get(Usuario, user_id)
+
+    cache = get_cache_usuarios()
+    retrato = cache.obter(user_id)
+    if retrato is None:
+        versao = cache.versao(user_id)
+        retrato = carregar_usuario_completo(user_id)
+        if retrato is None:
+            return None
+        cache.guardar(user_id, versao, retrato)
+
+    # merge(load=False) copia o estado já carregado para a sessão sem ir ao banco
+    return db.session.merge(retrato, load=False)
+
+
+def init_cache_usuarios(app):
+    app.extensions['cache_usuarios'] = CacheUsuarios(
+        ttl=app.config.get('USER_CACHE_TTL', 30),
+        tamanho_maximo=app.config.get('USER_CACHE_MAXSIZE', 1024)
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidar_apos_flush(sessao, contexto):
+    """Incrementa a versão dos usuários cujo Usuario/Funcionario foi gravado."""
+    from .models import Usuario, Funcionario
+
+    try:
+        cache = get_cache_usuarios()
+    except (RuntimeError, KeyError):
+        # Fora de um contexto de aplicação (scripts, migrações) não há cache a invalidar
+        return
+
+    for obj in list(sessao.dirty) + list(sessao.deleted):
+        if isinstance(obj, Usuario) and obj.id is not None:
+            cache.invalidar(obj.id)
+        elif isinstance(obj, Funcionario) and obj.id is not None:
+            cache.invalidar_funcionario(obj.id)
@@ -9,6 +9,20 @@ class Config:
     """Configuração base que todas as outras herdarão."""
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(basedir, '..', 'uploads')
+    # Armazenamento de uploads (ver app/armazenamento.py): bloco de cópia e tamanho máximo por arquivo
+    ARMAZENAMENTO_TAMANHO_BLOCO = 1024 * 1024
+    ARMAZENAMENTO_TAMANHO_MAXIMO = int(os.environ.get('ARMAZENAMENTO_TAMANHO_MAXIMO') or 25 * 1024 * 1024)
+    # Corpo máximo da requisição: o maior arquivo aceito mais folga para os demais campos do
+    # formulário. Acima disso o Flask responde 413 antes de ler o upload para o disco
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH') or ARMAZENAMENTO_TAMANHO_MAXIMO + 1024 * 1024)
+    # Downloads: por quanto tempo o navegador reaproveita o arquivo sem revalidar e quem envia os bytes
+    # ('direto' = o worker; 'x-sendfile' = Apache/lighttpd; 'x-accel' = nginx, location interna no prefixo abaixo)
+    ARMAZENAMENTO_CACHE_MAX_AGE = int(os.environ.get('ARMAZENAMENTO_CACHE_MAX_AGE') or 3600)
+    ARMAZENAMENTO_ENVIO = os.environ.get('ARMAZENAMENTO_ENVIO') or 'direto'
+    ARMAZENAMENTO_X_ACCEL_PREFIXO = os.environ.get('ARMAZENAMENTO_X_ACCEL_PREFIXO') or '/_uploads/'
+    # Miniaturas das fotos de perfil (ver app/miniaturas.py): lados em pixels (2x o tamanho exibido) e qualidade
+    MINIATURAS_TAMANHOS = (64, 160, 320)
+    MINIATURAS_QUALIDADE = 80
     
     # Configurações de E-mail
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -18,6 +32,27 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_SENDER = os.environ.get('MAIL_SENDER')
 
+    # Fila de e-mails (outbox): workers do serviço 'flask email-drain --continuo', lote por
+    # conexão SMTP, vazão e retentativas
+    EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS') or 2)
+    EMAIL_LOTE = 50
+    EMAIL_TAXA_MAXIMA = float(os.environ.get('EMAIL_TAXA_MAXIMA') or 5)  # mensagens/segundo por processo; 0 = sem limite
+    EMAIL_MAX_TENTATIVAS = 5
+    EMAIL_BACKOFF_BASE = 30  # segundos
+    EMAIL_BACKOFF_MAXIMO = 3600
+    EMAIL_RESERVA_EXPIRA = 600
+    EMAIL_INTERVALO_VERIFICACAO = 5
+
+    # Prévias de PDF (ver app/previas.py): geradas fora do servidor web, por 'flask previas-processar --continuo'
+    PREVIAS_LOTE = 10
+    PREVIAS_LARGURA = 480
+    PREVIAS_QUALIDADE = 75
+    PREVIAS_MAX_PAGINAS = 50
+    PREVIAS_MAX_CARACTERES = 200_000
+    PREVIAS_MAX_TENTATIVAS = 3
+    PREVIAS_RESERVA_EXPIRA = 600
+    PREVIAS_INTERVALO_VERIFICACAO = int(os.environ.get('PREVIAS_INTERVALO_VERIFICACAO') or 15)
+
     # Carregando token
     SECRET_KEY = os.getenv('SECRET_KEY')
 
@@ -28,8 +63,70 @@ class Config:
     LDAP_USERS_DN = os.environ.get('LDAP_USERS_DN')
     LDAP_BIND_USER_DN = os.environ.get('LDAP_BIND_USER_DN')
     LDAP_BIND_USER_PASSWORD = os.environ.get('LDAP_BIND_USER_PASSWORD')
+    # Identidade usada no bind do login; {dominio} é derivado de LDAP_BASE_DN (ver app/ad_diretorio.py)
+    LDAP_FORMATO_BIND = os.environ.get('LDAP_FORMATO_BIND') or '{username}@{dominio}'
+    # Atributos do AD lidos no login (cn/mail/sAMAccountName): TTL em segundos (0 desliga) e tamanho máximo
+    LOGIN_CACHE_ATRIBUTOS_TTL = int(os.environ.get('LOGIN_CACHE_ATRIBUTOS_TTL') or 300)
+    LOGIN_CACHE_ATRIBUTOS_TAMANHO = 4096
+    # Limite de logins com falha em janela deslizante (ver app/limite_login.py); 0 desliga cada limite.
+    # Backend 'memoria' (por processo), 'redis' (compartilhado, requer o pacote redis) ou 'pacote.modulo:Classe'
+    LOGIN_LIMITE_JANELA = 300  # segundos
+    LOGIN_LIMITE_POR_USUARIO = int(os.environ.get('LOGIN_LIMITE_POR_USUARIO') or 5)
+    LOGIN_LIMITE_POR_IP = int(os.environ.get('LOGIN_LIMITE_POR_IP') or 30)
+    # O limite por IP usa o endereço do cliente. Atrás de proxy reverso (nginx, balanceador),
+    # informe quantos proxies confiáveis acrescentam X-Forwarded-For: sem isso, todos os logins
+    # parecem vir do proxy e dividem o mesmo limite. Com 0 o cabeçalho é ignorado, porque
+    # qualquer cliente poderia forjá-lo para escapar do limite.
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 0)
+    LOGIN_LIMITE_BACKEND = os.environ.get('LOGIN_LIMITE_BACKEND') or 'memoria'
+    LOGIN_LIMITE_REDIS_URL = os.environ.get('LOGIN_LIMITE_REDIS_URL')
+    LOGIN_LIMITE_MAX_CHAVES = 10000
+
+    # Pool de conexões da conta de serviço (ver app/ad_pool.py)
+    LDAP_POOL_TAMANHO = int(os.environ.get('LDAP_POOL_TAMANHO') or 4)
+    LDAP_POOL_ESPERA_MAXIMA = 10  # segundos aguardando uma conexão livre
+    LDAP_POOL_OCIOSIDADE_MAXIMA = 300  # descarta conexões paradas há mais tempo que isso
+    LDAP_POOL_VERIFICAR_APOS = 30  # verifica a conexão antes de reutilizá-la após esse tempo ocioso
+    # Sincronização em lote com o AD (ver app/ad_lote.py): requisições em voo e usernames por busca
+    AD_LOTE_CONCORRENCIA = int(os.environ.get('AD_LOTE_CONCORRENCIA') or 8)
+    AD_LOTE_BUSCA = 50
+    # Espelho local das contas do AD: intervalo entre sincronizações de 'flask ad-espelho-sync --continuo'
+    # e entre verificações da geração pelas consultas (segundos)
+    ESPELHO_AD_INTERVALO = int(os.environ.get('ESPELHO_AD_INTERVALO') or 60)
+    # Sem sincronização há mais tempo que isso (serviço parado), a verificação de username
+    # volta a consultar o AD diretamente em vez de confiar no espelho
+    ESPELHO_AD_ATRASO_MAXIMO = int(os.environ.get('ESPELHO_AD_ATRASO_MAXIMO') or 5 * ESPELHO_AD_INTERVALO)
+    # Análise de vínculos com o AD em segundo plano (funcionários por lote de progresso/INSERT)
+    ANALISE_AD_ASSINCRONA = True
+    ANALISE_AD_LOTE = 500
+    ANALISE_AD_EXPIRA = 3600  # execução 'executando' há mais tempo que isso é considerada abandonada
     AD_DEFAULT_PASSWORD = os.environ.get('AD_DEFAULT_PASSWORD')
 
+    # Cache de identidade do user_loader (segundos / número máximo de usuários). A invalidação é
+    # só local: permissões removidas ou um desligamento gravados por outro worker continuam valendo
+    # nos demais por até USER_CACHE_TTL segundos. Reduza o TTL (ou desligue o cache) se esse
+    # atraso não for aceitável.
+    USER_CACHE_ENABLED = True
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 30)
+    USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE') or 1024)
+
+    # Paginação da listagem de funcionários
+    FUNCIONARIOS_POR_PAGINA = int(os.environ.get('FUNCIONARIOS_POR_PAGINA') or 100)
+    FUNCIONARIOS_POR_PAGINA_MAX = 500
+
+    # Busca de funcionários (número de resultados por consulta)
+    BUSCA_LIMITE_PADRAO = 50
+    BUSCA_LIMITE_MAX = 500
+    # Índice de n-gramas em memória (só SQLite): refeito após esse tempo para ver gravações de outros workers
+    BUSCA_INDICE_TTL = int(os.environ.get('BUSCA_INDICE_TTL') or 60)
+
+    # Typeahead dos seletores de funcionário
+    TYPEAHEAD_LIMITE_PADRAO = 10
+    TYPEAHEAD_LIMITE_MAX = 50
+    TYPEAHEAD_CACHE_MAXSIZE = 512
+    # Alterações feitas por outros workers só aparecem no typeahead após esse tempo (segundos)
+    TYPEAHEAD_CACHE_TTL = int(os.environ.get('TYPEAHEAD_CACHE_TTL') or 30)
+
     # Pasta de arquivos 
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__name__)), 'uploads')
 
@@ -45,6 +142,8 @@ class TestingConfig(Config):
     # Usa um banco de dados SQLite em memória para os testes serem rápidos e isolados
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:' 
     WTF_CSRF_ENABLED = False # Desabilita tokens CSRF nos testes de formulário
+    EMAIL_WORKERS = 0 # A fila é processada explicitamente nos testes
+    ANALISE_AD_ASSINCRONA = False # O SQLite em memória não é compartilhado com outras threads
 
 # Dicionário para acessar as classes de configuração pelo nome
 config = {
@@ -0,0 +1,130 @@
+# app/correspondencia.py
+
+from rapidfuzz import fuzz, process
+
+from .utils import normalizar_nome
+
+try:
+    import numpy
+except ImportError:  # 'process.cdist' devolve uma matriz numpy; sem ela, só o modo por blocos
+    numpy = None
+
+# Partículas comuns em nomes brasileiros: entram na pontuação, mas não geram blocos
+# (quase todo nome tem um 'da' ou 'dos', e o bloco viraria a lista inteira)
+PARTICULAS = {'da', 'de', 'do', 'das', 'dos', 'e'}
+TAMANHO_PREFIXO = 3
+LINHAS_POR_LOTE_CDIST = 500
+
+
+def chave_ordenada(nome):
+    """Nome normalizado com os tokens em ordem alfabética: 'ratio' sobre duas chaves = 'token_sort_ratio' sobre os nomes."""
+    return ' '.join(sorted(normalizar_nome(nome).split()))
+
+
+def _blocos(chave):
+    return {token[:TAMANHO_PREFIXO] for token in chave.split() if token not in PARTICULAS}
+
+
+def _melhor_entre(resultados, limiar):
+    """
+    Aplica o mesmo critério de 'token_sort_ratio' + 'pontuacao > melhor' da análise original:
+    a pontuação é arredondada para inteiro e, no empate, vence a conta que vem primeiro.
+    Os resultados são pares (pontuação, posição).
+    """
+    melhor_pontuacao, melhor_posicao = 0, None
+    for pontuacao, posicao in resultados:
+        pontuacao = int(round(pontuacao))
+        if pontuacao < limiar:
+            continue
+        if pontuacao > melhor_pontuacao or (pontuacao == melhor_pontuacao and posicao < melhor_posicao):
+            melhor_pontuacao, melhor_posicao = pontuacao, posicao
+    return melhor_posicao, melhor_pontuacao
+
+
+class IndiceCorrespondencia:
+    """
+    Encontra, para cada nome de funcionário, a conta do AD com o nome mais parecido
+    (token_sort_ratio), sem percorrer o produto cartesiano em Python.
+
+    Os nomes das contas são normalizados uma única vez e indexados por bloco (prefixo de
+    3 letras de cada token, exceto partículas). Para cada funcionário só são pontuadas as
+    contas que compartilham algum bloco, e a pontuação roda no laço em C do rapidfuzz com
+    corte no limiar, que descarta pelo tamanho as que não podem alcançá-lo. Com numpy
+    instalado, 'modo="cdist"' pontua o produto completo em lotes de linhas, sem blocos.
+    """
+
+    def __init__(self, itens, nome=lambda item: item['displayName']):
+        self.itens = []
+        self.chaves = []
+        for item in itens:
+            chave = chave_ordenada(nome(item)) if nome(item) else ''
+            if chave:
+                self.itens.append(item)
+                self.chaves.append(chave)
+
+        # Contas com o mesmo nome normalizado têm a mesma pontuação: só a primeira pode vencer
+        self._unicas = {}
+        for posicao, chave in enumerate(self.chaves):
+            self._unicas.setdefault(chave, posicao)
+        self._por_bloco = {}
+        for chave, posicao in self._unicas.items():
+            for bloco in _blocos(chave):
+                self._por_bloco.setdefault(bloco, []).append(posicao)
+
+    def _candidatas(self, chave):
+        posicoes = set()
+        for bloco in _blocos(chave):
+            posicoes.update(self._por_bloco.get(bloco, ()))
+        return posicoes
+
+    def melhor(self, nome_funcionario, limiar=80):
+        """Retorna (item, pontuação) da melhor conta com pontuação >= limiar, ou (None, 0)."""
+        chave = chave_ordenada(nome_funcionario)
+        if not chave:
+            return None, 0
+        if chave in self._unicas:
+            # Nome idêntico: 100 é a pontuação máxima e nenhuma conta anterior com outro nome a alcança
+            return self.itens[self._unicas[chave]], 100
+        candidatas = self._candidatas(chave)
+        if not candidatas:
+            return None, 0
+        escolhas = {posicao: self.chaves[posicao] for posicao in candidatas}
+        resultados = process.extract(chave, escolhas, scorer=fuzz.ratio, processor=None,
+                                     score_cutoff=limiar - 0.5, limit=None)
+        posicao, pontuacao = _melhor_entre(((p, k) for _, p, k in resultados), limiar)
+        return (self.itens[posicao], pontuacao) if posicao is not None else (None, 0)
+
+    def correspondencias(self, nomes, limiar=80, modo='blocos'):
+        """
+        Gera (nome, item, pontuação) para cada nome com correspondência >= limiar.
+        Nomes repetidos são pontuados uma vez só.
+        """
+        if modo == 'cdist':
+            yield from self._correspondencias_cdist(nomes, limiar)
+            return
+        memo = {}
+        for nome in nomes:
+            chave = chave_ordenada(nome)
+            if chave not in memo:
+                memo[chave] = self.melhor(nome, limiar)
+            item, pontuacao = memo[chave]
+            if item is not None:
+                yield nome, item, pontuacao
+
+    def _correspondencias_cdist(self, nomes, limiar):
+        if numpy is None:
+            raise RuntimeError("O modo 'cdist' requer o numpy instalado.")
+        nomes = list(nomes)
+        chaves = [chave_ordenada(nome) for nome in nomes]
+        for inicio in range(0, len(nomes), LINHAS_POR_LOTE_CDIST):
+            lote = chaves[inicio:inicio + LINHAS_POR_LOTE_CDIST]
+            matriz = process.cdist(lote, self.chaves, scorer=fuzz.ratio, processor=None,
+                                   score_cutoff=limiar - 0.5, dtype=numpy.float32, workers=-1)
+            # numpy.rint arredonda como o round() do Python (metade para o par) e argmax devolve
+            # a primeira posição do máximo, o mesmo desempate da análise original
+            inteiras = numpy.rint(matriz)
+            for deslocamento, linha in enumerate(inteiras):
+                posicao = int(linha.argmax())
+                pontuacao = int(linha[posicao])
+                if lote[deslocamento] and pontuacao >= limiar:
+                    yield nomes[inicio + deslocamento], self.itens[posicao], pontuacao
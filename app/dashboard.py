@@ -0,0 +1,179 @@
+# app/dashboard.py
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Integer, and_, literal, literal_column, null, or_, select, func, type_coerce, union_all
+
+from . import db
+from .models import Aviso, LogCienciaAviso, RequisicaoDocumento, Ponto, Funcionario, TipoDocumento
+
+
+# Itens dos widgets: só as colunas que 'index.html' exibe (ver montar_dashboard)
+
+@dataclass
+class AvisoPendente:
+    id: int
+    titulo: str
+
+
+@dataclass
+class RequisicaoPendente:
+    id: int
+    tipo_nome: str
+    observacoes_rh: str | None = None
+
+
+@dataclass
+class PontoPendente:
+    id: int
+    tipo_ajuste: str
+    data_ajuste: date
+    observacao_rh: str | None = None
+
+
+@dataclass
+class Aniversariante:
+    id: int
+    nome: str
+    apelido: str | None
+    foto_perfil: str | None
+    data_nascimento: date
+
+
+@dataclass
+class DadosDashboard:
+    """Resultado consolidado da página inicial, consumido por 'index.html'."""
+    periodo_semana: str
+    avisos_pendentes: list = field(default_factory=list)
+    requisicoes_pendentes: list = field(default_factory=list)
+    pontos_pendentes: list = field(default_factory=list)
+    aniversariantes: list = field(default_factory=list)
+    # Preenchidos apenas para administradores (admin_rh / admin_ti)
+    total_funcionarios: int | None = None
+    total_avisos: int | None = None
+
+
+def dias_da_semana(hoje):
+    """Retorna a lista de datas (segunda a domingo) da semana de 'hoje'."""
+    inicio_semana = hoje - timedelta(days=hoje.weekday())
+    return [inicio_semana + timedelta(days=i) for i in range(7)]
+
+
+def filtro_avisos_nao_lidos(usuario_id):
+    """
+    Avisos ativos sem registro de ciência do usuário.
+    Usa um anti-join (NOT EXISTS) em vez de carregar todos os logs em memória.
+    """
+    ja_leu = select(LogCienciaAviso.id).where(
+        LogCienciaAviso.aviso_id == Aviso.id,
+        LogCienciaAviso.usuario_id == usuario_id
+    ).exists()
+    return and_(Aviso.arquivado == False, ~ja_leu)
+
+
+def filtro_aniversariantes(dias):
+    """Aniversário em um dos 'dias', em uma única condição mesmo na virada de mês/ano."""
+    mes = db.func.extract('month', Funcionario.data_nascimento)
+    dia = db.func.extract('day', Funcionario.data_nascimento)
+
+    dias_por_mes = {}
+    for d in dias:
+        dias_por_mes.setdefault(d.month, []).append(d.day)
+    condicoes = [and_(mes == m, dia.in_(ds)) for m, ds in dias_por_mes.items()]
+    return and_(Funcionario.data_nascimento.isnot(None), or_(*condicoes))
+
+
+def ordenar_aniversariantes(aniversariantes, dias):
+    """Ordena pela posição do dia na semana (dezembro antes de janeiro na virada do ano)."""
+    ordem = {(d.month, d.day): i for i, d in enumerate(dias)}
+    aniversariantes.sort(key=lambda f: ordem.get((f.data_nascimento.month, f.data_nascimento.day), 0))
+    return aniversariantes
+
+
+def aniversariantes_da_semana(dias):
+    """Busca os aniversariantes da semana em uma única consulta."""
+    return ordenar_aniversariantes(Funcionario.query.filter(filtro_aniversariantes(dias)).all(), dias)
+
+
+def contadores_admin():
+    """Totais da visão geral da empresa (funcionários ativos, avisos ativos) como subconsultas escalares."""
+    return (
+        select(func.count(Funcionario.id)).where(Funcionario.status == 'Ativo').scalar_subquery(),
+        select(func.count(Aviso.id)).where(Aviso.arquivado == False).scalar_subquery(),
+    )
+
+
+def _linha(widget, id=None, total=None, texto1=None, texto2=None, texto3=None, data=None):
+    """
+    Uma parte do UNION ALL de 'montar_dashboard'. Todas as partes têm as mesmas colunas; as que
+    não se aplicam ao widget vão como NULL. Os tipos do resultado vêm da primeira parte.
+    """
+    return select(
+        literal(widget).label('widget'),
+        (id if id is not None else type_coerce(null(), Integer)).label('id'),
+        (total if total is not None else type_coerce(null(), Integer)).label('total'),
+        (texto1 if texto1 is not None else null()).label('texto1'),
+        (texto2 if texto2 is not None else null()).label('texto2'),
+        (texto3 if texto3 is not None else null()).label('texto3'),
+        (data if data is not None else null()).label('data'),
+    )
+
+
+def montar_dashboard(usuario, hoje=None):
+    """
+    Monta todos os widgets do dashboard para o usuário informado em uma única consulta:
+    um UNION ALL com uma parte por widget (aniversariantes, avisos não lidos, requisições e
+    pontos pendentes e, para administradores, os totais da empresa), em que cada linha diz a
+    que widget pertence. Os widgets recebem só as colunas que o 'index.html' exibe.
+    """
+    hoje = hoje or datetime.utcnow().date()
+    dias = dias_da_semana(hoje)
+
+    dados = DadosDashboard(
+        periodo_semana=f"{dias[0].strftime('%d/%m')} - {dias[-1].strftime('%d/%m')}"
+    )
+
+    # Aniversariantes primeiro: a parte com colunas de verdade em todas as posições define os tipos
+    partes = [
+        _linha('aniversariante', Funcionario.id, texto1=Funcionario.nome, texto2=Funcionario.apelido,
+               texto3=Funcionario.foto_perfil, data=Funcionario.data_nascimento)
+        .where(filtro_aniversariantes(dias)),
+        _linha('aviso', Aviso.id, texto1=Aviso.titulo).where(filtro_avisos_nao_lidos(usuario.id)),
+    ]
+
+    funcionario_id = usuario.funcionario_id
+    if funcionario_id:
+        partes.append(
+            _linha('requisicao', RequisicaoDocumento.id, texto1=TipoDocumento.nome,
+                   texto2=RequisicaoDocumento.observacoes_rh)
+            .join_from(RequisicaoDocumento, TipoDocumento, RequisicaoDocumento.tipo_documento_id == TipoDocumento.id)
+            .where(RequisicaoDocumento.destinatario_id == funcionario_id, RequisicaoDocumento.status == 'Pendente')
+        )
+        partes.append(
+            _linha('ponto', Ponto.id, texto1=Ponto.tipo_ajuste, texto2=Ponto.observacao_rh, data=Ponto.data_ajuste)
+            .where(Ponto.funcionario_id == funcionario_id, Ponto.status == 'Pendente')
+        )
+
+    if usuario.tem_permissao(['admin_rh', 'admin_ti']):
+        total_funcionarios, total_avisos = contadores_admin()
+        partes.append(_linha('total_funcionarios', total=total_funcionarios))
+        partes.append(_linha('total_avisos', total=total_avisos))
+
+    consulta = union_all(*partes).order_by(literal_column('widget'), literal_column('id'))
+    for linha in db.session.execute(consulta):
+        if linha.widget == 'aniversariante':
+            dados.aniversariantes.append(Aniversariante(linha.id, linha.texto1, linha.texto2, linha.texto3, linha.data))
+        elif linha.widget == 'aviso':
+            dados.avisos_pendentes.append(AvisoPendente(linha.id, linha.texto1))
+        elif linha.widget == 'requisicao':
+            dados.requisicoes_pendentes.append(RequisicaoPendente(linha.id, linha.texto1, linha.texto2))
+        elif linha.widget == 'ponto':
+            dados.pontos_pendentes.append(PontoPendente(linha.id, linha.texto1, linha.data, linha.texto2))
+        elif linha.widget == 'total_funcionarios':
+            dados.total_funcionarios = linha.total
+        elif linha.widget == 'total_avisos':
+            dados.total_avisos = linha.total
+
+    ordenar_aniversariantes(dados.aniversariantes, dias)
+    return dados
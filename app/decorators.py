@@ -18,7 +18,7 @@ def permission_required(permissions):
                 abort(403)
             
             # Verifica se o usuário tem pelo menos UMA das permissões necessárias
-            if not any(current_user.tem_permissao(p) for p in permissions):
+            if not current_user.tem_permissao(permissions):
                 abort(403) # Forbidden
             
             return f(*args, **kwargs)
@@ -1,15 +1,17 @@
-import os
 import uuid
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required
 from werkzeug.utils import secure_filename
 from . import db
 from .models import Denuncia, DenunciaAnexo, Usuario, Permissao
 from .email import send_email
 from .decorators import permission_required
+from .armazenamento import ArquivoGrandeDemais, salvar_upload, enviar_arquivo
 
 denuncias_bp = Blueprint('denuncias', __name__)
 
+PASTA_DENUNCIAS = 'denuncias'
+
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'txt', 'mp3', 'wav', 'm4a'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -41,15 +43,14 @@ def canal():
             nova_denuncia = Denuncia(titulo=titulo, conteudo=conteudo, categoria=categoria, protocolo=protocolo)
             db.session.add(nova_denuncia)
             
-            upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'denuncias')
-            os.makedirs(upload_folder, exist_ok=True)
-
             for arquivo in anexos:
                 if arquivo and arquivo.filename != '' and allowed_file(arquivo.filename):
                     filename_seguro = secure_filename(arquivo.filename)
-                    extensao = filename_seguro.rsplit('.', 1)[1].lower()
-                    nome_unico = f"{uuid.uuid4()}.{extensao}"
-                    arquivo.save(os.path.join(upload_folder, nome_unico))
+                    try:
+                        nome_unico = salvar_upload(arquivo, PASTA_DENUNCIAS)
+                    except ArquivoGrandeDemais as e:
+                        flash(f'Anexo "{filename_seguro}" ignorado: {e}', 'warning')
+                        continue
                     novo_anexo = DenunciaAnexo(nome_arquivo_original=filename_seguro, path_armazenamento=nome_unico, denuncia=nova_denuncia)
                     db.session.add(novo_anexo)
 
@@ -73,8 +74,10 @@ def canal():
                                 denuncia=nova_denuncia
                             )
                             emails_enviados += 1
+                    db.session.commit()
                     current_app.logger.info(f"Notificação de nova denúncia (Protocolo: {nova_denuncia.protocolo}) enviada para {emails_enviados} admin(s) de RH.")
             except Exception as e:
+                db.session.rollback()
                 current_app.logger.error(f"Falha ao enviar e-mail de notificação de nova denúncia: {e}")
             # --- FIM DA CORREÇÃO ---
 
@@ -130,5 +133,4 @@ def ver_denuncia(denuncia_id):
 @login_required
 @permission_required('admin_rh')
 def download_anexo(filename):
-    denuncia_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'denuncias')
-    return send_from_directory(denuncia_folder, filename, as_attachment=True)
\ No newline at end of file
+    return enviar_arquivo(filename, PASTA_DENUNCIAS, as_attachment=True)
\ No newline at end of file
@@ -1,15 +1,16 @@
-import os
-import uuid
 from datetime import datetime
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, current_app, send_from_directory, jsonify)
+                   flash, current_app, jsonify)
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
-from .email import send_email
+from .email import send_email, send_email_em_lote
 from .utils import registrar_log  # <-- Importar a função de log
 from . import db
 from .decorators import permission_required
 from .models import Funcionario, Documento, RequisicaoDocumento, TipoDocumento 
+from .armazenamento import ArquivoGrandeDemais, salvar_upload, enviar_arquivo, remover_arquivo
+from .previas import enviar_previa, nomes_com_texto, previas_por_nome
 from app.forms import TipoDocumentoForm
 
 
@@ -67,7 +68,13 @@ def gestao_documentos():
         return redirect(url_for('documentos.gestao_documentos'))
 
     # Para GET, carrega os documentos para revisão e renderiza a página
-    documentos_para_revisar = Documento.query.filter_by(status='Pendente de Revisão').order_by(Documento.data_upload.asc()).all()
+    consulta = Documento.query.filter_by(status='Pendente de Revisão')
+    # 'q' filtra pelo texto extraído dos PDFs (ver app/previas.py)
+    termo = request.args.get('q', '').strip()
+    if termo:
+        consulta = consulta.filter(Documento.path_armazenamento.in_(nomes_com_texto(termo)))
+    documentos_para_revisar = consulta.order_by(Documento.data_upload.asc()).all()
+    previas = previas_por_nome([doc.path_armazenamento for doc in documentos_para_revisar])
     
     # --- ADIÇÕES AQUI ---
     # Buscamos todos os funcionários ativos para a lista de seleção
@@ -79,6 +86,8 @@ def gestao_documentos():
     return render_template(
         'documentos/gestao.html',
         documentos_para_revisar=documentos_para_revisar,
+        previas=previas,
+        termo=termo,
         funcionarios=funcionarios,          # <-- Passa a lista para o template
         tipos_documento=tipos_documento   # <-- Passa a lista para o template
     )
@@ -130,18 +139,21 @@ def solicitar_em_lote():
     db.session.commit()
 
     # --- CORREÇÃO ADICIONADA AQUI ---
-    # Loop para enviar e-mail para cada nova requisição criada
-    for req in requisicoes_criadas:
-        try:
-            # O 'req.destinatario' já é o objeto funcionário por causa do relationship
-            if req.destinatario and req.destinatario.email:
-                 send_email(req.destinatario.email,
-                           f"Nova Solicitacao de Documento: {tipo_doc.nome}",
-                           'email/nova_solicitacao_documento',
-                           requisicao=req,
-                           destinatario=req.destinatario)
-        except Exception as e:
-            current_app.logger.error(f"Falha ao enviar e-mail de solicitacao em lote para funcionario {req.destinatario_id}: {e}")
+    # Envia um e-mail para cada nova requisição criada, renderizando o template uma vez só
+    try:
+        if requisicoes_criadas:
+            # Recarrega as requisições (expiradas pelo commit) e seus destinatários em uma consulta
+            requisicoes = RequisicaoDocumento.query.options(
+                joinedload(RequisicaoDocumento.destinatario).lazyload(Funcionario.sistemas)
+            ).filter(RequisicaoDocumento.id.in_([r.id for r in requisicoes_criadas])).all()
+            send_email_em_lote(f"Nova Solicitacao de Documento: {tipo_doc.nome}",
+                               'email/nova_solicitacao_documento',
+                               ((req.destinatario.email, {'requisicao': req, 'destinatario': req.destinatario})
+                                for req in requisicoes if req.destinatario and req.destinatario.email))
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Falha ao enfileirar e-mails de solicitacao em lote: {e}")
     # --- FIM DA CORREÇÃO ---
 
     if sucessos > 0:
@@ -202,12 +214,11 @@ def upload_manual_documento():
 
     if file and allowed_file(file.filename):
         filename_seguro = secure_filename(file.filename)
-        extensao = filename_seguro.rsplit('.', 1)[1]
-        nome_unico = f"{uuid.uuid4()}.{extensao}"
-
-        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'])
-        os.makedirs(upload_path, exist_ok=True)
-        file.save(os.path.join(upload_path, nome_unico))
+        try:
+            nome_unico = salvar_upload(file)
+        except ArquivoGrandeDemais as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('documentos.gestao_documentos'))
 
         novo_documento = Documento(
             nome_arquivo=filename_seguro,
@@ -268,12 +279,11 @@ def upload_documento(funcionario_id):
 
     if file and allowed_file(file.filename):
         filename_seguro = secure_filename(file.filename)
-        extensao = filename_seguro.rsplit('.', 1)[1]
-        nome_unico = f"{uuid.uuid4()}.{extensao}"
-
-        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'])
-        os.makedirs(upload_path, exist_ok=True)
-        file.save(os.path.join(upload_path, nome_unico))
+        try:
+            nome_unico = salvar_upload(file)
+        except ArquivoGrandeDemais as e:
+            flash(str(e))
+            return redirect(url_for('documentos.ver_documentos_funcionario', funcionario_id=funcionario.id))
 
         novo_documento = Documento(
             nome_arquivo=filename_seguro,
@@ -300,7 +310,15 @@ def download_documento(filename):
     if not current_user.tem_permissao('admin_rh'):
         # Adicionar lógica para permitir que o próprio funcionário baixe seus documentos
         pass
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    return enviar_arquivo(filename, as_attachment=True)
+
+
+@documentos_bp.route('/previa/<filename>')
+@login_required
+@permission_required(['admin_rh', 'depto_pessoal'])
+def previa_documento(filename):
+    """Imagem da primeira página do documento, exibida na fila de revisão."""
+    return enviar_previa(filename)
 
 
 @documentos_bp.route('/funcionario/<int:funcionario_id>/solicitar', methods=['POST'])
@@ -329,7 +347,9 @@ def solicitar_documento(funcionario_id):
                        f"Nova Solicitação de Documento: {tipo_documento}",
                        'email/nova_solicitacao_documento',
                        requisicao=nova_requisicao)
+            db.session.commit()
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Falha ao enviar e-mail de solicitação de documento: {e}")
     # Fim da Lógica de Notificação
 
@@ -368,10 +388,8 @@ def remover_documento_api(documento_id):
     try:
         registrar_log(f"Removeu (via API) o documento '{documento.tipo_documento}' ({documento.nome_arquivo}) do funcionário '{documento.funcionario.nome}'.")
         
-        caminho_arquivo = os.path.join(current_app.config['UPLOAD_FOLDER'], documento.path_armazenamento)
-        if os.path.exists(caminho_arquivo):
-            os.remove(caminho_arquivo)
-            
+        # O arquivo só sai do disco após o commit e se nenhum outro registro usar o mesmo conteúdo
+        remover_arquivo(documento.path_armazenamento)
         db.session.delete(documento)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Documento removido com sucesso!'})
@@ -399,10 +417,7 @@ def responder_requisicao(req_id):
 
     try:
         filename_seguro = secure_filename(file.filename)
-        extensao = filename_seguro.rsplit('.', 1)[1]
-        nome_unico = f"{uuid.uuid4()}.{extensao}"
-        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'])
-        file.save(os.path.join(upload_path, nome_unico))
+        nome_unico = salvar_upload(file)
 
         novo_documento = Documento(
             nome_arquivo=filename_seguro,
@@ -419,6 +434,9 @@ def responder_requisicao(req_id):
         
         db.session.commit()
         return jsonify({'success': True, 'message': 'Documento enviado para revisão!'})
+    except ArquivoGrandeDemais as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 413
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Erro ao responder requisicao {req_id}: {e}")
@@ -472,7 +490,6 @@ def reprovar_documento(documento_id):
         funcionario_nome = documento.funcionario.nome
         funcionario_email = documento.funcionario.email
         documento_tipo = documento.tipo_documento
-        caminho_arquivo = os.path.join(current_app.config['UPLOAD_FOLDER'], documento.path_armazenamento)
         requisicao_original_id = documento.requisicao_id
         
         # --- ETAPA 2: Enviar o e-mail ANTES de qualquer alteração no banco ---
@@ -495,12 +512,9 @@ def reprovar_documento(documento_id):
                 requisicao.status = 'Pendente' 
                 requisicao.observacoes_rh = motivo
 
-        # Marcamos o documento para exclusão
+        # Marcamos o documento para exclusão; o arquivo físico é apagado após o commit
+        remover_arquivo(documento.path_armazenamento)
         db.session.delete(documento)
-        
-        # Deletamos o arquivo físico
-        if os.path.exists(caminho_arquivo):
-            os.remove(caminho_arquivo)
 
         # Efetivamos tudo no banco de uma só vez
         db.session.commit()
@@ -1,25 +1,296 @@
-from threading import Thread
-from flask import current_app, render_template
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, render_template
 from flask_mail import Message
-from . import mail
+from sqlalchemy import and_, event, insert, or_, update
+from sqlalchemy.orm import Session
+from . import db, mail
+from .models import EmailPendente
+
+
+# --- Enfileiramento ---
+
+def enfileirar_email(destinatario, assunto, corpo, commit=False):
+    """
+    Grava a mensagem na fila (outbox) dentro da transação de quem chama: o e-mail só existe
+    se a alteração que o motivou for confirmada, e é quem chama que faz o commit. O envio
+    fica a cargo dos workers do serviço de e-mails, que encontram a mensagem na fila.
+    """
+    pendente = EmailPendente(destinatario=destinatario, assunto=assunto, corpo=corpo)
+    db.session.add(pendente)
+    db.session.info['emails_novos'] = True
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    return pendente
 
-def send_async_email(app, msg):
-    """Função para ser executada em uma thread separada, enviando o e-mail em segundo plano."""
-    with app.app_context():
-        mail.send(msg)
 
 def send_email(to, subject, template, **kwargs):
-    """Função principal para enviar e-mails."""
-    app = current_app._get_current_object()
-    msg = Message(
-        subject,
-        sender=app.config['MAIL_SENDER'],
-        recipients=[to]
-    )
-    msg.body = render_template(template + '.txt', **kwargs)
+    """Função principal para enviar e-mails: renderiza o corpo e o coloca na fila (sem commit, ver 'enfileirar_email')."""
+    corpo = render_template(template + '.txt', **kwargs)
     # Para e-mails mais elaborados no futuro, podemos usar msg.html
-    
-    # Inicia uma thread para enviar o e-mail sem travar a aplicação
-    thr = Thread(target=send_async_email, args=[app, msg])
-    thr.start()
-    return thr
\ No newline at end of file
+    return enfileirar_email(to, subject, corpo)
+
+
+# --- Notificações em massa ---
+
+def renderizar_em_lote(template, destinatarios, **contexto_comum):
+    """
+    Gera (email, corpo) para cada item de 'destinatarios', um iterável de pares
+    (email, contexto_individual). O template é buscado e compilado uma única vez e
+    os context processors do Flask rodam uma única vez; por destinatário só há o render.
+    """
+    modelo = current_app.jinja_env.get_template(template + '.txt')
+    base = dict(contexto_comum)
+    current_app.update_template_context(base)
+    for email, contexto in destinatarios:
+        yield email, modelo.render({**base, **contexto})
+
+
+def send_email_em_lote(subject, template, destinatarios, tamanho_bloco=500, **contexto_comum):
+    """
+    Enfileira o mesmo template para vários destinatários (ver 'renderizar_em_lote').
+    Os corpos são consumidos à medida que são gerados e gravados na outbox em blocos
+    de INSERT. Como 'enfileirar_email', não faz commit: os e-mails entram na transação
+    de quem chama. Retorna o número de e-mails enfileirados.
+    """
+    total = 0
+    bloco = []
+    for email, corpo in renderizar_em_lote(template, destinatarios, **contexto_comum):
+        bloco.append({'destinatario': email, 'assunto': subject, 'corpo': corpo})
+        if len(bloco) >= tamanho_bloco:
+            db.session.execute(insert(EmailPendente), bloco)
+            total += len(bloco)
+            bloco = []
+    if bloco:
+        db.session.execute(insert(EmailPendente), bloco)
+        total += len(bloco)
+
+    if total:
+        db.session.info['emails_novos'] = True
+        db.session.flush()
+    return total
+
+
+# --- Controle de vazão ---
+
+class LimitadorTaxa:
+    """Token bucket simples, compartilhado pelos workers do processo (mensagens por segundo)."""
+
+    def __init__(self, por_segundo):
+        self.por_segundo = por_segundo
+        self._fichas = float(por_segundo or 0)
+        self._atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.por_segundo:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.por_segundo, self._fichas + (agora - self._atualizado_em) * self.por_segundo)
+                self._atualizado_em = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.por_segundo
+            time.sleep(espera)
+
+
+def atraso_para_tentativa(tentativas, base, maximo):
+    """Backoff exponencial: base, 2*base, 4*base... limitado a 'maximo' segundos."""
+    return min(base * (2 ** max(tentativas - 1, 0)), maximo)
+
+
+# --- Processamento da fila ---
+
+def _reservar_lote(tamanho):
+    """
+    Marca até 'tamanho' mensagens vencidas como 'enviando' e as devolve.
+    Cada linha é reservada com um UPDATE condicional (só passa se ela ainda estiver
+    disponível) e só entra no lote se o rowcount confirmar a reserva: dois workers nunca
+    ficam com a mesma mensagem, mesmo no SQLite, onde FOR UPDATE SKIP LOCKED não tem efeito.
+    No PostgreSQL, o SKIP LOCKED ainda evita que os workers esperem uns pelos outros.
+    Reservas abandonadas (worker que morreu no meio do envio) voltam a ficar disponíveis
+    após EMAIL_RESERVA_EXPIRA segundos.
+    """
+    agora = datetime.utcnow()
+    reserva_expirada = agora - timedelta(seconds=current_app.config['EMAIL_RESERVA_EXPIRA'])
+    disponivel = or_(
+        and_(EmailPendente.status == 'pendente', EmailPendente.proxima_tentativa_em <= agora),
+        and_(EmailPendente.status == 'enviando', EmailPendente.bloqueado_em < reserva_expirada),
+    )
+
+    candidatos = EmailPendente.query.filter(disponivel).order_by(EmailPendente.id) \
+        .limit(tamanho).with_for_update(skip_locked=True).all()
+
+    lote = []
+    for pendente in candidatos:
+        reserva = db.session.execute(
+            update(EmailPendente).where(EmailPendente.id == pendente.id, disponivel)
+            .values(status='enviando', bloqueado_em=agora)
+            .execution_options(synchronize_session=False)
+        )
+        if reserva.rowcount:
+            lote.append(pendente)
+    db.session.commit()
+    return lote
+
+
+def _registrar_falha(pendente, erro, contar_tentativa=True):
+    config = current_app.config
+    if contar_tentativa:
+        pendente.tentativas += 1
+    pendente.ultimo_erro = str(erro)[:2000]
+    pendente.bloqueado_em = None
+    if pendente.tentativas >= config['EMAIL_MAX_TENTATIVAS']:
+        pendente.status = 'falhou'
+        current_app.logger.error(f"E-mail {pendente.id} para {pendente.destinatario} descartado após {pendente.tentativas} tentativas: {erro}")
+        return
+    pendente.status = 'pendente'
+    atraso = atraso_para_tentativa(pendente.tentativas, config['EMAIL_BACKOFF_BASE'], config['EMAIL_BACKOFF_MAXIMO'])
+    pendente.proxima_tentativa_em = datetime.utcnow() + timedelta(seconds=atraso)
+
+
+def processar_lote(limitador=None):
+    """
+    Envia um lote da fila reaproveitando uma única conexão SMTP; o status de cada
+    mensagem é confirmado logo após o envio dela. Retorna (enviados, falhas); (0, 0) indica que não havia nada a enviar.
+    """
+    config = current_app.config
+    lote = _reservar_lote(config['EMAIL_LOTE'])
+    if not lote:
+        return 0, 0
+
+    enviados = falhas = 0
+    restantes = list(lote)
+    try:
+        with mail.connect() as conexao:
+            while restantes:
+                pendente = restantes[0]
+                if limitador:
+                    limitador.aguardar()
+                try:
+                    conexao.send(Message(pendente.assunto, sender=config['MAIL_SENDER'],
+                                         recipients=[pendente.destinatario], body=pendente.corpo))
+                except smtplib.SMTPServerDisconnected:
+                    # A conexão caiu: o restante do lote volta para a fila sem contar tentativa
+                    raise
+                except Exception as e:
+                    _registrar_falha(pendente, e)
+                    falhas += 1
+                else:
+                    pendente.status = 'enviado'
+                    pendente.enviado_em = datetime.utcnow()
+                    pendente.bloqueado_em = None
+                    enviados += 1
+                # Confirma a mensagem antes da próxima: se o processo cair no meio do lote,
+                # o que já saiu não volta para a fila e não é enviado de novo
+                db.session.commit()
+                restantes.pop(0)
+    except Exception as e:
+        # Falha ao conectar/autenticar ou conexão perdida: reagenda o que não foi enviado
+        current_app.logger.warning(f"Falha na conexão SMTP; {len(restantes)} e-mail(s) reagendado(s): {e}")
+        desconectado = isinstance(e, smtplib.SMTPServerDisconnected)
+        for pendente in restantes:
+            _registrar_falha(pendente, e, contar_tentativa=not desconectado)
+            falhas += 1
+
+    db.session.commit()
+    return enviados, falhas
+
+
+def processar_fila(max_lotes=None, limitador=None):
+    """Processa lotes até a fila não ter mais mensagens vencidas. Retorna (enviados, falhas)."""
+    total_enviados = total_falhas = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        enviados, falhas = processar_lote(limitador)
+        if not enviados and not falhas:
+            break
+        total_enviados += enviados
+        total_falhas += falhas
+        lotes += 1
+    return total_enviados, total_falhas
+
+
+class FilaEmails:
+    """
+    Pool de workers que consome a outbox. Roda só no processo dedicado aos e-mails
+    ('flask email-drain --continuo'): create_app não inicia threads, então o servidor web,
+    os comandos de CLI e os demais serviços não disputam a fila nem o limite de taxa.
+    Os workers verificam a fila a cada EMAIL_INTERVALO_VERIFICACAO segundos e são acordados
+    antes disso pelos commits com novos e-mails feitos no próprio processo.
+    O envio é espera de rede, não CPU, então alguns workers por processo bastam.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.num_workers = app.config.get('EMAIL_WORKERS', 2)
+        self.intervalo = app.config.get('EMAIL_INTERVALO_VERIFICACAO', 5)
+        self.limitador = LimitadorTaxa(app.config.get('EMAIL_TAXA_MAXIMA', 0))
+        self._evento = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def notificar(self):
+        # Sem workers neste processo, o aviso não tem quem acordar: o serviço de e-mails
+        # encontra a mensagem na próxima verificação
+        if self._workers:
+            self._evento.set()
+
+    def iniciar(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(max(self.num_workers, 1)):
+                worker = threading.Thread(target=self._executar, name=f'email-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def executar(self):
+        """Inicia os workers e bloqueia enquanto eles rodam."""
+        self.iniciar()
+        for worker in self._workers:
+            worker.join()
+
+    def _executar(self):
+        while True:
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            with self.app.app_context():
+                try:
+                    processar_fila(limitador=self.limitador)
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Erro no worker de e-mails: {e}")
+                finally:
+                    db.session.remove()
+
+
+def get_fila_emails():
+    return current_app.extensions['fila_emails']
+
+
+def init_fila_emails(app):
+    app.extensions['fila_emails'] = FilaEmails(app)
+
+
+# Os eventos também disparam nos SAVEPOINTs (begin_nested); só a transação externa conta
+@event.listens_for(Session, 'after_commit')
+def _notificar_workers(sessao):
+    if sessao.in_nested_transaction():
+        return
+    if sessao.info.pop('emails_novos', False) and has_app_context() and 'fila_emails' in current_app.extensions:
+        get_fila_emails().notificar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_aviso(sessao):
+    if sessao.in_nested_transaction():
+        return
+    sessao.info.pop('emails_novos', None)
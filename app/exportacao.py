@@ -0,0 +1,184 @@
+# app/exportacao.py
+
+import csv
+import zipfile
+import zlib
+from io import StringIO
+from xml.sax.saxutils import escape
+
+from . import db
+from .busca import filtro_busca
+from .models import Funcionario, Cargo, Setor
+
+
+def _data_br(valor):
+    return valor.strftime('%d/%m/%Y') if valor else ''
+
+
+# chave -> (cabeçalho, expressão SQL, formatação). Os cabeçalhos das colunas padrão são os
+# de static/modelo_importacao.csv, então o arquivo exportado pode ser reimportado.
+COLUNAS_EXPORTACAO = {
+    'nome': ('Nome Completo', Funcionario.nome, None),
+    'cpf': ('CPF', Funcionario.cpf, None),
+    'email': ('E-mail', Funcionario.email, None),
+    'telefone': ('Telefone', Funcionario.telefone, None),
+    'cargo': ('Cargo', Cargo.nome, None),
+    'setor': ('Setor', Setor.nome, None),
+    'data_nascimento': ('Data de Nascimento', Funcionario.data_nascimento, _data_br),
+    'contato_emergencia_nome': ('Contato de Emergencia (Nome)', Funcionario.contato_emergencia_nome, None),
+    'contato_emergencia_telefone': ('Contato de Emergencia (Telefone)', Funcionario.contato_emergencia_telefone, None),
+    'apelido': ('Apelido', Funcionario.apelido, None),
+    'status': ('Status', Funcionario.status, None),
+    'data_desligamento': ('Data de Desligamento', Funcionario.data_desligamento, _data_br),
+}
+COLUNAS_PADRAO = [
+    'nome', 'cpf', 'email', 'telefone', 'cargo', 'setor', 'data_nascimento',
+    'contato_emergencia_nome', 'contato_emergencia_telefone'
+]
+LINHAS_POR_LOTE = 1000
+
+
+def colunas_selecionadas(parametro):
+    """Interpreta '?colunas=nome,cpf,...'; chaves desconhecidas são ignoradas."""
+    if not parametro:
+        return list(COLUNAS_PADRAO)
+    colunas = [c.strip() for c in parametro.split(',') if c.strip() in COLUNAS_EXPORTACAO]
+    return colunas or list(COLUNAS_PADRAO)
+
+
+def consulta_exportacao(colunas, termo_busca='', status=None):
+    """
+    Seleciona só as colunas pedidas (tuplas, sem instanciar objetos do ORM), com cargo e
+    setor vindos de OUTER JOINs. 'yield_per' faz o PostgreSQL usar um cursor no servidor,
+    então as linhas chegam em lotes em vez de serem todas carregadas de uma vez.
+    """
+    query = db.session.query(*[COLUNAS_EXPORTACAO[c][1] for c in colunas]).select_from(Funcionario)
+    if 'cargo' in colunas:
+        query = query.outerjoin(Cargo, Funcionario.cargo_id == Cargo.id)
+    if 'setor' in colunas:
+        query = query.outerjoin(Setor, Funcionario.setor_id == Setor.id)
+    if status:
+        query = query.filter(Funcionario.status == status)
+    criterio = filtro_busca(termo_busca) if termo_busca else None
+    if criterio is not None:
+        query = query.filter(criterio)
+    return query.order_by(Funcionario.nome, Funcionario.id).yield_per(LINHAS_POR_LOTE)
+
+
+def _valores(linha, colunas):
+    for valor, chave in zip(linha, colunas):
+        formatar = COLUNAS_EXPORTACAO[chave][2]
+        yield formatar(valor) if formatar else ('' if valor is None else valor)
+
+
+def gerar_csv(query, colunas):
+    """Gera o CSV em pedaços de ~LINHAS_POR_LOTE linhas; a memória não cresce com o quadro."""
+    buffer = StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([COLUNAS_EXPORTACAO[c][0] for c in colunas])
+    for numero, linha in enumerate(query, start=1):
+        escritor.writerow(list(_valores(linha, colunas)))
+        if numero % LINHAS_POR_LOTE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def comprimir_gzip(pedacos):
+    """Aplica gzip sobre um gerador de bytes, sem acumular a resposta inteira."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for pedaco in pedacos:
+        comprimido = compressor.compress(pedaco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+# --- XLSX em streaming ---
+
+class _SaidaEmPedacos:
+    """Arquivo só de escrita e não pesquisável; o zipfile grava nele e nós esvaziamos os pedaços."""
+
+    def __init__(self):
+        self.pedacos = []
+        self.posicao = 0
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self.pedacos)
+        self.pedacos = []
+        return dados
+
+
+_XLSX_ESTATICOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Funcionarios" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _linha_xlsx(valores):
+    # Strings inline dispensam a tabela de strings compartilhadas (que exigiria guardar tudo em memória)
+    celulas = ''.join(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(v))}</t></is></c>' for v in valores)
+    return f'<row>{celulas}</row>'
+
+
+def gerar_xlsx(query, colunas):
+    """
+    Gera uma planilha XLSX mínima (uma aba, strings inline) em streaming: o zipfile escreve
+    em uma saída não pesquisável e cada pedaço comprimido é repassado assim que fica pronto.
+    """
+    saida = _SaidaEmPedacos()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for nome, conteudo in _XLSX_ESTATICOS.items():
+            arquivo_zip.writestr(nome, conteudo)
+        yield saida.esvaziar()
+
+        with arquivo_zip.open('xl/worksheets/sheet1.xml', 'w') as planilha:
+            planilha.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _linha_xlsx(COLUNAS_EXPORTACAO[c][0] for c in colunas)
+            ).encode('utf-8'))
+            for numero, linha in enumerate(query, start=1):
+                planilha.write(_linha_xlsx(_valores(linha, colunas)).encode('utf-8'))
+                if numero % LINHAS_POR_LOTE == 0:
+                    yield saida.esvaziar()
+            planilha.write(b'</sheetData></worksheet>')
+    yield saida.esvaziar()
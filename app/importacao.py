@@ -0,0 +1,189 @@
+# app/importacao.py
+
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.security import generate_password_hash
+
+from . import db
+from .busca import get_indice_busca, texto_busca_funcionario
+from .models import Funcionario, Usuario, Permissao, Cargo, Setor, permissoes_usuarios
+
+# Colunas de static/modelo_importacao.csv
+COLUNAS_MODELO = [
+    'Nome Completo', 'CPF', 'E-mail', 'Telefone', 'Cargo', 'Setor', 'Data de Nascimento',
+    'Contato de Emergencia (Nome)', 'Contato de Emergencia (Telefone)'
+]
+SENHA_PADRAO_IMPORTACAO = 'Mudar@123'
+
+
+@dataclass
+class ResultadoImportacao:
+    adicionados: int = 0
+    ignorados: list = field(default_factory=list)  # [{'linha': n, 'mensagem': ...}] já cadastrados
+    erros: list = field(default_factory=list)      # [{'linha': n, 'mensagem': ...}] linhas inválidas
+
+
+def insert_ignorando_conflitos(tabela):
+    """INSERT ... ON CONFLICT DO NOTHING no PostgreSQL/SQLite; INSERT simples nos demais bancos."""
+    dialeto = db.engine.dialect.name
+    if dialeto == 'postgresql':
+        return postgresql.insert(tabela).on_conflict_do_nothing()
+    if dialeto == 'sqlite':
+        return sqlite.insert(tabela).on_conflict_do_nothing()
+    return insert(tabela)
+
+
+def _detectar_delimitador(cabecalho):
+    # O Excel em pt-BR salva CSV com ';'; o modelo oficial usa ','
+    return ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+
+
+def _ler_linhas(arquivo_texto):
+    """Itera (número da linha, dicionário) com valores sem espaços nas pontas."""
+    cabecalho = arquivo_texto.readline()
+    delimitador = _detectar_delimitador(cabecalho)
+    colunas = [c.strip() for c in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    leitor = csv.DictReader(arquivo_texto, fieldnames=colunas, delimiter=delimitador)
+    for numero, linha in enumerate(leitor, start=2):
+        yield numero, {chave: (valor or '').strip() for chave, valor in linha.items() if chave}
+
+
+class _CacheCadastros:
+    """Resolve nomes de cargo/setor para ids, criando os que ainda não existem."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.ids = {nome.lower(): id_ for id_, nome in db.session.query(modelo.id, modelo.nome)}
+
+    def id_para(self, nome):
+        if not nome:
+            return None
+        chave = nome.lower()
+        if chave not in self.ids:
+            novo = self.modelo(nome=nome)
+            db.session.add(novo)
+            db.session.flush()
+            self.ids[chave] = novo.id
+        return self.ids[chave]
+
+
+def _validar_linha(numero, linha, cpfs, emails, resultado):
+    """Converte a linha do CSV em um mapeamento de Funcionario ou registra o motivo da recusa."""
+    nome, cpf, email = linha.get('Nome Completo', ''), linha.get('CPF', ''), linha.get('E-mail', '')
+    if not (nome and cpf and email):
+        resultado.erros.append({'linha': numero, 'mensagem': 'Nome Completo, CPF e E-mail são obrigatórios.'})
+        return None
+    if cpf in cpfs:
+        resultado.ignorados.append({'linha': numero, 'mensagem': f'CPF {cpf} já cadastrado.'})
+        return None
+    if email.lower() in emails:
+        resultado.ignorados.append({'linha': numero, 'mensagem': f'E-mail {email} já cadastrado.'})
+        return None
+
+    data_nascimento = None
+    if linha.get('Data de Nascimento'):
+        try:
+            data_nascimento = datetime.strptime(linha['Data de Nascimento'], '%d/%m/%Y').date()
+        except ValueError:
+            resultado.erros.append({'linha': numero, 'mensagem': f"Data de Nascimento inválida: '{linha['Data de Nascimento']}' (use DD/MM/AAAA)."})
+            return None
+
+    # Reserva CPF e e-mail para detectar duplicatas dentro do próprio arquivo
+    cpfs.add(cpf)
+    emails.add(email.lower())
+    return {
+        'linha': numero,
+        'nome': nome, 'cpf': cpf, 'email': email, 'telefone': linha.get('Telefone', ''),
+        'cargo': linha.get('Cargo', ''), 'setor': linha.get('Setor', ''),
+        'data_nascimento': data_nascimento,
+        'contato_emergencia_nome': linha.get('Contato de Emergencia (Nome)', ''),
+        'contato_emergencia_telefone': linha.get('Contato de Emergencia (Telefone)', ''),
+    }
+
+
+def _inserir_bloco(bloco, cargos, setores, hash_senha, permissao_id, resultado):
+    """Insere funcionários, usuários e permissões de um bloco com três INSERTs em lote."""
+    funcionarios = []
+    for dados in bloco:
+        mapeamento = {chave: valor for chave, valor in dados.items() if chave not in ('linha', 'cargo', 'setor')}
+        mapeamento['cargo_id'] = cargos.id_para(dados['cargo'])
+        mapeamento['setor_id'] = setores.id_para(dados['setor'])
+        mapeamento['status'] = 'Ativo'
+        # INSERTs em lote não disparam os eventos do ORM: a coluna de busca é preenchida aqui
+        mapeamento['busca'] = texto_busca_funcionario(SimpleNamespace(apelido=None, **mapeamento))
+        funcionarios.append(mapeamento)
+
+    inseridos = db.session.execute(
+        insert_ignorando_conflitos(Funcionario.__table__).returning(Funcionario.id, Funcionario.cpf),
+        funcionarios
+    ).all()
+    ids_por_cpf = {cpf: id_ for id_, cpf in inseridos}
+
+    usuarios = []
+    for dados in bloco:
+        if dados['cpf'] not in ids_por_cpf:
+            # Outro processo cadastrou o mesmo CPF entre a pré-carga e o INSERT
+            resultado.ignorados.append({'linha': dados['linha'], 'mensagem': f"CPF {dados['cpf']} já cadastrado."})
+            continue
+        usuarios.append({
+            'email': dados['email'], 'funcionario_id': ids_por_cpf[dados['cpf']],
+            'password_hash': hash_senha, 'senha_provisoria': False,
+        })
+    if not usuarios:
+        return
+
+    ids_usuarios = db.session.execute(
+        insert_ignorando_conflitos(Usuario.__table__).returning(Usuario.id), usuarios
+    ).scalars().all()
+    if ids_usuarios:
+        db.session.execute(insert(permissoes_usuarios),
+                           [{'usuario_id': id_, 'permissao_id': permissao_id} for id_ in ids_usuarios])
+    # Só as linhas de fato inseridas (RETURNING não devolve as descartadas pelo ON CONFLICT)
+    resultado.adicionados += len(ids_usuarios)
+
+
+def importar_funcionarios_csv(arquivo_texto, senha_padrao=SENHA_PADRAO_IMPORTACAO, tamanho_bloco=500):
+    """
+    Importa funcionários (e seus usuários com a permissão 'colaborador') de um CSV no
+    formato de static/modelo_importacao.csv.
+
+    O arquivo é lido em streaming e validado em blocos de 'tamanho_bloco' linhas. CPFs e
+    e-mails já cadastrados são pré-carregados em conjuntos (uma consulta cada), o hash da
+    senha padrão é calculado uma única vez e cada bloco é gravado com INSERTs em lote
+    (ON CONFLICT DO NOTHING). Tudo acontece em uma única transação, com um commit no final:
+    se a importação falhar no meio, nenhum funcionário do arquivo fica gravado. Linhas
+    recusadas são reportadas pelo número.
+    """
+    resultado = ResultadoImportacao()
+
+    permissao_colaborador = Permissao.query.filter_by(nome='colaborador').first()
+    if not permissao_colaborador:
+        permissao_colaborador = Permissao(nome='colaborador', descricao='Permissões básicas')
+        db.session.add(permissao_colaborador)
+        db.session.flush()
+    permissao_id = permissao_colaborador.id
+
+    cpfs = set(db.session.scalars(db.select(Funcionario.cpf)))
+    emails = {e.lower() for e in db.session.scalars(db.select(Usuario.email))}
+    cargos, setores = _CacheCadastros(Cargo), _CacheCadastros(Setor)
+    hash_senha = generate_password_hash(senha_padrao)
+
+    linhas = _ler_linhas(arquivo_texto)
+    while True:
+        lidas = list(islice(linhas, tamanho_bloco))
+        if not lidas:
+            break
+        bloco = [dados for dados in (_validar_linha(n, linha, cpfs, emails, resultado) for n, linha in lidas) if dados]
+        if bloco:
+            _inserir_bloco(bloco, cargos, setores, hash_senha, permissao_id, resultado)
+
+    db.session.commit()
+    if resultado.adicionados:
+        get_indice_busca().invalidar()
+    return resultado
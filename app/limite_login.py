@@ -0,0 +1,209 @@
+# app/limite_login.py
+
+import importlib
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+try:
+    import redis
+except ImportError:  # backend compartilhado opcional; sem ele, só o contador em memória
+    redis = None
+
+
+class BackendLimiteLogin(ABC):
+    """
+    Interface dos contadores de janela deslizante usados pelo LimitadorLogin.
+
+    Cada chave guarda os instantes (time.time()) das tentativas; só contam as que estão
+    dentro da janela. Implementações compartilhadas entre processos (ex.: Redis) permitem
+    que o limite valha para todos os workers, e não por processo.
+    """
+
+    @abstractmethod
+    def contar(self, chave, agora, janela):
+        """Retorna (tentativas dentro da janela, instante da mais antiga delas ou None)."""
+
+    @abstractmethod
+    def registrar(self, chave, agora, janela):
+        """Registra uma tentativa no instante 'agora'."""
+
+    @abstractmethod
+    def limpar(self, chave):
+        """Descarta as tentativas registradas para a chave."""
+
+
+class BackendMemoria(BackendLimiteLogin):
+    """Contadores no próprio processo: cada worker do gunicorn tem os seus."""
+
+    def __init__(self, max_chaves=10000, **_):
+        self.max_chaves = max_chaves
+        self._eventos = OrderedDict()  # chave -> deque de instantes, a chave usada mais recentemente no fim
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _podar(eventos, limite):
+        while eventos and eventos[0] <= limite:
+            eventos.popleft()
+
+    def contar(self, chave, agora, janela):
+        with self._lock:
+            eventos = self._eventos.get(chave)
+            if not eventos:
+                return 0, None
+            self._podar(eventos, agora - janela)
+            if not eventos:
+                del self._eventos[chave]
+                return 0, None
+            return len(eventos), eventos[0]
+
+    def registrar(self, chave, agora, janela):
+        with self._lock:
+            eventos = self._eventos.get(chave)
+            if eventos is None:
+                eventos = self._eventos[chave] = deque()
+            self._podar(eventos, agora - janela)
+            eventos.append(agora)
+            self._eventos.move_to_end(chave)
+            if len(self._eventos) > self.max_chaves:
+                self._compactar(agora - janela)
+
+    def _compactar(self, limite):
+        # Primeiro descarta as chaves cujas tentativas já saíram da janela; se ainda houver
+        # chaves demais (muitos IPs/usernames distintos), descarta as menos recentes
+        for chave in [c for c, eventos in self._eventos.items() if eventos[-1] <= limite]:
+            del self._eventos[chave]
+        while len(self._eventos) > self.max_chaves:
+            self._eventos.popitem(last=False)
+
+    def limpar(self, chave):
+        with self._lock:
+            self._eventos.pop(chave, None)
+
+
+class BackendRedis(BackendLimiteLogin):
+    """Contadores compartilhados em um sorted set do Redis por chave (membro único, score = instante)."""
+
+    def __init__(self, url=None, prefixo='limite_login:', cliente=None, **_):
+        if cliente is None:
+            if redis is None:
+                raise RuntimeError("O backend 'redis' do limite de login requer o pacote redis instalado.")
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.prefixo = prefixo
+
+    def contar(self, chave, agora, janela):
+        chave = self.prefixo + chave
+        pipe = self.cliente.pipeline()
+        pipe.zremrangebyscore(chave, 0, agora - janela)
+        pipe.zrange(chave, 0, 0, withscores=True)
+        pipe.zcard(chave)
+        _, mais_antiga, total = pipe.execute()
+        return total, (mais_antiga[0][1] if mais_antiga else None)
+
+    def registrar(self, chave, agora, janela):
+        chave = self.prefixo + chave
+        pipe = self.cliente.pipeline()
+        pipe.zremrangebyscore(chave, 0, agora - janela)
+        pipe.zadd(chave, {f'{agora}:{uuid.uuid4().hex[:8]}': agora})
+        pipe.expire(chave, int(math.ceil(janela)))
+        pipe.execute()
+
+    def limpar(self, chave):
+        self.cliente.delete(self.prefixo + chave)
+
+
+class LimitadorLogin:
+    """
+    Limite de tentativas de login com falha por username e por IP, em janela deslizante.
+
+    'verificar' é chamado antes de qualquer bind no AD ou checagem de hash: com o limite
+    atingido, o login é recusado na hora. Só as falhas contam (um escritório atrás do mesmo
+    IP não é bloqueado por logins corretos); um login bem-sucedido zera o contador do username.
+    """
+
+    def __init__(self, backend, max_por_usuario=5, max_por_ip=30, janela=300, relogio=time.time):
+        self.backend = backend
+        self.max_por_usuario = max_por_usuario
+        self.max_por_ip = max_por_ip
+        self.janela = janela
+        self.relogio = relogio
+        self._lock = threading.Lock()
+        self._metricas = dict.fromkeys(['verificacoes', 'rejeitadas_usuario', 'rejeitadas_ip', 'falhas_registradas'], 0)
+
+    @staticmethod
+    def _chaves(username, ip):
+        return f"u:{(username or '').strip().lower()}", f"ip:{ip or '-'}"
+
+    def _contar(self, nome):
+        with self._lock:
+            self._metricas[nome] += 1
+
+    def verificar(self, username, ip):
+        """Retorna None se a tentativa pode seguir ou os segundos até o limite liberar."""
+        agora = self.relogio()
+        self._contar('verificacoes')
+        chave_usuario, chave_ip = self._chaves(username, ip)
+        for chave, maximo, metrica in ((chave_usuario, self.max_por_usuario, 'rejeitadas_usuario'),
+                                       (chave_ip, self.max_por_ip, 'rejeitadas_ip')):
+            if not maximo:
+                continue
+            tentativas, mais_antiga = self.backend.contar(chave, agora, self.janela)
+            if tentativas >= maximo:
+                self._contar(metrica)
+                return max(1, int(math.ceil(mais_antiga + self.janela - agora)))
+        return None
+
+    def registrar_falha(self, username, ip):
+        agora = self.relogio()
+        self._contar('falhas_registradas')
+        for chave in self._chaves(username, ip):
+            self.backend.registrar(chave, agora, self.janela)
+
+    def registrar_sucesso(self, username):
+        self.backend.limpar(self._chaves(username, None)[0])
+
+    def metricas(self):
+        with self._lock:
+            dados = dict(self._metricas)
+        dados.update({
+            'rejeitadas': dados['rejeitadas_usuario'] + dados['rejeitadas_ip'],
+            'backend': type(self.backend).__name__,
+            'janela': self.janela,
+            'max_por_usuario': self.max_por_usuario,
+            'max_por_ip': self.max_por_ip,
+        })
+        return dados
+
+
+BACKENDS = {'memoria': BackendMemoria, 'redis': BackendRedis}
+
+
+def criar_backend(nome, **opcoes):
+    """'memoria', 'redis' ou o caminho 'pacote.modulo:Classe' de uma implementação de BackendLimiteLogin."""
+    if nome in BACKENDS:
+        return BACKENDS[nome](**opcoes)
+    modulo, _, classe = nome.partition(':')
+    return getattr(importlib.import_module(modulo), classe)(**opcoes)
+
+
+def get_limitador_login():
+    return current_app.extensions['limitador_login']
+
+
+def init_limitador_login(app):
+    config = app.config
+    backend = criar_backend(config.get('LOGIN_LIMITE_BACKEND') or 'memoria',
+                            url=config.get('LOGIN_LIMITE_REDIS_URL'),
+                            max_chaves=config.get('LOGIN_LIMITE_MAX_CHAVES', 10000))
+    app.extensions['limitador_login'] = LimitadorLogin(
+        backend,
+        max_por_usuario=config.get('LOGIN_LIMITE_POR_USUARIO', 5),
+        max_por_ip=config.get('LOGIN_LIMITE_POR_IP', 30),
+        janela=config.get('LOGIN_LIMITE_JANELA', 300),
+    )
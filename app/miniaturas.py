@@ -0,0 +1,118 @@
+# app/miniaturas.py
+
+import os
+import tempfile
+
+from flask import abort, current_app, request
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # sem Pillow, as fotos são servidas no tamanho original
+    Image = None
+
+from .armazenamento import caminho_arquivo, enviar_arquivo, enviar_relativo, get_armazenamento, remover_apos_commit
+
+PASTA_MINIATURAS = 'miniaturas'
+PASTA_FOTOS_PERFIL = 'fotos_perfil'  # só as fotos de perfil têm miniaturas
+FORMATOS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+UM_ANO = 365 * 24 * 3600
+
+
+def caminho_miniatura(nome, tamanho, extensao):
+    """
+    UPLOAD_FOLDER/miniaturas/<tamanho>/<2 primeiros caracteres>/<nome>.<extensao>. A chave é o
+    nome gravado, que muda sempre que a foto é trocada: a miniatura de um nome nunca fica velha.
+    """
+    return '/'.join([PASTA_MINIATURAS, str(tamanho), nome[:2], f'{nome}.{extensao}'])
+
+
+def gerar_miniatura(original, destino, tamanho, extensao):
+    """Recorta a imagem no quadrado central de tamanho x tamanho e grava em 'destino' (atomicamente)."""
+    with Image.open(original) as imagem:
+        # Em JPEG, o decodificador já entrega a imagem reduzida (1/2 a 1/8): fotos de celular
+        # de vários MB ficam baratas de abrir
+        imagem.draft('RGB', (tamanho, tamanho))
+        imagem = ImageOps.exif_transpose(imagem)
+        formato = FORMATOS[extensao]
+        modo = 'RGBA' if formato == 'WEBP' and imagem.mode in ('RGBA', 'LA', 'P') else 'RGB'
+        imagem = ImageOps.fit(imagem.convert(modo), (tamanho, tamanho), Image.Resampling.LANCZOS)
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as saida:
+            imagem.save(saida, formato, quality=current_app.config.get('MINIATURAS_QUALIDADE', 80))
+        os.replace(temporario, destino)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def foto_perfil(nome):
+    """Caminho absoluto da foto de perfil gravada com este nome; None se o nome não for de uma foto de perfil."""
+    original = caminho_arquivo(nome, PASTA_FOTOS_PERFIL)
+    return original if original is not None and os.path.isfile(original) else None
+
+
+def miniatura(nome, tamanho, extensao='webp', original=None):
+    """
+    Caminho relativo da miniatura da foto de perfil, gerada na primeira vez; None se o nome não
+    for de uma foto de perfil ou não for possível gerá-la. 'original' poupa a consulta quando
+    quem chama já localizou a foto.
+    """
+    original = original or foto_perfil(nome)
+    if original is None:
+        return None
+    relativo = caminho_miniatura(nome, tamanho, extensao)
+    destino = get_armazenamento().absoluto(relativo)
+    if os.path.exists(destino):
+        return relativo
+
+    if Image is None:
+        return None
+    try:
+        gerar_miniatura(original, destino, tamanho, extensao)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        current_app.logger.warning(f"Não foi possível gerar a miniatura de {nome}: {e}")
+        return None
+    return relativo
+
+
+def gerar_miniaturas(nome):
+    """Gera as miniaturas WebP de todos os tamanhos; chamado no upload, para o primeiro acesso já achá-las prontas."""
+    original = foto_perfil(nome)
+    if original is None:
+        return
+    for tamanho in current_app.config['MINIATURAS_TAMANHOS']:
+        miniatura(nome, tamanho, original=original)
+
+
+def remover_miniaturas(nome):
+    """Agenda a remoção de todas as miniaturas do nome para depois do commit (junto com a foto)."""
+    if not nome:
+        return
+    armazenamento = get_armazenamento()
+    for tamanho in current_app.config['MINIATURAS_TAMANHOS']:
+        for extensao in FORMATOS:
+            remover_apos_commit(armazenamento.absoluto(caminho_miniatura(nome, tamanho, extensao)))
+
+
+def enviar_miniatura(nome, tamanho):
+    """
+    Resposta com a miniatura da foto de perfil (WebP se o navegador aceitar, senão JPEG), com
+    cache de um ano e 'immutable'. Sem Pillow ou com imagem ilegível, cai para a foto original;
+    um nome que não seja de foto de perfil (documento, anexo) responde 404.
+    """
+    if tamanho not in current_app.config['MINIATURAS_TAMANHOS']:
+        abort(404)
+    original = foto_perfil(nome)
+    if original is None:
+        abort(404)
+    extensao = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpg'
+    relativo = miniatura(nome, tamanho, extensao, original)
+    if relativo is None:
+        return enviar_arquivo(nome, PASTA_FOTOS_PERFIL)
+
+    resposta = enviar_relativo(relativo, f"{nome.rsplit('.', 1)[0]}.{extensao}", max_age=UM_ANO, imutavel=True)
+    resposta.vary.add('Accept')
+    return resposta
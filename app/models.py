@@ -26,6 +26,8 @@ funcionario_sistemas = db.Table('funcionario_sistemas',
 
 class Usuario(db.Model, UserMixin):
     __tablename__ = 'usuario'
+    # O login procura o username sem diferenciar maiúsculas: lower(username) = :username_minusculo
+    __table_args__ = (db.Index('ix_usuario_username_lower', db.func.lower(db.text('username'))),)
     id = db.Column(db.Integer, primary_key=True)
 
     # CAMPO ADICIONADO: Essencial para o login e vínculo com o AD
@@ -54,13 +56,40 @@ class Usuario(db.Model, UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    @property
+    def nomes_permissoes(self):
+        """Nomes das permissões do usuário (frozenset), calculados uma vez e guardados na instância."""
+        nomes = self.__dict__.get('_cache_permissoes')
+        if nomes is None:
+            nomes = frozenset(p.nome for p in self.permissoes)
+            self.__dict__['_cache_permissoes'] = nomes
+        return nomes
+
+    def invalidar_cache_permissoes(self):
+        """Descarta o cache de permissões; deve ser chamado após editar 'permissoes'."""
+        self.__dict__.pop('_cache_permissoes', None)
+
     def tem_permissao(self, nome_permissao):
-        """Verifica se o usuário tem uma permissão específica."""
-        if isinstance(nome_permissao, list):
-            return any(p.nome in nome_permissao for p in self.permissoes)
-        return any(p.nome == nome_permissao for p in self.permissoes)
+        """Verifica se o usuário tem uma permissão específica (ou ao menos uma de uma lista)."""
+        if isinstance(nome_permissao, (list, tuple, set, frozenset)):
+            return not self.nomes_permissoes.isdisjoint(nome_permissao)
+        return nome_permissao in self.nomes_permissoes
     
     
+@db.event.listens_for(Usuario.permissoes, 'append')
+@db.event.listens_for(Usuario.permissoes, 'remove')
+@db.event.listens_for(Usuario.permissoes, 'bulk_replace')
+def _permissoes_alteradas(usuario, *args, **kwargs):
+    usuario.invalidar_cache_permissoes()
+
+@db.event.listens_for(Usuario, 'expire')
+@db.event.listens_for(Usuario, 'refresh')
+def _usuario_recarregado(usuario, *args, **kwargs):
+    # Ao expirar um estado cujo objeto já foi coletado pelo GC, o SQLAlchemy passa None
+    if usuario is not None:
+        usuario.invalidar_cache_permissoes()
+
+
 class Permissao(db.Model):
     __tablename__ = 'permissao'
     id = db.Column(db.Integer, primary_key=True)
@@ -69,6 +98,8 @@ class Permissao(db.Model):
 
 class Funcionario(db.Model):
     __tablename__ = 'funcionario'
+    # Índice composto que atende à listagem paginada por chave (ORDER BY nome, id)
+    __table_args__ = (db.Index('ix_funcionario_nome_id', 'nome', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
     status = db.Column(db.String(50), default='Ativo', nullable=False)
@@ -76,8 +107,8 @@ class Funcionario(db.Model):
     email = db.Column(db.String(120), nullable=False)
     telefone = db.Column(db.String(50))
 
-    cargo_id = db.Column(db.Integer, db.ForeignKey('cargo.id'), nullable=True)
-    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id'), nullable=True)
+    cargo_id = db.Column(db.Integer, db.ForeignKey('cargo.id'), nullable=True, index=True)
+    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id'), nullable=True, index=True)
     cargo = db.relationship('Cargo', backref='funcionarios')
     setor = db.relationship('Setor', backref='funcionarios')
 
@@ -88,6 +119,9 @@ class Funcionario(db.Model):
     apelido = db.Column(db.String(50), nullable=True)
     data_desligamento = db.Column(db.Date, nullable=True)
 
+    # Texto normalizado (sem acentos, minúsculo) para a busca; mantido por app/busca.py
+    busca = db.Column(db.Text, nullable=True)
+
     sistemas = db.relationship('Sistema', secondary=funcionario_sistemas, lazy='subquery',
                                backref=db.backref('funcionarios', lazy=True))
 
@@ -160,6 +194,11 @@ class Feedback(db.Model):
 
 class RequisicaoDocumento(db.Model):
     __tablename__ = 'requisicao_documento'
+    # Uma requisição de admissão por (funcionário, tipo); solicitações manuais do RH podem se repetir
+    __table_args__ = (
+        db.Index('uq_requisicao_admissao', 'destinatario_id', 'tipo_documento_id', unique=True,
+                 postgresql_where=db.text("origem = 'admissao'"), sqlite_where=db.text("origem = 'admissao'")),
+    )
     id = db.Column(db.Integer, primary_key=True)
     
     # --- AJUSTE 1: REMOVIDA A COLUNA REDUNDANTE ---
@@ -174,6 +213,8 @@ class RequisicaoDocumento(db.Model):
     data_conclusao = db.Column(db.DateTime, nullable=True)
     data_ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     observacoes_rh = db.Column(db.Text, nullable=True) 
+    # 'admissao' para as geradas por app/pendencias_admissao.py; NULL nas solicitações manuais
+    origem = db.Column(db.String(20), nullable=True)
 
     # Chaves estrangeiras (Sua definição aqui está perfeita)
     tipo_documento_id = db.Column(db.Integer, db.ForeignKey('tipo_documento.id'), nullable=False)
@@ -308,4 +349,154 @@ class VinculoADSugestao(db.Model):
     funcionario = db.relationship('Funcionario')
 
     def __repr__(self):
-        return f'<VinculoADSugestao {self.funcionario_nome} -> {self.ad_display_name}>'
\ No newline at end of file
+        return f'<VinculoADSugestao {self.funcionario_nome} -> {self.ad_display_name}>'
+
+class AnaliseVinculoAD(db.Model):
+    """Execução em segundo plano da análise de vínculos com o AD (ver app/analise_ad.py)."""
+    __tablename__ = 'vinculo_ad_analise'
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)  # pendente, executando, concluida, falhou
+    progresso = db.Column(db.Integer, nullable=False, default=0)  # percentual
+    total_funcionarios = db.Column(db.Integer, nullable=False, default=0)
+    processados = db.Column(db.Integer, nullable=False, default=0)
+    sugestoes = db.Column(db.Integer, nullable=False, default=0)
+    erro = db.Column(db.Text, nullable=True)
+    solicitado_por_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+
+    solicitado_por = db.relationship('Usuario')
+
+    @property
+    def em_andamento(self):
+        return self.status in ('pendente', 'executando')
+
+    @property
+    def duracao(self):
+        """Duração em segundos (até agora, se ainda estiver executando)."""
+        if not self.iniciado_em:
+            return None
+        return ((self.concluido_em or datetime.utcnow()) - self.iniciado_em).total_seconds()
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'status': self.status, 'progresso': self.progresso,
+            'total_funcionarios': self.total_funcionarios, 'processados': self.processados,
+            'sugestoes': self.sugestoes, 'erro': self.erro,
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None,
+            'duracao': round(self.duracao, 2) if self.duracao is not None else None,
+        }
+
+    def __repr__(self):
+        return f'<AnaliseVinculoAD {self.id} {self.status} {self.progresso}%>'
+
+class EmailPendente(db.Model):
+    """Fila persistente de e-mails (outbox), consumida pelos workers de app/email.py."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (db.Index('ix_email_outbox_status_proxima', 'status', 'proxima_tentativa_em'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    assunto = db.Column(db.String(255), nullable=False)
+    corpo = db.Column(db.Text, nullable=False)
+    # pendente -> enviando -> enviado | falhou
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    bloqueado_em = db.Column(db.DateTime, nullable=True)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    enviado_em = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<EmailPendente {self.id} {self.status} -> {self.destinatario}>'
+
+
+class UsuarioADEspelho(db.Model):
+    """Cópia local das contas de usuário do AD, atualizada por app/ad_espelho.py."""
+    __tablename__ = 'ad_espelho_usuario'
+    __table_args__ = (db.Index('ix_ad_espelho_usuario_sam_lower', db.func.lower(db.text('sam_account_name'))),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    object_guid = db.Column(db.String(64), unique=True, nullable=False)
+    sam_account_name = db.Column(db.String(120), nullable=False)
+    display_name = db.Column(db.String(255), nullable=True)
+    mail = db.Column(db.String(255), nullable=True)
+    user_account_control = db.Column(db.Integer, nullable=True)
+    usn_changed = db.Column(db.BigInteger, nullable=False, default=0)
+    distinguished_name = db.Column(db.String(512), nullable=True)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @property
+    def ativo(self):
+        # Bit 2 (ACCOUNTDISABLE) de userAccountControl
+        return not (self.user_account_control or 0) & 2
+
+    def __repr__(self):
+        return f'<UsuarioADEspelho {self.sam_account_name}>'
+
+
+class EstadoEspelhoAD(db.Model):
+    """Marca d'água (uSNChanged) e geração da última sincronização do espelho do AD."""
+    __tablename__ = 'ad_espelho_estado'
+    id = db.Column(db.Integer, primary_key=True)
+    servidor = db.Column(db.String(255), nullable=True)
+    usn_maximo = db.Column(db.BigInteger, nullable=False, default=0)
+    geracao = db.Column(db.Integer, nullable=False, default=0)
+    ultima_sincronizacao = db.Column(db.DateTime, nullable=True)
+    ultima_sincronizacao_completa = db.Column(db.DateTime, nullable=True)
+
+
+class ArquivoBlob(db.Model):
+    """Conteúdo de um arquivo enviado, guardado uma única vez por SHA-256 (ver app/armazenamento.py)."""
+    __tablename__ = 'arquivo_blob'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    tamanho = db.Column(db.BigInteger, nullable=False)
+    caminho = db.Column(db.String(255), nullable=False)  # relativo a UPLOAD_FOLDER
+    referencias = db.Column(db.Integer, nullable=False, default=0)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArquivoBlob {self.sha256[:12]} ({self.referencias} ref.)>'
+
+
+class ArquivoArmazenado(db.Model):
+    """
+    Nome de arquivo gravado nas tabelas (path_armazenamento, path_assinado, foto_perfil)
+    apontando para o blob com o conteúdo. Cada nome é uma referência ao blob.
+    """
+    __tablename__ = 'arquivo_armazenado'
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(512), unique=True, nullable=False)
+    pasta = db.Column(db.String(50), nullable=False, default='')
+    blob_id = db.Column(db.Integer, db.ForeignKey('arquivo_blob.id'), nullable=False, index=True)
+    nome_original = db.Column(db.String(255), nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    blob = db.relationship('ArquivoBlob')
+
+
+class PreviaArquivo(db.Model):
+    """
+    Prévia de um PDF (imagem da primeira página e texto extraído), gerada uma única vez por
+    conteúdo pelo processo de prévias (app/previas.py). A imagem fica ao lado do blob (<caminho>.previa.webp).
+    """
+    __tablename__ = 'previa_arquivo'
+    id = db.Column(db.Integer, primary_key=True)
+    blob_id = db.Column(db.Integer, db.ForeignKey('arquivo_blob.id', ondelete='CASCADE'), unique=True, nullable=False)
+    # pendente -> processando -> pronta | erro
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    bloqueado_em = db.Column(db.DateTime, nullable=True)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    paginas = db.Column(db.Integer, nullable=True)
+    tem_imagem = db.Column(db.Boolean, nullable=False, default=False)
+    texto = db.Column(db.Text, nullable=True)
+    texto_busca = db.Column(db.Text, nullable=True)  # texto normalizado (sem acentos, minúsculo) para a busca
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processado_em = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<PreviaArquivo blob={self.blob_id} {self.status}>'
@@ -0,0 +1,68 @@
+# app/paginacao.py
+
+import base64
+import json
+from dataclasses import dataclass, field
+
+from sqlalchemy import and_, or_
+
+
+@dataclass
+class PaginaKeyset:
+    """Uma página de resultados paginados por chave (seek), sem OFFSET nem COUNT."""
+    items: list = field(default_factory=list)
+    proximo_cursor: str | None = None
+    por_pagina: int = 0
+
+    @property
+    def tem_proxima(self):
+        return self.proximo_cursor is not None
+
+
+def codificar_cursor(*valores):
+    """Serializa os valores da última linha da página em um token seguro para URL."""
+    bruto = json.dumps(valores, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Inverso de 'codificar_cursor'. Cursores malformados são tratados como ausentes."""
+    if not cursor:
+        return None
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+    except (ValueError, TypeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def paginar_keyset(query, colunas, cursor=None, por_pagina=100, decrescente=False):
+    """
+    Pagina 'query' pela tupla de 'colunas' (a última deve ser única, ex.: o id).
+
+    Busca 'por_pagina + 1' linhas para saber se existe uma próxima página; o cursor
+    retornado aponta para a última linha entregue.
+    """
+    valores = decodificar_cursor(cursor)
+    if valores and len(valores) == len(colunas):
+        query = query.filter(_depois_de(colunas, valores, decrescente))
+
+    ordem = [c.desc() if decrescente else c.asc() for c in colunas]
+    linhas = query.order_by(*ordem).limit(por_pagina + 1).all()
+
+    pagina = PaginaKeyset(items=linhas[:por_pagina], por_pagina=por_pagina)
+    if len(linhas) > por_pagina:
+        ultima = pagina.items[-1]
+        pagina.proximo_cursor = codificar_cursor(*[getattr(ultima, c.key) for c in colunas])
+    return pagina
+
+
+def _depois_de(colunas, valores, decrescente):
+    """Monta (a > x) OR (a = x AND b > y) ..., portável entre PostgreSQL e SQLite."""
+    condicoes = []
+    for i, coluna in enumerate(colunas):
+        comparacao = coluna < valores[i] if decrescente else coluna > valores[i]
+        anteriores = [colunas[j] == valores[j] for j in range(i)]
+        condicoes.append(and_(*anteriores, comparacao))
+    return or_(*condicoes)
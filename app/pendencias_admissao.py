@@ -0,0 +1,68 @@
+# app/pendencias_admissao.py
+
+from datetime import datetime
+
+from sqlalchemy import exists, literal, select, true
+
+from . import db
+from .importacao import insert_ignorando_conflitos
+from .models import Funcionario, RequisicaoDocumento, TipoDocumento, Usuario
+
+ORIGEM_ADMISSAO = 'admissao'
+COLUNAS_INSERT = ['destinatario_id', 'tipo_documento_id', 'status', 'origem', 'data_requisicao', 'data_ultima_atualizacao']
+
+
+def pendencias_faltantes(funcionarios):
+    """
+    SELECT dos pares (funcionário, tipo obrigatório na admissão) que ainda não têm nenhuma
+    requisição, com as colunas na ordem de COLUNAS_INSERT. 'funcionarios' é uma lista de
+    IDs ou um SELECT de uma coluna com os IDs (a coorte inteira é resolvida no banco).
+    """
+    agora = datetime.utcnow()
+    ja_requisitado = exists().where(
+        RequisicaoDocumento.destinatario_id == Funcionario.id,
+        RequisicaoDocumento.tipo_documento_id == TipoDocumento.id,
+    )
+    # Produto cartesiano intencional (funcionários x tipos obrigatórios), explícito no JOIN
+    return select(
+        Funcionario.id, TipoDocumento.id, literal('Pendente'), literal(ORIGEM_ADMISSAO), literal(agora), literal(agora)
+    ).select_from(Funcionario).join(TipoDocumento, true()).where(
+        Funcionario.id.in_(funcionarios),
+        TipoDocumento.obrigatorio_na_admissao.is_(True),
+        ~ja_requisitado,
+    )
+
+
+def gerar_pendencias_admissao(funcionarios):
+    """
+    Cria as requisições 'Pendente' dos documentos obrigatórios na admissão que faltam para
+    os funcionários informados, com um único INSERT ... SELECT (anti-join por NOT EXISTS).
+
+    É idempotente: pares que já têm requisição são pulados e o índice único parcial
+    uq_requisicao_admissao, com ON CONFLICT DO NOTHING, descarta as duplicatas de execuções
+    simultâneas (dois logins, login e comando em lote). Não faz commit; retorna o número
+    de requisições criadas.
+    """
+    if isinstance(funcionarios, (list, tuple, set)) and not funcionarios:
+        return 0
+    comando = insert_ignorando_conflitos(RequisicaoDocumento.__table__).from_select(
+        COLUNAS_INSERT, pendencias_faltantes(funcionarios)
+    )
+    return db.session.execute(comando).rowcount
+
+
+def coorte_admissao(ids=None, status='Ativo', apenas_sem_primeiro_login=True):
+    """
+    SELECT dos IDs de uma leva de admissão: os 'ids' informados ou, sem eles, os funcionários
+    com o status dado (None = todos) e, por padrão, cujo usuário ainda não fez o primeiro login.
+    """
+    consulta = select(Funcionario.id)
+    if ids:
+        return consulta.where(Funcionario.id.in_(ids))
+    if status:
+        consulta = consulta.where(Funcionario.status == status)
+    if apenas_sem_primeiro_login:
+        consulta = consulta.join(Usuario, Usuario.funcionario_id == Funcionario.id).where(
+            Usuario.primeiro_login_completo.is_(False)
+        )
+    return consulta
@@ -1,12 +1,11 @@
-import os
-import uuid
 # ADICIONADO: jsonify para responder às requisições da API
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, current_app, send_from_directory, jsonify)
+                   flash, jsonify)
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 
 from .models import Funcionario
+from .armazenamento import ArquivoGrandeDemais, salvar_upload, enviar_arquivo, remover_arquivo
+from .miniaturas import enviar_miniatura, gerar_miniaturas, remover_miniaturas
 from . import db
 
 perfil_bp = Blueprint('perfil', __name__)
@@ -41,23 +40,19 @@ def editar_perfil():
         if 'foto_perfil' in request.files:
             file = request.files['foto_perfil']
             if file and file.filename != '' and allowed_file(file.filename):
-                filename_seguro = secure_filename(file.filename)
-                extensao = filename_seguro.rsplit('.', 1)[1]
-                nome_unico = f"{uuid.uuid4()}.{extensao}"
-                
+                try:
+                    nome_unico = salvar_upload(file, FOTOS_PERFIL_FOLDER)
+                except ArquivoGrandeDemais as e:
+                    db.session.rollback()
+                    flash(str(e), 'danger')
+                    return redirect(url_for('perfil.editar_perfil'))
+
+                gerar_miniaturas(nome_unico)
+
+                # A foto anterior (e suas miniaturas) sai do disco após o commit
                 if funcionario.foto_perfil:
-                    try:
-                        os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], FOTOS_PERFIL_FOLDER, funcionario.foto_perfil))
-                    except OSError:
-                        pass 
-
-                # Salva a nova foto
-                upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], FOTOS_PERFIL_FOLDER)
-                
-                os.makedirs(upload_path, exist_ok=True)
-                
-                file.save(os.path.join(upload_path, nome_unico))
-                
+                    remover_arquivo(funcionario.foto_perfil, FOTOS_PERFIL_FOLDER)
+                    remover_miniaturas(funcionario.foto_perfil)
                 funcionario.foto_perfil = nome_unico
 
         db.session.commit()
@@ -71,8 +66,13 @@ def editar_perfil():
 @perfil_bp.route('/uploads/fotos_perfil/<filename>')
 def uploaded_file(filename):
     """Rota para servir os arquivos de foto de perfil."""
-    photo_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], FOTOS_PERFIL_FOLDER)
-    return send_from_directory(photo_dir, filename)
+    return enviar_arquivo(filename, FOTOS_PERFIL_FOLDER)
+
+
+@perfil_bp.route('/uploads/fotos_perfil/<int:tamanho>/<filename>')
+def miniatura_foto(tamanho, filename):
+    """Miniatura quadrada da foto de perfil (tamanhos em MINIATURAS_TAMANHOS), com cache imutável."""
+    return enviar_miniatura(filename, tamanho)
 
 # --- ROTA ADICIONADA PARA O SELETOR DE TEMA ---
 @perfil_bp.route('/change-theme', methods=['POST'])
@@ -4,7 +4,7 @@ import os
 import uuid
 from datetime import datetime
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, current_app, send_from_directory, jsonify, after_this_request, send_file)
+                   flash, current_app, jsonify, after_this_request, send_file)
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from docxtpl import DocxTemplate
@@ -14,10 +14,14 @@ from .email import send_email
 from . import db
 from .decorators import permission_required
 from .models import Funcionario, Ponto
+from .armazenamento import ArquivoGrandeDemais, salvar_upload, enviar_arquivo, remover_arquivo
+from .previas import enviar_previa, nomes_com_texto, previas_por_nome
 
 
 ponto_bp = Blueprint('ponto', __name__)
 
+PASTA_PONTOS = 'pontos'
+
 # --- Função Auxiliar ---
 def allowed_file(filename):
     """Verifica se a extensão do arquivo é permitida (apenas PDF)."""
@@ -74,7 +78,9 @@ def gestao_ponto():
                            f"Nova Solicitação de Ajuste de Ponto: {tipo_ajuste}",
                            'email/nova_solicitacao_ponto',
                            solicitacao=nova_solicitacao)
+                db.session.commit()
         except Exception as e:
+            db.session.rollback()
             current_app.logger.error(f"Falha ao enviar e-mail de solicitação de ponto: {e}")
         # --- FIM DA LÓGICA DE NOTIFICAÇÃO ---
 
@@ -82,7 +88,13 @@ def gestao_ponto():
         return redirect(url_for('ponto.gestao_ponto'))
 
     # Se for GET, exibe a página de gestão
-    pontos_para_revisar = Ponto.query.filter_by(status='Em Revisão').order_by(Ponto.data_upload.asc()).all()
+    consulta = Ponto.query.filter_by(status='Em Revisão')
+    # 'q' filtra pelo texto extraído dos PDFs assinados (ver app/previas.py)
+    termo = request.args.get('q', '').strip()
+    if termo:
+        consulta = consulta.filter(Ponto.path_assinado.in_(nomes_com_texto(termo, PASTA_PONTOS)))
+    pontos_para_revisar = consulta.order_by(Ponto.data_upload.asc()).all()
+    previas = previas_por_nome([ponto.path_assinado for ponto in pontos_para_revisar], PASTA_PONTOS)
     
     # Adicionamos a busca de funcionários para popular o novo formulário em lote
     funcionarios = Funcionario.query.filter_by(status='Ativo').order_by(Funcionario.nome).all()
@@ -90,6 +102,8 @@ def gestao_ponto():
     return render_template(
         'ponto/gestao.html', 
         pontos_para_revisar=pontos_para_revisar,
+        previas=previas,
+        termo=termo,
         funcionarios=funcionarios  # Passamos a lista para o template
     )
 
@@ -161,12 +175,7 @@ def reprovar_ponto(ponto_id):
         return redirect(url_for('ponto.gestao_ponto'))
 
     if ponto.path_assinado:
-        try:
-            caminho_arquivo = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pontos', ponto.path_assinado)
-            if os.path.exists(caminho_arquivo):
-                os.remove(caminho_arquivo)
-        except OSError as e:
-            current_app.logger.error(f"Erro ao remover arquivo de ponto {ponto.path_assinado}: {e}")
+        remover_arquivo(ponto.path_assinado, PASTA_PONTOS)
 
     ponto.status = 'Pendente'
     ponto.observacao_rh = motivo
@@ -184,7 +193,9 @@ def reprovar_ponto(ponto_id):
                        f"Correção Necessária no Ajuste de Ponto",
                        'email/ponto_reprovado',
                        ponto=ponto, motivo=motivo)
+            db.session.commit()
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Falha ao enviar e-mail de reprovação de ponto: {e}")
     # --- FIM DA LÓGICA DE NOTIFICAÇÃO ---
 
@@ -205,9 +216,7 @@ def remover_ponto(ponto_id):
         registrar_log(f"Removeu a solicitação de ajuste de ponto ({ponto.tipo_ajuste} de {ponto.data_ajuste.strftime('%d/%m/%Y')}) do funcionário '{ponto.funcionario.nome}'.")
 
         if ponto.path_assinado:
-            caminho_arquivo = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pontos', ponto.path_assinado)
-            if os.path.exists(caminho_arquivo):
-                os.remove(caminho_arquivo)
+            remover_arquivo(ponto.path_assinado, PASTA_PONTOS)
         db.session.delete(ponto)
         db.session.commit()
         registrar_log(f"Removeu a solicitação de ponto (ID: {ponto.id}) do funcionário '{funcionario_nome}'.")
@@ -229,9 +238,7 @@ def remover_ponto_api(ponto_id):
     try:
         registrar_log(f"Removeu (via API) o ajuste de ponto ({ponto.tipo_ajuste} de {ponto.data_ajuste.strftime('%d/%m/%Y')}) do funcionário '{ponto.funcionario.nome}'.")
         if ponto.path_assinado:
-            caminho_arquivo = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pontos', ponto.path_assinado)
-            if os.path.exists(caminho_arquivo):
-                os.remove(caminho_arquivo)
+            remover_arquivo(ponto.path_assinado, PASTA_PONTOS)
         db.session.delete(ponto)
         db.session.commit()
         registrar_log(f"Removeu a solicitação de ponto (ID: {ponto.id}) do funcionário '{funcionario_nome}'.")
@@ -266,11 +273,7 @@ def responder_ponto(ponto_id):
         filename_seguro = secure_filename(file.filename)
         extensao = filename_seguro.rsplit('.', 1)[1]
         nome_unico = f"ponto_{ponto.funcionario_id}_{ponto.data_ajuste.strftime('%Y-%m-%d')}_{uuid.uuid4()}.{extensao}"
-
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pontos')
-        os.makedirs(upload_folder, exist_ok=True)
-
-        file.save(os.path.join(upload_folder, nome_unico))
+        salvar_upload(file, PASTA_PONTOS, nome=nome_unico)
 
         ponto.path_assinado = nome_unico
         ponto.status = 'Em Revisão'
@@ -280,6 +283,9 @@ def responder_ponto(ponto_id):
         db.session.commit()
         registrar_log(f"Respondeu à solicitação de ponto (ID: {ponto.id}) com a justificativa: '{ponto.justificativa}'.")
         return jsonify({'success': True, 'message': 'Ajuste de ponto enviado para revisão!'})
+    except ArquivoGrandeDemais as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 413
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Erro ao responder ponto {ponto_id}: {e}")
@@ -332,8 +338,15 @@ def download_ponto_assinado(filename):
         flash('Acesso negado.', 'danger')
         return redirect(url_for('main.index'))
         
-    ponto_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pontos')
-    return send_from_directory(ponto_folder, filename, as_attachment=True)
+    return enviar_arquivo(filename, PASTA_PONTOS, as_attachment=True)
+
+
+@ponto_bp.route('/previa/<filename>')
+@login_required
+@permission_required('depto_pessoal')
+def previa_ponto_assinado(filename):
+    """Imagem da primeira página do ponto assinado, exibida na fila de revisão."""
+    return enviar_previa(filename, PASTA_PONTOS)
 
 @ponto_bp.route('/api/funcionario/<int:funcionario_id>/historico')
 @login_required
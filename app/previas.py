@@ -0,0 +1,279 @@
+# app/previas.py
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from flask import abort, current_app
+from PyPDF2 import PdfReader
+from sqlalchemy import and_, exists, func, literal, or_, select
+
+try:
+    from PIL import Image
+except ImportError:  # sem Pillow, só o texto é extraído
+    Image = None
+
+from . import db
+from .armazenamento import SUFIXO_PREVIA, enviar_relativo, get_armazenamento
+from .busca import normalizar_busca
+from .importacao import insert_ignorando_conflitos
+from .models import ArquivoArmazenado, ArquivoBlob, PreviaArquivo
+
+TAMANHO_TRECHO = 600
+UM_ANO = 365 * 24 * 3600
+
+
+# --- Extração ---
+
+def extrair_texto(leitor, max_paginas, max_caracteres):
+    """Texto das primeiras 'max_paginas' páginas, cortado em 'max_caracteres'."""
+    partes, total = [], 0
+    for pagina in islice(leitor.pages, max_paginas):
+        texto = (pagina.extract_text() or '').strip()
+        if texto:
+            partes.append(texto)
+            total += len(texto)
+        if total >= max_caracteres:
+            break
+    return '\n\n'.join(partes)[:max_caracteres]
+
+
+def imagem_primeira_pagina(caminho, leitor, largura):
+    """
+    Imagem (PIL) da primeira página: renderizada pelo pdftoppm (poppler), se estiver instalado,
+    ou a maior imagem embutida na página, que nos documentos escaneados é a própria página.
+    None se não houver como obter uma imagem (PDF só com texto e sem poppler).
+    """
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm:
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = os.path.join(pasta, 'pagina')
+            subprocess.run([pdftoppm, '-f', '1', '-l', '1', '-png', '-singlefile', '-scale-to', str(largura),
+                            caminho, saida], check=True, capture_output=True, timeout=60)
+            with Image.open(saida + '.png') as imagem:
+                imagem.load()
+                return imagem
+
+    maior, maior_area = None, 0
+    for dados in _imagens_embutidas(leitor.pages[0]):
+        try:
+            imagem = Image.open(io.BytesIO(dados))
+        except OSError:
+            continue
+        if imagem.width * imagem.height > maior_area:
+            maior, maior_area = imagem, imagem.width * imagem.height
+    return maior
+
+
+def _imagens_embutidas(pagina):
+    """
+    Bytes das imagens da página. Se o PyPDF2 não conseguir decodificar alguma (ele falha em
+    certos PNG com preditor), ficam só as JPEG (DCTDecode), lidas direto do stream: é o
+    formato das páginas escaneadas.
+    """
+    try:
+        return [imagem.data for imagem in pagina.images]
+    except Exception:
+        pass
+    recursos = (pagina.get('/Resources') or {}).get_object()
+    xobjetos = (recursos.get('/XObject') or {}).get_object()
+    dados = []
+    for xobjeto in xobjetos.values():
+        xobjeto = xobjeto.get_object()
+        filtro = xobjeto.get('/Filter')
+        if xobjeto.get('/Subtype') == '/Image' and (filtro == '/DCTDecode' or filtro == ['/DCTDecode']):
+            dados.append(xobjeto.get_data())
+    return dados
+
+
+def _gravar_webp(imagem, destino, largura, qualidade):
+    imagem.draft('RGB', (largura, largura * 3))
+    imagem = imagem.convert('RGB')
+    imagem.thumbnail((largura, largura * 3))
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as saida:
+            imagem.save(saida, 'WEBP', quality=qualidade)
+        os.replace(temporario, destino)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def processar_previa(previa):
+    """Extrai o texto e grava a imagem da primeira página ao lado do blob. Não faz commit."""
+    config = current_app.config
+    blob = db.session.get(ArquivoBlob, previa.blob_id)
+    caminho = get_armazenamento().absoluto(blob.caminho)
+
+    leitor = PdfReader(caminho)
+    if leitor.is_encrypted:
+        leitor.decrypt('')  # PDFs protegidos só contra edição abrem com a senha vazia
+    previa.paginas = len(leitor.pages)
+    previa.texto = extrair_texto(leitor, config['PREVIAS_MAX_PAGINAS'], config['PREVIAS_MAX_CARACTERES'])
+    previa.texto_busca = normalizar_busca(previa.texto)
+
+    previa.tem_imagem = False
+    if Image is not None and previa.paginas:
+        try:
+            imagem = imagem_primeira_pagina(caminho, leitor, config['PREVIAS_LARGURA'])
+            if imagem is not None:
+                _gravar_webp(imagem, caminho + SUFIXO_PREVIA, config['PREVIAS_LARGURA'], config['PREVIAS_QUALIDADE'])
+                previa.tem_imagem = True
+        except Exception as e:
+            # Sem imagem, a prévia ainda vale pelo texto
+            current_app.logger.warning(f"Não foi possível gerar a imagem da prévia do blob {blob.sha256}: {e}")
+
+    previa.status = 'pronta'
+    previa.processado_em = datetime.utcnow()
+    previa.bloqueado_em = None
+    previa.ultimo_erro = None
+
+
+# --- Fila ---
+
+def materializar_pendentes():
+    """
+    Cria a linha 'pendente' de cada PDF armazenado que ainda não tem prévia, com um único
+    INSERT ... SELECT (anti-join). A prévia é por conteúdo: o mesmo PDF enviado várias vezes
+    é processado uma vez só, e o índice único em blob_id descarta as corridas entre workers.
+    """
+    sem_previa = select(
+        ArquivoArmazenado.blob_id, literal('pendente'), literal(0), literal(False), literal(datetime.utcnow())
+    ).distinct().where(
+        func.lower(ArquivoArmazenado.nome).like('%.pdf'),
+        ~exists().where(PreviaArquivo.blob_id == ArquivoArmazenado.blob_id),
+    )
+    comando = insert_ignorando_conflitos(PreviaArquivo.__table__).from_select(
+        ['blob_id', 'status', 'tentativas', 'tem_imagem', 'criado_em'], sem_previa
+    )
+    return db.session.execute(comando).rowcount
+
+
+def _reservar_lote(tamanho):
+    """
+    Como na fila de e-mails: FOR UPDATE SKIP LOCKED e reservas abandonadas voltam após
+    PREVIAS_RESERVA_EXPIRA. PDFs que já falharam vão para o fim da fila.
+    """
+    agora = datetime.utcnow()
+    reserva_expirada = agora - timedelta(seconds=current_app.config['PREVIAS_RESERVA_EXPIRA'])
+
+    lote = PreviaArquivo.query.filter(or_(
+        PreviaArquivo.status == 'pendente',
+        and_(PreviaArquivo.status == 'processando', PreviaArquivo.bloqueado_em < reserva_expirada),
+    )).order_by(PreviaArquivo.tentativas, PreviaArquivo.id).limit(tamanho).with_for_update(skip_locked=True).all()
+
+    for previa in lote:
+        previa.status = 'processando'
+        previa.bloqueado_em = agora
+    db.session.commit()
+    return lote
+
+
+def processar_lote():
+    """Processa um lote, com um commit por PDF. Retorna (prontas, falhas); (0, 0) = nada a fazer."""
+    config = current_app.config
+    prontas = falhas = 0
+    for previa in _reservar_lote(config['PREVIAS_LOTE']):
+        try:
+            processar_previa(previa)
+            prontas += 1
+        except Exception as e:
+            previa.tentativas += 1
+            previa.ultimo_erro = str(e)[:2000]
+            previa.bloqueado_em = None
+            previa.status = 'erro' if previa.tentativas >= config['PREVIAS_MAX_TENTATIVAS'] else 'pendente'
+            falhas += 1
+        db.session.commit()
+    return prontas, falhas
+
+
+def processar_fila(max_lotes=None):
+    """
+    Enfileira os PDFs sem prévia e processa lotes até a fila esvaziar ou um lote inteiro falhar
+    (só sobraram retentativas, que ficam para a próxima execução). Retorna (prontas, falhas).
+    """
+    materializar_pendentes()
+    db.session.commit()
+    total_prontas = total_falhas = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        prontas, falhas = processar_lote()
+        total_prontas += prontas
+        total_falhas += falhas
+        lotes += 1
+        if not prontas:
+            break
+    return total_prontas, total_falhas
+
+
+def processar_continuamente(intervalo=None):
+    """
+    Laço do processo dedicado às prévias ('flask previas-processar --continuo'): esvazia a fila e
+    volta a verificá-la a cada PREVIAS_INTERVALO_VERIFICACAO segundos. A extração e a renderização
+    usam a CPU por segundos seguidos; por isso não rodam nos workers gevent do gunicorn, onde
+    travariam todas as requisições do processo. Como a fila é a tabela, nada se perde em um
+    reinício: o que ficou pendente é retomado na primeira volta.
+    """
+    intervalo = intervalo or current_app.config['PREVIAS_INTERVALO_VERIFICACAO']
+    while True:
+        try:
+            processar_fila()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro no processamento de prévias: {e}")
+        finally:
+            db.session.remove()
+        time.sleep(intervalo)
+
+
+# --- Consulta ---
+
+def previas_por_nome(nomes, pasta=''):
+    """
+    {nome: linha com tem_imagem, paginas e trecho (início do texto)} das prévias prontas dos
+    nomes informados (gravados na pasta), em uma única consulta e sem carregar o texto inteiro.
+    """
+    nomes = [nome for nome in nomes if nome]
+    if not nomes:
+        return {}
+    linhas = db.session.execute(
+        select(ArquivoArmazenado.nome, PreviaArquivo.tem_imagem, PreviaArquivo.paginas,
+               func.substr(PreviaArquivo.texto, 1, TAMANHO_TRECHO).label('trecho'))
+        .join(PreviaArquivo, PreviaArquivo.blob_id == ArquivoArmazenado.blob_id)
+        .where(ArquivoArmazenado.nome.in_(nomes), ArquivoArmazenado.pasta == pasta,
+               PreviaArquivo.status == 'pronta')
+    )
+    return {linha.nome: linha for linha in linhas}
+
+
+def nomes_com_texto(termo, pasta=''):
+    """SELECT dos nomes de arquivo da pasta cujo texto extraído contém o termo (normalizado como na busca de funcionários)."""
+    return (
+        select(ArquivoArmazenado.nome)
+        .join(PreviaArquivo, PreviaArquivo.blob_id == ArquivoArmazenado.blob_id)
+        .where(ArquivoArmazenado.pasta == pasta,
+               PreviaArquivo.texto_busca.contains(normalizar_busca(termo), autoescape=True))
+    )
+
+
+def enviar_previa(nome, pasta=''):
+    """
+    Imagem da primeira página do PDF gravado com este nome na pasta; 404 enquanto não houver
+    prévia com imagem (ou se o nome pertencer a outra pasta, como em enviar_arquivo).
+    """
+    caminho = db.session.scalar(
+        select(ArquivoBlob.caminho)
+        .join(ArquivoArmazenado, ArquivoArmazenado.blob_id == ArquivoBlob.id)
+        .join(PreviaArquivo, PreviaArquivo.blob_id == ArquivoBlob.id)
+        .where(ArquivoArmazenado.nome == nome, ArquivoArmazenado.pasta == pasta,
+               PreviaArquivo.status == 'pronta', PreviaArquivo.tem_imagem.is_(True))
+    )
+    if caminho is None:
+        abort(404)
+    # O conteúdo de um nome nunca muda, então a prévia também não
+    return enviar_relativo(caminho + SUFIXO_PREVIA, f"{nome.rsplit('.', 1)[0]}.webp", max_age=UM_ANO, imutavel=True)
@@ -1,18 +1,17 @@
 
-import csv
-import os
 import uuid
-from datetime import datetime, timedelta
-from io import TextIOWrapper, StringIO
+from datetime import datetime
+from io import TextIOWrapper
 from .ad_sync import provisionar_usuario_ad, habilitar_usuario_ad, desabilitar_usuario_ad, remover_usuario_ad, verificar_usuario_ad
+from .ad_lote import sincronizar_funcionarios_ad
 
-from flask import (Blueprint, request, jsonify, render_template, redirect,
-                   url_for, flash, make_response, current_app, send_from_directory)
+from flask import (Blueprint, request, jsonify, render_template, redirect, Response,
+                   url_for, flash, current_app, stream_with_context)
 from flask_login import login_required, current_user
-from sqlalchemy import or_, extract, func
+from sqlalchemy.orm import contains_eager, lazyload
 from werkzeug.utils import secure_filename
 
-from .email import send_email
+from .email import send_email_em_lote
 
 from . import db, format_datetime_local
 from .decorators import permission_required
@@ -20,6 +19,14 @@ from .decorators import permission_required
 from .models import (Funcionario, Permissao, Usuario, Aviso,
                      LogCienciaAviso, RequisicaoDocumento, AvisoAnexo, Ponto, LogAtividade, Cargo, Setor)
 from .utils import registrar_log
+from .dashboard import montar_dashboard
+from .cache_usuarios import get_cache_usuarios
+from .paginacao import paginar_keyset
+from .importacao import importar_funcionarios_csv
+from .armazenamento import ArquivoGrandeDemais, salvar_upload, enviar_arquivo, remover_arquivo
+from .miniaturas import remover_miniaturas
+from . import busca, exportacao
+from .busca import filtro_busca
 
 main = Blueprint('main', __name__)
 
@@ -27,56 +34,8 @@ main = Blueprint('main', __name__)
 @main.route('/')
 @login_required
 def index():
-    dados_dashboard = {}
-    usuario = current_user
-    
-    avisos_lidos_ids = {log.aviso_id for log in usuario.logs_ciencia}
-    dados_dashboard['avisos_pendentes'] = Aviso.query.filter(
-        Aviso.id.notin_(avisos_lidos_ids),
-        Aviso.arquivado == False
-    ).all()
-    
-    dados_dashboard['requisicoes_pendentes'] = RequisicaoDocumento.query.filter_by(
-        destinatario_id=usuario.funcionario.id, status='Pendente'
-    ).all()
-
-    dados_dashboard['pontos_pendentes'] = Ponto.query.filter_by(
-        funcionario_id=usuario.funcionario.id, status='Pendente'
-    ).all()
-
-    # --- LÓGICA DE ANIVERSARIANTES (CORRIGIDA E PARA TODOS OS USUÁRIOS) ---
-    hoje = datetime.utcnow().date()
-    inicio_semana = hoje - timedelta(days=hoje.weekday())
-    fim_semana = inicio_semana + timedelta(days=6)
-    
-    dados_dashboard['periodo_semana'] = f"{inicio_semana.strftime('%d/%m')} - {fim_semana.strftime('%d/%m')}"
-    
-    aniversariantes = []
-    if inicio_semana.year == fim_semana.year:
-        aniversariantes = Funcionario.query.filter(
-            db.func.extract('month', Funcionario.data_nascimento) == inicio_semana.month,
-            db.func.extract('day', Funcionario.data_nascimento).between(inicio_semana.day, fim_semana.day)
-        ).all()
-    else: # Lida com a virada do ano
-        dezembro = Funcionario.query.filter(
-            db.func.extract('month', Funcionario.data_nascimento) == 12,
-            db.func.extract('day', Funcionario.data_nascimento) >= inicio_semana.day
-        ).all()
-        janeiro = Funcionario.query.filter(
-            db.func.extract('month', Funcionario.data_nascimento) == 1,
-            db.func.extract('day', Funcionario.data_nascimento) <= fim_semana.day
-        ).all()
-        aniversariantes = dezembro + janeiro
-
-    aniversariantes.sort(key=lambda f: (f.data_nascimento.month, f.data_nascimento.day))
-    dados_dashboard['aniversariantes'] = aniversariantes
-
-    # Bloco if agora cuida apenas dos dados específicos de admin
-    if usuario.tem_permissao('admin_rh') or usuario.tem_permissao('admin_ti'):
-        # --- LINHA CORRIGIDA ---
-        dados_dashboard['total_funcionarios'] = Funcionario.query.filter_by(status='Ativo').count()
-        dados_dashboard['total_avisos'] = Aviso.query.filter_by(arquivado=False).count()
-
+    # Todos os widgets são montados pelo serviço de dashboard em poucas consultas agregadas
+    dados_dashboard = montar_dashboard(current_user)
     return render_template('index.html', dados=dados_dashboard)
 
 
@@ -211,59 +170,84 @@ def processar_cadastro():
 # --- FIM DA CORREÇÃO ---
 
 
-@main.route('/funcionarios')
-@login_required
-@permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
-def listar_funcionarios():
-    termo_busca = request.args.get('q')
-    sort_by = request.args.get('sort', 'nome_asc')
-    # NOVO: Lógica do filtro de status
-    status_filter = request.args.get('status', 'ativos') # Padrão para 'ativos'
-    page = request.args.get('page', 1, type=int)
-    query = Funcionario.query
+def _query_listagem_funcionarios(termo_busca, status_filter):
+    """Consulta base da listagem, com cargo e setor carregados no mesmo JOIN (sem N+1)."""
+    query = Funcionario.query.outerjoin(Funcionario.cargo).outerjoin(Funcionario.setor).options(
+        contains_eager(Funcionario.cargo),
+        contains_eager(Funcionario.setor),
+        lazyload(Funcionario.sistemas)
+    )
 
     if status_filter == 'ativos':
-        query = query.filter_by(status='Ativo')
+        query = query.filter(Funcionario.status == 'Ativo')
         
     elif status_filter == 'suspensos':
-        query = query.filter_by(status='Suspenso')
+        query = query.filter(Funcionario.status == 'Suspenso')
 
     elif status_filter == 'desligados':
-        query = query.filter_by(status='Desligado')
+        query = query.filter(Funcionario.status == 'Desligado')
 
     # Se for 'todos', nenhum filtro de status é aplicado
 
-    if termo_busca:
-        termo_busca = termo_busca.strip()
-        query = query.join(Funcionario.cargo, isouter=True).join(Funcionario.setor, isouter=True).filter(
-            or_(
-                Funcionario.nome.ilike(f"%{termo_busca}%"),
-                Funcionario.email.ilike(f"%{termo_busca}%"),
-                Funcionario.cpf.ilike(f"%{termo_busca}%"),
-                Cargo.nome.ilike(f"%{termo_busca}%"),
-                Setor.nome.ilike(f"%{termo_busca}%")
-            )
-        )
-    if sort_by == 'nome_desc':
-        query = query.order_by(Funcionario.nome.desc())
-    else:
-        query = query.order_by(Funcionario.nome.asc())
+    # Busca sem acentos sobre a coluna normalizada (ver app/busca.py)
+    criterio = filtro_busca(termo_busca) if termo_busca else None
+    if criterio is not None:
+        query = query.filter(criterio)
+    return query
+
+
+def _pagina_funcionarios():
+    """Lê os parâmetros da URL e devolve a página atual da listagem (paginação por chave)."""
+    termo_busca = (request.args.get('q') or '').strip()
+    sort_by = request.args.get('sort', 'nome_asc')
+    status_filter = request.args.get('status', 'ativos') # Padrão para 'ativos'
+    cursor = request.args.get('cursor')
 
-    paginacao = query.paginate(page=page, per_page=5000, error_out=False)
-    funcionarios_na_pagina = paginacao.items    
+    por_pagina = request.args.get('per_page', current_app.config['FUNCIONARIOS_POR_PAGINA'], type=int)
+    por_pagina = max(1, min(por_pagina, current_app.config['FUNCIONARIOS_POR_PAGINA_MAX']))
+
+    query = _query_listagem_funcionarios(termo_busca, status_filter)
+    pagina = paginar_keyset(query, [Funcionario.nome, Funcionario.id], cursor=cursor,
+                            por_pagina=por_pagina, decrescente=(sort_by == 'nome_desc'))
+    return pagina, termo_busca, status_filter
+
+
+@main.route('/funcionarios')
+@login_required
+@permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
+def listar_funcionarios():
+    pagina, termo_busca, status_filter = _pagina_funcionarios()
 
-    funcionarios = query.all()
     todos_cargos = Cargo.query.order_by(Cargo.nome).all()
     todos_setores = Setor.query.order_by(Setor.nome).all()
     return render_template('funcionarios.html', 
-                           funcionarios=funcionarios_na_pagina,
-                           paginacao=paginacao,
+                           funcionarios=pagina.items,
+                           pagina=pagina,
                            termo_busca=termo_busca,
                            status_filter=status_filter,
                            todos_cargos=todos_cargos,
                            todos_setores=todos_setores)
 
 
+@main.route('/api/funcionarios')
+@login_required
+@permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
+def listar_funcionarios_api():
+    """Versão JSON da listagem, usada pela tabela para carregar as próximas páginas."""
+    pagina, _, _ = _pagina_funcionarios()
+    return jsonify({
+        'items': [{
+            'id': f.id,
+            'nome': f.nome or f.apelido,
+            'cargo': f.cargo.nome if f.cargo else 'N/A',
+            'setor': f.setor.nome if f.setor else 'N/A',
+            'email': f.email,
+            'telefone': f.telefone or 'N/A'
+        } for f in pagina.items],
+        'proximo_cursor': pagina.proximo_cursor
+    })
+
+
 @main.route('/funcionario/<int:funcionario_id>/editar', methods=['GET', 'POST'])
 @login_required
 @permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
@@ -292,6 +276,7 @@ def editar_funcionario(funcionario_id):
             usuario.permissoes.clear() # Limpa as permissões antigas
             novas_permissoes = Permissao.query.filter(Permissao.id.in_(ids_permissoes)).all()
             usuario.permissoes = novas_permissoes # Adiciona as novas
+            usuario.invalidar_cache_permissoes()
         
         
         db.session.commit()
@@ -378,11 +363,11 @@ def criar_aviso():
         for arquivo in arquivos:
             if arquivo and arquivo.filename != '':
                 filename_seguro = secure_filename(arquivo.filename)
-                extensao = filename_seguro.rsplit('.', 1)[1].lower()
-                nome_unico = f"{uuid.uuid4()}.{extensao}"
-                upload_path = current_app.config['UPLOAD_FOLDER']
-                os.makedirs(upload_path, exist_ok=True)
-                arquivo.save(os.path.join(upload_path, nome_unico))
+                try:
+                    nome_unico = salvar_upload(arquivo)
+                except ArquivoGrandeDemais as e:
+                    flash(f'Anexo "{filename_seguro}" ignorado: {e}', 'warning')
+                    continue
                 anexo = AvisoAnexo(
                     nome_arquivo_original=filename_seguro,
                     path_armazenamento=nome_unico,
@@ -398,17 +383,21 @@ def criar_aviso():
         # Início da Lógica de Notificação por E-mail
         try:
             # Notificar todos os funcionários ativos, exceto o autor
-            destinatarios = Usuario.query.join(Usuario.funcionario).filter(
+            destinatarios = Usuario.query.join(Usuario.funcionario).options(
+                contains_eager(Usuario.funcionario), lazyload(Usuario.funcionario, Funcionario.sistemas)
+            ).filter(
                 Usuario.id != current_user.id,
                 Funcionario.status == 'Ativo'
             ).all()
-            
-            for user in destinatarios:
-                send_email(user.email,
-                           f"Novo Aviso no Mural: {novo_aviso.titulo}",
-                           'email/novo_aviso',
-                           user=user, aviso=novo_aviso)
+
+            # Template compilado uma vez; os corpos vão direto para a fila de e-mails
+            send_email_em_lote(f"Novo Aviso no Mural: {novo_aviso.titulo}",
+                               'email/novo_aviso',
+                               ((user.email, {'user': user}) for user in destinatarios),
+                               aviso=novo_aviso)
+            db.session.commit()
         except Exception as e:
+            db.session.rollback()
             current_app.logger.error(f"Falha ao enviar e-mails de notificação de aviso: {e}")
         # Fim da Lógica de Notificação
 
@@ -420,7 +409,7 @@ def criar_aviso():
 @main.route('/avisos/anexo/<filename>')
 @login_required
 def download_anexo_aviso(filename):
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    return enviar_arquivo(filename, as_attachment=True)
 
 
 @main.route('/avisos/<int:aviso_id>/remover', methods=['POST'])
@@ -431,9 +420,7 @@ def remover_aviso(aviso_id):
     aviso = Aviso.query.get_or_404(aviso_id)
     try:
         for anexo in aviso.anexos:
-            caminho_arquivo = os.path.join(current_app.config['UPLOAD_FOLDER'], anexo.path_armazenamento)
-            if os.path.exists(caminho_arquivo):
-                os.remove(caminho_arquivo)
+            remover_arquivo(anexo.path_armazenamento)
         db.session.delete(aviso)
         db.session.commit()
         flash(f'Aviso "{aviso.titulo}" removido com sucesso.', 'success')
@@ -510,19 +497,12 @@ def buscar_funcionarios():
     termo = request.args.get('q', '').strip()
     if not termo:
         return jsonify([])
-    
-    # Monta o termo de busca para o SQL
-    search_term = f"%{termo}%"
-    
-    # A consulta agora faz o JOIN com as tabelas Cargo e Setor
-    funcionarios = Funcionario.query.join(Cargo, Funcionario.cargo_id == Cargo.id, isouter=True).join(Setor, Funcionario.setor_id == Setor.id, isouter=True).filter(
-        or_(
-            Funcionario.nome.ilike(search_term),
-            Funcionario.cpf.ilike(search_term),
-            Cargo.nome.ilike(search_term), # Busca no nome do Cargo
-            Setor.nome.ilike(search_term)  # Busca no nome do Setor
-        )
-    ).all()
+
+    limite = request.args.get('limit', current_app.config['BUSCA_LIMITE_PADRAO'], type=int)
+    limite = max(1, min(limite, current_app.config['BUSCA_LIMITE_MAX']))
+
+    # Busca ranqueada e sem acentos; cargo e setor já vêm carregados (sem N+1)
+    funcionarios = busca.buscar_funcionarios(termo, limite=limite)
     
     # O resultado agora inclui o nome do cargo e do setor
     # Usamos um "if" para evitar erros caso um funcionário não tenha cargo/setor
@@ -537,6 +517,24 @@ def buscar_funcionarios():
     return jsonify(resultado)
 
 
+@main.route('/api/funcionarios/typeahead')
+@login_required
+@permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
+def typeahead_funcionarios():
+    """Sugestões para os seletores de funcionário: top-N, com cache de prefixos e ETag."""
+    limite = request.args.get('limit', current_app.config['TYPEAHEAD_LIMITE_PADRAO'], type=int)
+    limite = max(1, min(limite, current_app.config['TYPEAHEAD_LIMITE_MAX']))
+
+    itens, etag = busca.sugestoes_funcionarios(request.args.get('q', ''), limite=limite)
+
+    resposta = jsonify(itens)
+    if etag:
+        resposta.set_etag(etag)
+    # O navegador pode guardar a resposta, mas deve revalidá-la (If-None-Match -> 304)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta.make_conditional(request)
+
+
 @main.route('/api/funcionario/<int:funcionario_id>')
 @login_required
 @permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
@@ -584,6 +582,9 @@ def remover_funcionario_api(funcionario_id):
         # Se teve sucesso no AD, remove do banco de dados local
         if funcionario.usuario:
             db.session.delete(funcionario.usuario)
+        # Libera a foto de perfil e as miniaturas (apagadas do disco após o commit)
+        remover_arquivo(funcionario.foto_perfil, 'fotos_perfil')
+        remover_miniaturas(funcionario.foto_perfil)
         db.session.delete(funcionario)
         db.session.commit()
         return jsonify({'success': True, 'message': f'Funcionário {funcionario.nome} removido com sucesso do sistema.'})
@@ -597,15 +598,32 @@ def remover_funcionario_api(funcionario_id):
 @login_required
 @permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
 def remover_funcionarios_lote():
-    # (código existente)
     ids_para_remover = request.get_json().get('ids')
     if not ids_para_remover:
         return jsonify({'success': False, 'message': 'Nenhum funcionário selecionado.'}), 400
     try:
-        Usuario.query.filter(Usuario.funcionario_id.in_(ids_para_remover)).delete(synchronize_session=False)
-        Funcionario.query.filter(Funcionario.id.in_(ids_para_remover)).delete(synchronize_session=False)
+        # As contas no AD são desabilitadas antes; quem falhar no AD permanece no sistema
+        relatorio = sincronizar_funcionarios_ad(ids_para_remover, forcar_desabilitado=True)
+        ids_removiveis = list(relatorio.ids_com_sucesso())
+        # O DELETE em lote não passa pelo ORM: as fotos de perfil são liberadas antes, pelo nome
+        fotos = Funcionario.query.with_entities(Funcionario.foto_perfil).filter(
+            Funcionario.id.in_(ids_removiveis), Funcionario.foto_perfil.isnot(None)
+        ).all()
+        for (foto,) in fotos:
+            remover_arquivo(foto, 'fotos_perfil')
+            remover_miniaturas(foto)
+        Usuario.query.filter(Usuario.funcionario_id.in_(ids_removiveis)).delete(synchronize_session=False)
+        Funcionario.query.filter(Funcionario.id.in_(ids_removiveis)).delete(synchronize_session=False)
         db.session.commit()
-        return jsonify({'success': True, 'message': f'{len(ids_para_remover)} funcionários foram removidos.'})
+        # Deleções em lote não disparam eventos do ORM: descarta as identidades em cache
+        get_cache_usuarios().invalidar()
+        mensagem = f'{len(ids_removiveis)} funcionários foram removidos.'
+        if relatorio.falhas:
+            mensagem += f' {len(relatorio.falhas)} não foram removidos por falha ao desabilitar a conta no AD.'
+        return jsonify({
+            'success': not relatorio.falhas, 'message': mensagem,
+            'ad': [r.to_dict() for r in relatorio.resultados],
+        })
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Erro ao remover em lote: {e}")
@@ -641,13 +659,22 @@ def editar_funcionarios_lote():
         # Atualiza os funcionários no banco de dados
         Funcionario.query.filter(Funcionario.id.in_(ids_funcionarios)).update(campos_para_atualizar, synchronize_session=False)
         db.session.commit()
-        # Retorna as chaves 'success' e 'message' que o JavaScript espera
-        return jsonify({'success': True, 'message': 'Funcionários atualizados com sucesso!'})
+        # Atualizações em lote não disparam eventos do ORM: o índice de busca precisa ser refeito
+        busca.get_indice_busca().invalidar()
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Erro ao editar em lote: {e}")
         return jsonify({'success': False, 'message': 'Ocorreu um erro na atualização do banco de dados.'}), 500
 
+    # Leva o novo cargo/setor para o AD (title/department) em uma única conexão; o nome e a
+    # situação da conta (userAccountControl) não fazem parte desta edição e ficam como estão
+    relatorio = sincronizar_funcionarios_ad(ids_funcionarios, atributos=('title', 'department'))
+    mensagem = 'Funcionários atualizados com sucesso!'
+    if relatorio.falhas:
+        mensagem += f' Atenção: {len(relatorio.falhas)} não puderam ser atualizados no AD.'
+    # Retorna as chaves 'success' e 'message' que o JavaScript espera
+    return jsonify({'success': True, 'message': mensagem, 'ad': [r.to_dict() for r in relatorio.resultados]})
+
 # --- ROTAS DE IMPORTAÇÃO/EXPORTAÇÃO ---
 # (código existente para importação/exportação)
 @main.route('/importar_csv', methods=['POST'])
@@ -661,70 +688,64 @@ def importar_csv():
     if not arquivo or not arquivo.filename.endswith('.csv'):
         return jsonify({'success': False, 'message': 'Formato inválido. Envie um arquivo .csv.'}), 400
     try:
-        permissao_colaborador = Permissao.query.filter_by(nome='colaborador').first()
-        if not permissao_colaborador:
-            permissao_colaborador = Permissao(nome='colaborador', descricao='Permissões básicas')
-            db.session.add(permissao_colaborador)
-            db.session.commit()
-        leitor = csv.DictReader(TextIOWrapper(arquivo, encoding='utf-8'))
-        adicionados = 0
-        for linha in leitor:
-            cpf, email = linha.get('CPF'), linha.get('E-mail')
-            if not (cpf and email) or Funcionario.query.filter_by(cpf=cpf).first() or Usuario.query.filter_by(email=email).first():
-                continue
-            novo_funcionario = Funcionario(
-                nome=linha.get('Nome Completo', ''), cpf=cpf, email=email, telefone=linha.get('Telefone', ''),
-                cargo=linha.get('Cargo', ''), setor=linha.get('Setor', ''),
-                data_nascimento=datetime.strptime(linha.get('Data de Nascimento'), '%d/%m/%Y') if linha.get('Data de Nascimento') else None,
-                contato_emergencia_nome=linha.get('Contato de Emergencia (Nome)', ''),
-                contato_emergencia_telefone=linha.get('Contato de Emergencia (Telefone)', '')
-            )
-            db.session.add(novo_funcionario)
-            db.session.commit()
-            novo_usuario = Usuario(email=email, funcionario_id=novo_funcionario.id, senha_provisoria=False)
-            novo_usuario.set_password('Mudar@123')
-            novo_usuario.permissoes.append(permissao_colaborador)
-            db.session.add(novo_usuario)
-            adicionados += 1
-        db.session.commit()
-        if adicionados > 0:
-            return jsonify({'success': True, 'message': f'{adicionados} novos funcionários importados com sucesso!'})
-        else:
-            return jsonify({'success': False, 'message': 'Nenhum funcionário novo para importar.'})
+        # utf-8-sig aceita arquivos salvos pelo Excel (com BOM)
+        resultado = importar_funcionarios_csv(TextIOWrapper(arquivo, encoding='utf-8-sig', newline=''))
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Erro ao processar CSV: {e}")
         return jsonify({'success': False, 'message': 'Ocorreu um erro ao processar o arquivo.'}), 500
 
+    partes = [f'{resultado.adicionados} novos funcionários importados com sucesso!' if resultado.adicionados
+              else 'Nenhum funcionário novo para importar.']
+    if resultado.ignorados:
+        partes.append(f'{len(resultado.ignorados)} linha(s) ignorada(s) por já estarem cadastradas.')
+    if resultado.erros:
+        partes.append(f'{len(resultado.erros)} linha(s) com erro.')
+    if resultado.adicionados:
+        registrar_log(f"Importou {resultado.adicionados} funcionário(s) via CSV.")
+
+    return jsonify({
+        'success': resultado.adicionados > 0,
+        'message': ' '.join(partes),
+        'adicionados': resultado.adicionados,
+        # Limita o detalhamento para não inflar a resposta em arquivos muito ruins
+        'ignorados': resultado.ignorados[:200],
+        'erros': resultado.erros[:200],
+    })
+
+
+def _parametros_exportacao():
+    colunas = exportacao.colunas_selecionadas(request.args.get('colunas'))
+    status = {'ativos': 'Ativo', 'suspensos': 'Suspenso', 'desligados': 'Desligado'}.get(request.args.get('status'))
+    query = exportacao.consulta_exportacao(colunas, request.args.get('q', '').strip(), status)
+    return colunas, query
+
 
 @main.route('/exportar_csv')
 @login_required
 @permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
 def exportar_csv():
-    # (código existente)
-    termo_busca = request.args.get('q', '').strip()
-    query = Funcionario.query
-    if termo_busca:
-        query = query.filter(or_(
-            Funcionario.nome.ilike(f"%{termo_busca}%"),
-            Funcionario.cpf.ilike(f"%{termo_busca}%"),
-            Funcionario.setor.ilike(f"%{termo_busca}%")
-        ))
-    funcionarios = query.all()
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Nome Completo', 'CPF', 'E-mail', 'Telefone', 'Cargo', 'Setor', 'Data de Nascimento', 'Contato de Emergencia (Nome)', 'Contato de Emergencia (Telefone)'])
-    for f in funcionarios:
-        writer.writerow([
-            f.nome, f.cpf, f.email, f.telefone, f.cargo, f.setor,
-            f.data_nascimento.strftime('%d/%m/%Y') if f.data_nascimento else '',
-            f.contato_emergencia_nome, f.contato_emergencia_telefone
-        ])
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers["Content-Disposition"] = "attachment; filename=funcionarios.csv"
-    response.headers["Content-type"] = "text/csv"
-    return response
+    # Resposta em streaming: as linhas são lidas do banco e enviadas em lotes
+    colunas, query = _parametros_exportacao()
+    corpo = exportacao.gerar_csv(query, colunas)
+
+    headers = {'Content-Disposition': 'attachment; filename=funcionarios.csv', 'Vary': 'Accept-Encoding'}
+    if 'gzip' in request.accept_encodings:
+        corpo = exportacao.comprimir_gzip(corpo)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(corpo), mimetype='text/csv', headers=headers)
+
+
+@main.route('/exportar_xlsx')
+@login_required
+@permission_required(['admin_rh', 'admin_ti', 'depto_pessoal'])
+def exportar_xlsx():
+    colunas, query = _parametros_exportacao()
+    return Response(
+        stream_with_context(exportacao.gerar_xlsx(query, colunas)),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers={'Content-Disposition': 'attachment; filename=funcionarios.xlsx'}
+    )
 
 
 ## REDEFINIÇÃO DE SENHA
@@ -808,9 +829,9 @@ def anonimizar_dados_funcionario(funcionario):
     # Apaga a foto de perfil se existir
     if funcionario.foto_perfil:
         try:
-            caminho_foto = os.path.join(current_app.config['UPLOAD_FOLDER'], 'fotos_perfil', funcionario.foto_perfil)
-            if os.path.exists(caminho_foto):
-                os.remove(caminho_foto)
+            # Apagada do disco quando a anonimização for confirmada (commit)
+            remover_arquivo(funcionario.foto_perfil, 'fotos_perfil')
+            remover_miniaturas(funcionario.foto_perfil)
             funcionario.foto_perfil = None
         except Exception as e:
             current_app.logger.error(f"Erro ao remover foto de perfil do funcionário {funcionario.id}: {e}")
@@ -854,6 +875,7 @@ def desligar_funcionario(funcionario_id):
         # 4. Remove as permissões de login do usuário (segurança extra)
         if funcionario.usuario:
             funcionario.usuario.permissoes = []
+            funcionario.usuario.invalidar_cache_permissoes()
 
         # 5. Registra o log do evento
         registrar_log(f"Realizou o processo de desligamento para o funcionário '{funcionario.nome}' (ID: {funcionario.id}).")
@@ -1,9 +1,7 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, jsonify, current_app
-from flask_login import login_required
-from .models import db, Funcionario, Usuario, VinculoADSugestao
-from .ad_sync import get_ad_connection
-from .utils import normalizar_nome
-from thefuzz import fuzz
+from flask import Blueprint, render_template, flash, redirect, url_for, jsonify, current_app, request
+from flask_login import login_required, current_user
+from .models import db, Usuario, VinculoADSugestao, AnaliseVinculoAD
+from .analise_ad import iniciar_analise, ultima_analise, AnaliseEmAndamento
 from .decorators import permission_required
 
 vinculo_bp = Blueprint('vinculo_ad', __name__)
@@ -13,63 +11,43 @@ vinculo_bp = Blueprint('vinculo_ad', __name__)
 @permission_required(['admin_ti'])
 def revisao_vinculos():
     sugestoes = VinculoADSugestao.query.order_by(VinculoADSugestao.pontuacao.desc()).all()
-    return render_template('vinculo_ad/revisao.html', sugestoes=sugestoes)
+    return render_template('vinculo_ad/revisao.html', sugestoes=sugestoes, analise=ultima_analise())
 
 @vinculo_bp.route('/executar-analise', methods=['POST'])
 @login_required
 @permission_required(['admin_ti'])
 def executar_analise():
+    """Agenda a análise em segundo plano; a página de revisão acompanha o progresso por polling."""
     try:
-        VinculoADSugestao.query.delete()
-        
-        # --- LÓGICA ALTERADA ---
-        # Agora buscamos funcionários que JÁ POSSUEM um usuário, para poder corrigir o vínculo.
-        funcionarios_com_usuario = Funcionario.query.join(Usuario).all()
-        
-        conn = get_ad_connection()
-        if not conn:
-            flash("Não foi possível conectar ao Active Directory.", "danger")
-            return redirect(url_for('vinculo_ad.revisao_vinculos'))
-        
-        # Busca todos os usuários do AD de uma vez para otimizar
-        conn.search(
-            search_base=current_app.config['LDAP_BASE_DN'],
-            search_filter='(&(objectClass=user)(sAMAccountName=*))',
-            attributes=['sAMAccountName', 'displayName']
-        )
-        usuarios_ad = conn.entries
-        conn.unbind()
+        analise = iniciar_analise(current_user.id)
+        status = 202
+    except AnaliseEmAndamento as e:
+        analise = e.analise
+        status = 409
 
-        contagem_sugestoes = 0
-        for func in funcionarios_com_usuario:
-            # Pula a análise se o username já parece estar vinculado corretamente
-            if func.usuario and func.usuario.username:
-                 if any(u.sAMAccountName.value.lower() == func.usuario.username.lower() for u in usuarios_ad):
-                    continue
-
-            match, pontuacao = encontrar_melhor_correspondencia(func.nome, usuarios_ad)
-            
-            # Gera sugestões para revisão manual (limiar de 80% de similaridade)
-            if pontuacao >= 80 and match:
-                nova_sugestao = VinculoADSugestao(
-                    funcionario_id=func.id,
-                    funcionario_nome=func.nome,
-                    ad_username=match.sAMAccountName.value,
-                    ad_display_name=match.displayName.value,
-                    pontuacao=pontuacao
-                )
-                db.session.add(nova_sugestao)
-                contagem_sugestoes += 1
-        
-        db.session.commit()
-        flash(f"Análise concluída! {contagem_sugestoes} sugestões de vínculo foram geradas para revisão.", "success")
-
-    except Exception as e:
-        db.session.rollback()
-        flash(f"Ocorreu um erro durante a análise: {str(e)}", "danger")
+    if request.accept_mimetypes.best == 'application/json':
+        resposta = jsonify(analise.to_dict())
+        resposta.status_code = status
+        resposta.headers['Location'] = url_for('vinculo_ad.status_analise', analise_id=analise.id)
+        return resposta
 
+    if status == 409:
+        flash("Já existe uma análise em andamento.", "warning")
+    elif analise.status == 'falhou':
+        flash(f"Ocorreu um erro durante a análise: {analise.erro}", "danger")
+    elif analise.status == 'concluida':
+        flash(f"Análise concluída! {analise.sugestoes} sugestões de vínculo foram geradas para revisão.", "success")
+    else:
+        flash("Análise iniciada. As sugestões aparecerão aqui quando ela terminar.", "info")
     return redirect(url_for('vinculo_ad.revisao_vinculos'))
 
+@vinculo_bp.route('/api/analises/<int:analise_id>')
+@login_required
+@permission_required(['admin_ti'])
+def status_analise(analise_id):
+    analise = AnaliseVinculoAD.query.get_or_404(analise_id)
+    return jsonify(analise.to_dict())
+
 @vinculo_bp.route('/api/vinculo/confirmar/<int:sugestao_id>', methods=['POST'])
 @login_required
 @permission_required(['admin_ti'])
@@ -100,23 +78,12 @@ def rejeitar_vinculo(sugestao_id):
     db.session.commit()
     return jsonify({'success': True, 'message': 'Sugestão rejeitada.'})
 
-def encontrar_melhor_correspondencia(nome_funcionario, lista_usuarios_ad):
-    """Função auxiliar para encontrar a melhor correspondência por similaridade de nome."""
-    nome_norm_func = normalizar_nome(nome_funcionario)
-    melhor_pontuacao = 0
-    melhor_match = None
-
-    for usuario_ad in lista_usuarios_ad:
-        if 'displayName' not in usuario_ad.entry_attributes_as_dict or not usuario_ad.displayName.value:
-            continue
-            
-        nome_ad = usuario_ad.displayName.value
-        nome_norm_ad = normalizar_nome(nome_ad)
-        
-        pontuacao = fuzz.token_sort_ratio(nome_norm_func, nome_norm_ad)
-        
-        if pontuacao > melhor_pontuacao:
-            melhor_pontuacao = pontuacao
-            melhor_match = usuario_ad
-            
-    return melhor_match, melhor_pontuacao
\ No newline at end of file
+@vinculo_bp.route('/api/pool-metricas')
+@login_required
+@permission_required(['admin_ti'])
+def metricas_pool_ad():
+    """Métricas do pool de conexões com o AD deste processo (worker)."""
+    pool = current_app.extensions.get('pool_ad')
+    if pool is None:
+        return jsonify({'ativo': False})
+    return jsonify({'ativo': True, **pool.metricas()})
@@ -86,15 +86,14 @@ def register_commands(app):
         Ele usa o e-mail da tabela Usuario como a fonte da verdade.
         """
         from app.models import Funcionario, Usuario, db
-        from flask import current_app
+        from app.ad_diretorio import get_diretorio_ad
 
-        # Extrai o domínio local do AD a partir da configuração
-        try:
-            domain = '.'.join([dc.split('=')[1] for dc in current_app.config['LDAP_BASE_DN'].split(',')])
-            ad_domain_pattern = f"%@{domain.lower()}"
-        except Exception as e:
-            print(f"ERRO: Não foi possível determinar o domínio do AD a partir de LDAP_BASE_DN. Verifique seu .env. Erro: {e}")
+        # Domínio local do AD, derivado de LDAP_BASE_DN na inicialização do app
+        domain = get_diretorio_ad().dominio
+        if not domain:
+            print("ERRO: Não foi possível determinar o domínio do AD a partir de LDAP_BASE_DN. Verifique seu .env.")
             return
+        ad_domain_pattern = f"%@{domain.lower()}"
 
         print(f"Procurando por funcionários com e-mails terminando em '{ad_domain_pattern}'...")
 
@@ -139,3 +138,149 @@ def register_commands(app):
         else:
             print("-" * 50)
             print("\nDry-run finalizado. Nenhuma alteração foi salva no banco de dados.")
+
+    @app.cli.command("email-drain")
+    @click.option('--max-lotes', type=int, default=None, help='Número máximo de lotes a processar.')
+    @click.option('--incluir-agendados', is_flag=True, help='Envia também as retentativas ainda em backoff.')
+    @click.option('--continuo', is_flag=True, help='Não termina: roda EMAIL_WORKERS workers que verificam a fila a cada EMAIL_INTERVALO_VERIFICACAO segundos.')
+    def email_drain(max_lotes, incluir_agendados, continuo):
+        """Processa a fila de e-mails (outbox) até esvaziá-la, reaproveitando a conexão SMTP por lote."""
+        from datetime import datetime
+        from app.email import get_fila_emails, processar_fila, LimitadorTaxa
+        from app.models import EmailPendente
+        from flask import current_app
+
+        if incluir_agendados:
+            EmailPendente.query.filter_by(status='pendente').update(
+                {'proxima_tentativa_em': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+
+        if continuo:
+            get_fila_emails().executar()
+
+        limitador = LimitadorTaxa(current_app.config.get('EMAIL_TAXA_MAXIMA', 0))
+        enviados, falhas = processar_fila(max_lotes=max_lotes, limitador=limitador)
+
+        restantes = EmailPendente.query.filter(EmailPendente.status.in_(['pendente', 'enviando'])).count()
+        descartados = EmailPendente.query.filter_by(status='falhou').count()
+        print(f"{enviados} e-mail(s) enviado(s), {falhas} falha(s) nesta execução.")
+        print(f"Na fila: {restantes} pendente(s); {descartados} descartado(s) após esgotar as tentativas.")
+
+    @app.cli.command("previas-processar")
+    @click.option('--max-lotes', type=int, default=None, help='Número máximo de lotes a processar.')
+    @click.option('--refazer-erros', is_flag=True, help='Devolve à fila as prévias que esgotaram as tentativas.')
+    @click.option('--continuo', is_flag=True, help='Não termina: verifica a fila a cada PREVIAS_INTERVALO_VERIFICACAO segundos.')
+    def previas_processar(max_lotes, refazer_erros, continuo):
+        """Gera as prévias (imagem da 1ª página e texto) dos PDFs armazenados que ainda não têm uma."""
+        from app.models import PreviaArquivo
+        from app.previas import processar_continuamente, processar_fila
+
+        if refazer_erros:
+            PreviaArquivo.query.filter_by(status='erro').update(
+                {'status': 'pendente', 'tentativas': 0}, synchronize_session=False
+            )
+            db.session.commit()
+
+        if continuo:
+            processar_continuamente()
+
+        prontas, falhas = processar_fila(max_lotes=max_lotes)
+
+        restantes = PreviaArquivo.query.filter(PreviaArquivo.status.in_(['pendente', 'processando'])).count()
+        com_erro = PreviaArquivo.query.filter_by(status='erro').count()
+        print(f"{prontas} prévia(s) gerada(s), {falhas} falha(s) nesta execução.")
+        print(f"Na fila: {restantes} pendente(s); {com_erro} com erro após esgotar as tentativas.")
+
+    @app.cli.command("ad-espelho-sync")
+    @click.option('--completo', is_flag=True, help='Relê todas as contas do AD em vez de aplicar só o delta.')
+    @click.option('--continuo', is_flag=True, help='Não termina: sincroniza a cada ESPELHO_AD_INTERVALO segundos.')
+    def ad_espelho_sync(completo, continuo):
+        """Atualiza o espelho local das contas do AD (incremental por uSNChanged, ou completo)."""
+        from ldap3.core.exceptions import LDAPException
+        from app.ad_espelho import sincronizar_continuamente, sincronizar_espelho
+
+        if continuo:
+            sincronizar_continuamente()
+
+        try:
+            resultado = sincronizar_espelho(completa=completo)
+        except LDAPException as e:
+            print(f"ERRO: não foi possível sincronizar com o AD: {e}")
+            return
+        tipo = 'completa' if resultado.completa else 'incremental'
+        print(f"Sincronização {tipo} concluída em {resultado.duracao:.2f}s: {resultado.inseridos} nova(s), "
+              f"{resultado.atualizados} alterada(s), {resultado.removidos} removida(s). USN atual: {resultado.usn_maximo}.")
+
+    @app.cli.command("ad-sync")
+    @click.option('--ids', default='', help='IDs de funcionários separados por vírgula (padrão: todos com usuário).')
+    @click.option('--status', 'status_filtro', default=None, help="Restringe aos funcionários com este status (ex.: 'Suspenso').")
+    @click.option('--concorrencia', type=int, default=None, help='Requisições LDAP em voo ao mesmo tempo.')
+    @click.option('--dry-run', is_flag=True, help='Apenas mostra o que seria alterado no AD.')
+    def ad_sync(ids, status_filtro, concorrencia, dry_run):
+        """Sincroniza nome, cargo, setor e situação (habilitada/desabilitada) dos funcionários com o AD."""
+        from app.ad_lote import sincronizar_funcionarios_ad
+        from app.models import Funcionario, Usuario
+
+        if ids:
+            lista_ids = [int(i) for i in ids.split(',') if i.strip()]
+        else:
+            query = db.session.query(Funcionario.id).join(Usuario, Usuario.funcionario_id == Funcionario.id)
+            if status_filtro:
+                query = query.filter(Funcionario.status == status_filtro)
+            lista_ids = [id_ for id_, in query]
+
+        relatorio = sincronizar_funcionarios_ad(lista_ids, simular=dry_run, concorrencia=concorrencia)
+        for resultado in relatorio.resultados:
+            if resultado.situacao in ('atualizado', 'erro', 'nao_encontrado'):
+                detalhes = ', '.join(resultado.alteracoes) or resultado.mensagem
+                print(f"[{resultado.situacao.upper()}] {resultado.nome} ({resultado.username}): {detalhes}")
+        print("-" * 50)
+        resumo = ', '.join(f'{situacao}: {total}' for situacao, total in sorted(relatorio.resumo.items()))
+        print(f"{len(relatorio.resultados)} funcionário(s) processado(s) — {resumo or 'nada a fazer'}.")
+        if dry_run:
+            print("Dry-run finalizado. Nenhuma alteração foi enviada ao AD.")
+
+    @app.cli.command("gerar-pendencias-admissao")
+    @click.option('--ids', default='', help='IDs de funcionários separados por vírgula (padrão: a leva ainda sem primeiro login).')
+    @click.option('--status', 'status_filtro', default='Ativo', help="Status dos funcionários da leva (vazio = todos).")
+    @click.option('--incluir-ja-logados', is_flag=True, help='Inclui também quem já fez o primeiro login.')
+    @click.option('--dry-run', is_flag=True, help='Apenas conta as pendências que seriam criadas.')
+    def gerar_pendencias_admissao_cmd(ids, status_filtro, incluir_ja_logados, dry_run):
+        """Cria, em um único INSERT, as requisições de documentos de admissão que faltam para uma leva de contratados."""
+        from sqlalchemy import func, select
+        from app.pendencias_admissao import coorte_admissao, gerar_pendencias_admissao, pendencias_faltantes
+
+        lista_ids = [int(i) for i in ids.split(',') if i.strip()]
+        coorte = coorte_admissao(lista_ids, status=status_filtro or None,
+                                 apenas_sem_primeiro_login=not incluir_ja_logados)
+        total_coorte = db.session.scalar(select(func.count()).select_from(coorte.subquery()))
+
+        if dry_run:
+            faltantes = db.session.scalar(select(func.count()).select_from(pendencias_faltantes(coorte).subquery()))
+            print(f"{total_coorte} funcionário(s) na leva; {faltantes} requisição(ões) seriam criadas.")
+            print("Dry-run finalizado. Nenhuma alteração foi salva.")
+            return
+
+        criadas = gerar_pendencias_admissao(coorte)
+        db.session.commit()
+        print(f"{total_coorte} funcionário(s) na leva; {criadas} requisição(ões) de admissão criada(s).")
+
+    @app.cli.command("migrar-uploads")
+    @click.option('--lote', type=int, default=500, help='Arquivos por lote (um commit por lote).')
+    @click.option('--pausa', type=float, default=0.0, help='Segundos de espera entre os lotes.')
+    @click.option('--dry-run', is_flag=True, help='Apenas conta os arquivos antigos que seriam migrados.')
+    def migrar_uploads(lote, pausa, dry_run):
+        """Move os arquivos das pastas planas de UPLOAD_FOLDER para o armazenamento em blobs/ab/cd/<sha256>."""
+        from app.armazenamento import migrar_arquivos_legados
+
+        def progresso(tabela, contagem):
+            print(f"  {tabela}: {contagem['migrados']} migrado(s), {contagem['ausentes']} ausente(s)...")
+
+        resumo = migrar_arquivos_legados(tamanho_lote=lote, pausa=pausa, simular=dry_run, ao_concluir_lote=progresso)
+        print("-" * 50)
+        for tabela, contagem in resumo.items():
+            print(f"{tabela}: {contagem['migrados']} arquivo(s) {'a migrar' if dry_run else 'migrado(s)'}, "
+                  f"{contagem['ausentes']} sem arquivo em disco.")
+        if dry_run:
+            print("Dry-run finalizado. Nenhum arquivo foi movido.")
@@ -0,0 +1,24 @@
+"""Adiciona índice funcional lower(username) em usuario
+
+Revision ID: 0b9d4e7a2c51
+Revises: f8c3a62d4e15
+Create Date: 2025-10-24 10:06:31.482917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9d4e7a2c51'
+down_revision = 'f8c3a62d4e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_usuario_username_lower', 'usuario', [sa.text('lower(username)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_usuario_username_lower', table_name='usuario')
@@ -0,0 +1,32 @@
+"""Adiciona origem às requisições e índice único das pendências de admissão
+
+Revision ID: 3d6f1b8e9a07
+Revises: 0b9d4e7a2c51
+Create Date: 2025-10-24 14:21:53.907266
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d6f1b8e9a07'
+down_revision = '0b9d4e7a2c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('requisicao_documento', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('origem', sa.String(length=20), nullable=True))
+
+    # Requisições antigas ficam com origem NULL: o índice só vale para as geradas daqui em diante
+    op.create_index('uq_requisicao_admissao', 'requisicao_documento', ['destinatario_id', 'tipo_documento_id'],
+                    unique=True, postgresql_where=sa.text("origem = 'admissao'"),
+                    sqlite_where=sa.text("origem = 'admissao'"))
+
+
+def downgrade():
+    op.drop_index('uq_requisicao_admissao', table_name='requisicao_documento')
+    with op.batch_alter_table('requisicao_documento', schema=None) as batch_op:
+        batch_op.drop_column('origem')
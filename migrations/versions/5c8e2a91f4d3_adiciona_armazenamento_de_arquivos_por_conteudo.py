@@ -0,0 +1,50 @@
+"""Adiciona armazenamento de arquivos por conteúdo (blobs SHA-256 com contagem de referências)
+
+Revision ID: 5c8e2a91f4d3
+Revises: 3d6f1b8e9a07
+Create Date: 2025-10-27 09:48:12.630574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e2a91f4d3'
+down_revision = '3d6f1b8e9a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('arquivo_blob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('tamanho', sa.BigInteger(), nullable=False),
+    sa.Column('caminho', sa.String(length=255), nullable=False),
+    sa.Column('referencias', sa.Integer(), nullable=False),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256')
+    )
+    op.create_table('arquivo_armazenado',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nome', sa.String(length=512), nullable=False),
+    sa.Column('pasta', sa.String(length=50), nullable=False),
+    sa.Column('blob_id', sa.Integer(), nullable=False),
+    sa.Column('nome_original', sa.String(length=255), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['blob_id'], ['arquivo_blob.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nome')
+    )
+    with op.batch_alter_table('arquivo_armazenado', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_arquivo_armazenado_blob_id'), ['blob_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('arquivo_armazenado', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_arquivo_armazenado_blob_id'))
+
+    op.drop_table('arquivo_armazenado')
+    op.drop_table('arquivo_blob')
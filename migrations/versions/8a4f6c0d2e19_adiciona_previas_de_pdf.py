@@ -0,0 +1,53 @@
+"""Adiciona prévias de PDF (imagem da primeira página e texto pesquisável)
+
+Revision ID: 8a4f6c0d2e19
+Revises: 5c8e2a91f4d3
+Create Date: 2025-10-29 14:21:37.104418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4f6c0d2e19'
+down_revision = '5c8e2a91f4d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('previa_arquivo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('blob_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('bloqueado_em', sa.DateTime(), nullable=True),
+    sa.Column('ultimo_erro', sa.Text(), nullable=True),
+    sa.Column('paginas', sa.Integer(), nullable=True),
+    sa.Column('tem_imagem', sa.Boolean(), nullable=False),
+    sa.Column('texto', sa.Text(), nullable=True),
+    sa.Column('texto_busca', sa.Text(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.Column('processado_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['blob_id'], ['arquivo_blob.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('blob_id')
+    )
+    with op.batch_alter_table('previa_arquivo', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_previa_arquivo_status'), ['status'], unique=False)
+
+    # Como em funcionario.busca: no PostgreSQL, o LIKE '%termo%' sobre o texto usa um índice GIN de trigramas
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_previa_arquivo_texto_busca_trgm ON previa_arquivo USING gin (texto_busca gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_previa_arquivo_texto_busca_trgm')
+
+    with op.batch_alter_table('previa_arquivo', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_previa_arquivo_status'))
+
+    op.drop_table('previa_arquivo')
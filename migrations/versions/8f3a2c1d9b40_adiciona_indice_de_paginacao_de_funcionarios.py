@@ -0,0 +1,26 @@
+"""Adiciona indice de paginacao de funcionarios
+
+Revision ID: 8f3a2c1d9b40
+Revises: ceb6a60f8c94
+Create Date: 2025-10-20 09:12:41.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3a2c1d9b40'
+down_revision = 'ceb6a60f8c94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('funcionario', schema=None) as batch_op:
+        batch_op.create_index('ix_funcionario_nome_id', ['nome', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('funcionario', schema=None) as batch_op:
+        batch_op.drop_index('ix_funcionario_nome_id')
@@ -0,0 +1,29 @@
+"""Adiciona índices em funcionario.cargo_id e funcionario.setor_id
+
+Revision ID: 9c1e5d7b3a42
+Revises: 8a4f6c0d2e19
+Create Date: 2025-10-30 09:12:48.530216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1e5d7b3a42'
+down_revision = '8a4f6c0d2e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A busca de funcionários filtra por cargo_id IN (...) / setor_id IN (...) (ver app/busca.py)
+    with op.batch_alter_table('funcionario', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_funcionario_cargo_id'), ['cargo_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_funcionario_setor_id'), ['setor_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('funcionario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_funcionario_setor_id'))
+        batch_op.drop_index(batch_op.f('ix_funcionario_cargo_id'))
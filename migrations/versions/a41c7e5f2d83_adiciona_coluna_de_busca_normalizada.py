@@ -0,0 +1,58 @@
+"""Adiciona coluna de busca normalizada ao funcionario
+
+Revision ID: a41c7e5f2d83
+Revises: 8f3a2c1d9b40
+Create Date: 2025-10-21 14:03:17.551902
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from unidecode import unidecode
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c7e5f2d83'
+down_revision = '8f3a2c1d9b40'
+branch_labels = None
+depends_on = None
+
+
+def _normalizar(texto, apenas_letras=False):
+    # Cópia de app/busca.texto_busca_funcionario, para a migração não depender do app
+    if not texto:
+        return ''
+    texto = unidecode(texto).lower()
+    if apenas_letras:
+        texto = re.sub(r'[^a-z\s]', '', texto)
+    return re.sub(r'\s+', ' ', texto).strip()
+
+
+def upgrade():
+    with op.batch_alter_table('funcionario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('busca', sa.Text(), nullable=True))
+
+    # Preenche a coluna para os funcionários já existentes
+    conn = op.get_bind()
+    funcionario = sa.table('funcionario',
+        sa.column('id', sa.Integer), sa.column('nome', sa.String), sa.column('apelido', sa.String),
+        sa.column('email', sa.String), sa.column('cpf', sa.String), sa.column('busca', sa.Text))
+    linhas = conn.execute(sa.select(funcionario.c.id, funcionario.c.nome, funcionario.c.apelido,
+                                    funcionario.c.email, funcionario.c.cpf)).fetchall()
+    for id_, nome, apelido, email, cpf in linhas:
+        partes = [_normalizar(nome, True), _normalizar(apelido, True), _normalizar(email), re.sub(r'\D', '', cpf or '')]
+        conn.execute(funcionario.update().where(funcionario.c.id == id_).values(busca=' '.join(p for p in partes if p)))
+
+    # No PostgreSQL, um índice GIN de trigramas atende ao LIKE '%termo%' e à ordenação por similaridade
+    if conn.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_funcionario_busca_trgm ON funcionario USING gin (busca gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_funcionario_busca_trgm')
+
+    with op.batch_alter_table('funcionario', schema=None) as batch_op:
+        batch_op.drop_column('busca')
@@ -0,0 +1,42 @@
+"""Adiciona fila de e-mails (outbox)
+
+Revision ID: d5e81b9c3f27
+Revises: a41c7e5f2d83
+Create Date: 2025-10-22 10:41:05.318240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e81b9c3f27'
+down_revision = 'a41c7e5f2d83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('destinatario', sa.String(length=120), nullable=False),
+    sa.Column('assunto', sa.String(length=255), nullable=False),
+    sa.Column('corpo', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('proxima_tentativa_em', sa.DateTime(), nullable=False),
+    sa.Column('bloqueado_em', sa.DateTime(), nullable=True),
+    sa.Column('ultimo_erro', sa.Text(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.Column('enviado_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_email_outbox_status_proxima', ['status', 'proxima_tentativa_em'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_email_outbox_status_proxima')
+
+    op.drop_table('email_outbox')
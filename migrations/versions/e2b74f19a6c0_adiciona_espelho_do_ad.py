@@ -0,0 +1,49 @@
+"""Adiciona espelho local das contas do AD
+
+Revision ID: e2b74f19a6c0
+Revises: d5e81b9c3f27
+Create Date: 2025-10-23 09:12:47.550913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b74f19a6c0'
+down_revision = 'd5e81b9c3f27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ad_espelho_usuario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('object_guid', sa.String(length=64), nullable=False),
+    sa.Column('sam_account_name', sa.String(length=120), nullable=False),
+    sa.Column('display_name', sa.String(length=255), nullable=True),
+    sa.Column('mail', sa.String(length=255), nullable=True),
+    sa.Column('user_account_control', sa.Integer(), nullable=True),
+    sa.Column('usn_changed', sa.BigInteger(), nullable=False),
+    sa.Column('distinguished_name', sa.String(length=512), nullable=True),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('object_guid')
+    )
+    op.create_index('ix_ad_espelho_usuario_sam_lower', 'ad_espelho_usuario', [sa.text('lower(sam_account_name)')], unique=False)
+
+    op.create_table('ad_espelho_estado',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('servidor', sa.String(length=255), nullable=True),
+    sa.Column('usn_maximo', sa.BigInteger(), nullable=False),
+    sa.Column('geracao', sa.Integer(), nullable=False),
+    sa.Column('ultima_sincronizacao', sa.DateTime(), nullable=True),
+    sa.Column('ultima_sincronizacao_completa', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('ad_espelho_estado')
+    op.drop_index('ix_ad_espelho_usuario_sam_lower', table_name='ad_espelho_usuario')
+    op.drop_table('ad_espelho_usuario')
@@ -0,0 +1,43 @@
+"""Adiciona tabela de análises de vínculo com o AD
+
+Revision ID: f8c3a62d4e15
+Revises: e2b74f19a6c0
+Create Date: 2025-10-23 15:37:02.118604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8c3a62d4e15'
+down_revision = 'e2b74f19a6c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('vinculo_ad_analise',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('progresso', sa.Integer(), nullable=False),
+    sa.Column('total_funcionarios', sa.Integer(), nullable=False),
+    sa.Column('processados', sa.Integer(), nullable=False),
+    sa.Column('sugestoes', sa.Integer(), nullable=False),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('solicitado_por_id', sa.Integer(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.Column('iniciado_em', sa.DateTime(), nullable=True),
+    sa.Column('concluido_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['solicitado_por_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('vinculo_ad_analise', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_vinculo_ad_analise_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vinculo_ad_analise', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_vinculo_ad_analise_status'))
+
+    op.drop_table('vinculo_ad_analise')
@@ -0,0 +1,97 @@
+"""
+Benchmark de latência da busca de funcionários sobre uma tabela sintética,
+comparando o ILIKE antigo (com JOIN em cargo/setor) com 'busca.buscar_funcionarios'.
+
+Uso:
+    python scripts/bench_busca.py [--funcionarios 50000] [--repeticoes 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import or_
+
+from app import create_app, db
+from app.models import Funcionario, Cargo, Setor
+from app.busca import buscar_funcionarios, texto_busca_funcionario
+
+NOMES = ['João', 'José', 'Maria', 'Ana', 'Antônio', 'Márcia', 'Luís', 'Conceição', 'Sebastião', 'Cláudia']
+SOBRENOMES = ['Silva', 'Souza', 'Gonçalves', 'Araújo', 'Simões', 'Magalhães', 'Lopes', 'Brandão', 'Ribeiro', 'Assunção']
+TERMOS = ['joao', 'Araújo', 'conceicao silva', 'simoes', '123.45', 'analista', 'brandao', 'ma']
+
+
+def busca_legado(termo, limite):
+    """Implementação anterior, mantida aqui apenas para comparação."""
+    termo_like = f"%{termo}%"
+    return Funcionario.query.outerjoin(Cargo).outerjoin(Setor).filter(or_(
+        Funcionario.nome.ilike(termo_like),
+        Funcionario.cpf.ilike(termo_like),
+        Funcionario.email.ilike(termo_like),
+        Cargo.nome.ilike(termo_like),
+        Setor.nome.ilike(termo_like)
+    )).order_by(Funcionario.nome).limit(limite).all()
+
+
+def popular_banco(n_funcionarios):
+    cargos = [Cargo(nome=n) for n in ('Analista', 'Assistente', 'Coordenador', 'Advogado', 'Estagiário')]
+    setores = [Setor(nome=n) for n in ('Jurídico', 'Financeiro', 'Tecnologia', 'Recursos Humanos')]
+    db.session.add_all(cargos + setores)
+    db.session.flush()
+
+    rng = random.Random(42)
+    linhas = []
+    for i in range(n_funcionarios):
+        f = Funcionario(
+            nome=f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}",
+            cpf=f"{i:011d}", email=f"func{i}@example.com"
+        )
+        # bulk_insert_mappings não dispara os eventos do ORM: a coluna é preenchida aqui
+        linhas.append({
+            'nome': f.nome, 'cpf': f.cpf, 'email': f.email, 'busca': texto_busca_funcionario(f),
+            'cargo_id': rng.choice(cargos).id, 'setor_id': rng.choice(setores).id,
+        })
+    db.session.bulk_insert_mappings(Funcionario, linhas)
+    db.session.commit()
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        for termo in TERMOS:
+            inicio = time.perf_counter()
+            funcao(termo)
+            tempos.append(time.perf_counter() - inicio)
+            db.session.expunge_all()
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000, tempos[int(len(tempos) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funcionarios', type=int, default=50000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--limite', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        popular_banco(args.funcionarios)
+
+        inicio = time.perf_counter()
+        buscar_funcionarios('aquecimento')  # constrói o índice em memória (SQLite)
+        print(f"Construção do índice: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        legado = medir(lambda t: busca_legado(t, args.limite), args.repeticoes)
+        atual = medir(lambda t: buscar_funcionarios(t, limite=args.limite), args.repeticoes)
+
+    print(f"Antes (ILIKE + JOIN):  p50 {legado[0]:7.2f} ms   p95 {legado[1]:7.2f} ms")
+    print(f"Depois (normalizada):  p50 {atual[0]:7.2f} ms   p95 {atual[1]:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
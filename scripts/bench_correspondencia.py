@@ -0,0 +1,122 @@
+"""
+Benchmark da sugestão de vínculos funcionário x AD: o laço antigo (normalizar_nome e
+token_sort_ratio sobre o produto cartesiano) contra 'IndiceCorrespondencia'.
+
+O laço antigo é medido sobre uma amostra de funcionários e extrapolado para o total; a
+mesma amostra confere se as sugestões (pontuação >= 80) são as mesmas nas duas versões.
+
+Uso:
+    python scripts/bench_correspondencia.py [--funcionarios 10000] [--contas 10000] [--amostra 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from thefuzz import fuzz
+
+from app.correspondencia import IndiceCorrespondencia, numpy
+from app.utils import normalizar_nome
+
+NOMES = ['João', 'José', 'Maria', 'Ana', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas', 'Luiz',
+         'Marcos', 'Luís', 'Gabriel', 'Rafael', 'Márcia', 'Juliana', 'Fernanda', 'Patrícia', 'Aline', 'Sandra',
+         'Camila', 'Amanda', 'Bruna', 'Jéssica', 'Letícia', 'Júlia', 'Luciana', 'Vanessa', 'Mariana', 'Conceição',
+         'Sebastião', 'Cláudia', 'Rodrigo', 'Eduardo', 'Felipe', 'Gustavo', 'Thiago', 'Vinícius', 'Beatriz']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira',
+              'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado',
+              'Mendes', 'Freitas', 'Cardoso', 'Ramos', 'Gonçalves', 'Santana', 'Teixeira', 'Araújo', 'Simões',
+              'Magalhães', 'Brandão', 'Assunção', 'Cavalcanti', 'Monteiro', 'Moura', 'Correia', 'Batista']
+PARTICULAS = ['da', 'de', 'dos', '']
+
+
+def nome_completo(rng):
+    partes = [rng.choice(NOMES)]
+    for _ in range(rng.randint(1, 3)):
+        particula = rng.choice(PARTICULAS)
+        if particula:
+            partes.append(particula)
+        partes.append(rng.choice(SOBRENOMES))
+    return ' '.join(partes)
+
+
+def variacao_ad(nome, rng):
+    """Como o nome costuma aparecer no displayName: abreviado, sem acento, com erro de digitação."""
+    partes = [p for p in nome.split() if p not in PARTICULAS]
+    sorteio = rng.random()
+    if sorteio < 0.4 and len(partes) > 2:
+        partes = [partes[0], partes[-1]]
+    elif sorteio < 0.6:
+        i = rng.randrange(len(partes))
+        palavra = partes[i]
+        j = rng.randrange(len(palavra))
+        partes[i] = palavra[:j] + palavra[j + 1:] if len(palavra) > 3 else palavra
+    return ' '.join(partes)
+
+
+def gerar(n_funcionarios, n_contas, seed=42):
+    rng = random.Random(seed)
+    funcionarios = [nome_completo(rng) for _ in range(n_funcionarios)]
+    contas = []
+    for i in range(n_contas):
+        # ~70% das contas pertencem a algum funcionário; o resto são contas de terceiros/serviço
+        nome = variacao_ad(rng.choice(funcionarios), rng) if rng.random() < 0.7 else nome_completo(rng)
+        contas.append({'sAMAccountName': f'conta{i}', 'displayName': nome})
+    return funcionarios, contas
+
+
+def correspondencia_legado(nome_funcionario, lista_usuarios_ad):
+    """Implementação anterior, mantida aqui apenas para comparação."""
+    nome_norm_func = normalizar_nome(nome_funcionario)
+    melhor_pontuacao = 0
+    melhor_match = None
+    for usuario_ad in lista_usuarios_ad:
+        if not usuario_ad['displayName']:
+            continue
+        pontuacao = fuzz.token_sort_ratio(nome_norm_func, normalizar_nome(usuario_ad['displayName']))
+        if pontuacao > melhor_pontuacao:
+            melhor_pontuacao = pontuacao
+            melhor_match = usuario_ad
+    return melhor_match, melhor_pontuacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funcionarios', type=int, default=10000)
+    parser.add_argument('--contas', type=int, default=10000)
+    parser.add_argument('--amostra', type=int, default=200)
+    args = parser.parse_args()
+
+    funcionarios, contas = gerar(args.funcionarios, args.contas)
+    amostra = random.Random(7).sample(funcionarios, min(args.amostra, len(funcionarios)))
+
+    inicio = time.perf_counter()
+    legado = {}
+    for nome in amostra:
+        match, pontuacao = correspondencia_legado(nome, contas)
+        legado[nome] = (match['sAMAccountName'], pontuacao) if match and pontuacao >= 80 else None
+    tempo_legado = (time.perf_counter() - inicio) * len(funcionarios) / len(amostra)
+
+    inicio = time.perf_counter()
+    indice = IndiceCorrespondencia(contas)
+    tempo_indice = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    sugestoes = {nome: (item['sAMAccountName'], pontuacao) for nome, item, pontuacao in indice.correspondencias(funcionarios)}
+    tempo_blocos = time.perf_counter() - inicio
+
+    divergencias = sum(1 for nome in amostra if legado[nome] != sugestoes.get(nome))
+    print(f"{args.funcionarios} funcionários x {args.contas} contas; {len(sugestoes)} sugestões")
+    print(f"Antes (produto cartesiano): ~{tempo_legado:8.1f} s (extrapolado de {len(amostra)} funcionários)")
+    print(f"Depois (blocos):             {tempo_blocos + tempo_indice:8.2f} s (índice: {tempo_indice:.2f} s)")
+    if numpy is not None:
+        inicio = time.perf_counter()
+        total = sum(1 for _ in indice.correspondencias(funcionarios, modo='cdist'))
+        print(f"Depois (cdist):              {time.perf_counter() - inicio:8.2f} s ({total} sugestões)")
+    print(f"Divergências na amostra: {divergencias} de {len(amostra)}")
+
+
+if __name__ == '__main__':
+    main()
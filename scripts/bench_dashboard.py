@@ -0,0 +1,106 @@
+"""
+Benchmark do dashboard (main.index): conta consultas SQL e mede o tempo por requisição.
+
+Uso:
+    python scripts/bench_dashboard.py [--funcionarios 2000] [--avisos 200] [--requisicoes 50]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import (Usuario, Funcionario, Permissao, Aviso, LogCienciaAviso,
+                        RequisicaoDocumento, TipoDocumento, Ponto)
+
+
+class ContadorConsultas:
+    """Conta as consultas executadas no engine enquanto estiver ativo."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _contar(self, *args, **kwargs):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._contar)
+
+
+def popular_banco(n_funcionarios, n_avisos, n_requisicoes):
+    p_admin = Permissao(nome='admin_rh')
+    admin_func = Funcionario(nome='Admin Bench', cpf='000', email='admin@bench.local',
+                             data_nascimento=date.today())
+    admin = Usuario(username='admin', email='admin@bench.local', funcionario=admin_func,
+                    data_consentimento=datetime.utcnow())
+    admin.set_password('bench')
+    admin.permissoes.append(p_admin)
+    db.session.add_all([p_admin, admin_func, admin])
+
+    for i in range(n_funcionarios):
+        db.session.add(Funcionario(nome=f'Funcionario {i}', cpf=f'cpf-{i}', email=f'f{i}@bench.local',
+                                   data_nascimento=date(1990, (i % 12) + 1, (i % 28) + 1)))
+    db.session.flush()
+
+    avisos = [Aviso(titulo=f'Aviso {i}', conteudo='...', autor_id=admin.id) for i in range(n_avisos)]
+    db.session.add_all(avisos)
+    db.session.flush()
+    # Metade dos avisos já foi lida pelo admin
+    for aviso in avisos[::2]:
+        db.session.add(LogCienciaAviso(aviso_id=aviso.id, usuario_id=admin.id))
+
+    tipos = [TipoDocumento(nome=f'Tipo {i}') for i in range(n_requisicoes)]
+    db.session.add_all(tipos)
+    db.session.flush()
+    for tipo in tipos:
+        db.session.add(RequisicaoDocumento(tipo_documento_id=tipo.id, destinatario_id=admin_func.id))
+        db.session.add(Ponto(funcionario_id=admin_func.id, data_ajuste=date.today(), tipo_ajuste='Entrada'))
+    db.session.commit()
+    return admin.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--funcionarios', type=int, default=2000)
+    parser.add_argument('--avisos', type=int, default=200)
+    parser.add_argument('--requisicoes', type=int, default=50)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        admin_id = popular_banco(args.funcionarios, args.avisos, args.requisicoes)
+        client = app.test_client()
+        with client.session_transaction() as sessao:
+            sessao['_user_id'] = str(admin_id)
+            sessao['_fresh'] = True
+
+        # Aquecimento (compilação de templates e cache de SQL)
+        client.get('/')
+
+        with ContadorConsultas(db.engine) as contador:
+            resposta = client.get('/')
+        assert resposta.status_code == 200, resposta.status_code
+
+        inicio = time.perf_counter()
+        for _ in range(args.repeticoes):
+            client.get('/')
+        media_ms = (time.perf_counter() - inicio) * 1000 / args.repeticoes
+
+        print(f"Consultas SQL por requisição: {contador.total}")
+        print(f"Tempo médio por requisição: {media_ms:.2f} ms ({args.repeticoes} repetições)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark do login pelo AD contra um LDAP simulado (ldap3 MOCK_SYNC): o caminho antigo
+(domínio recalculado e um Server novo por login, com leitura de schema/DSE) contra
+'DiretorioAD.autenticar' (Server compartilhado, um bind + uma busca).
+
+No mock, a leitura do schema/DSE é a carga do schema offline do AD 2012 R2 em cada Server
+novo; '--latencia' soma um tempo de ida e volta por operação LDAP para aproximar a rede
+(o caminho antigo faz 4 operações: bind, DSE, schema e busca; o novo, 2).
+
+Uso:
+    python scripts/bench_login.py [--logins 300] [--usuarios 1000] [--latencia 0]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ldap3 import Server, Connection, MOCK_SYNC, OFFLINE_AD_2012_R2
+
+from app.ad_diretorio import DiretorioAD
+
+CONFIG = {
+    'LDAP_HOST': 'ad-mock',
+    'LDAP_BASE_DN': 'DC=mdr,DC=local',
+    'LDAP_USERS_DN': 'OU=Usuarios,DC=mdr,DC=local',
+    # O bind do mock só reconhece DNs existentes no DIT (não resolve UPNs)
+    'LDAP_FORMATO_BIND': 'CN={username},OU=Usuarios,DC=mdr,DC=local',
+}
+
+
+def montar_ad(n_usuarios):
+    servidor = Server(CONFIG['LDAP_HOST'], get_info=OFFLINE_AD_2012_R2)
+    carga = Connection(servidor, client_strategy=MOCK_SYNC)
+    for i in range(n_usuarios):
+        carga.strategy.add_entry(f'CN=usuario{i},{CONFIG["LDAP_USERS_DN"]}', {
+            'objectClass': ['top', 'person', 'user'], 'cn': f'Usuário {i}', 'sAMAccountName': f'usuario{i}',
+            'mail': f'usuario{i}@mdr.gov.br', 'userPassword': f'senha{i}',
+        })
+    return servidor
+
+
+def login_legado(servidor_base, username, senha, latencia):
+    """Implementação anterior de auth.login_post, mantida aqui apenas para comparação."""
+    domain = '.'.join([dc.split('=')[1] for dc in CONFIG['LDAP_BASE_DN'].split(',')])
+    assert domain
+    # Server novo a cada login: o schema/DSE é lido de novo (aqui, carregado do schema offline)
+    server = Server(CONFIG['LDAP_HOST'], get_info=OFFLINE_AD_2012_R2)
+    server.dit, server.dit_lock = servidor_base.dit, servidor_base.dit_lock
+    conn = Connection(server, user=CONFIG['LDAP_FORMATO_BIND'].format(username=username),
+                      password=senha, client_strategy=MOCK_SYNC)
+    # auto_bind=True no original; no mock ele fecha a conexão, então o bind é explícito
+    conn.bind()
+    conn.search(search_base=CONFIG['LDAP_BASE_DN'],
+                search_filter=f'(&(objectClass=person)(sAMAccountName={username}))',
+                attributes=['cn', 'mail', 'sAMAccountName'])
+    entrada = conn.entries[0]
+    dados = (entrada.cn.value, entrada.mail.value, entrada.sAMAccountName.value)
+    conn.unbind()
+    time.sleep(4 * latencia)
+    return dados
+
+
+def login_diretorio(diretorio, username, senha, latencia):
+    dados = diretorio.autenticar(username, senha)
+    time.sleep(2 * latencia)
+    return dados
+
+
+def medir(funcao, logins):
+    tempos = []
+    for username, senha in logins:
+        inicio = time.perf_counter()
+        funcao(username, senha)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    quantis = statistics.quantiles(tempos, n=100)
+    return quantis[49], quantis[94]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=300)
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--latencia', type=float, default=0.0, help='ms por operação LDAP')
+    args = parser.parse_args()
+
+    servidor = montar_ad(args.usuarios)
+    diretorio = DiretorioAD(CONFIG, servidor=servidor, estrategia=MOCK_SYNC)
+    rng = random.Random(42)
+    logins = [(f'usuario{i}', f'senha{i}') for i in (rng.randrange(args.usuarios) for _ in range(args.logins))]
+    latencia = args.latencia / 1000
+
+    legado = medir(lambda u, s: login_legado(servidor, u, s, latencia), logins)
+    novo = medir(lambda u, s: login_diretorio(diretorio, u, s, latencia), logins)
+
+    print(f"{args.logins} logins, {args.usuarios} contas no AD simulado, latência {args.latencia:g} ms/operação")
+    print(f"Antes (Server por login):   p50 {legado[0]:7.2f} ms   p95 {legado[1]:7.2f} ms")
+    print(f"Depois (Server do app):     p50 {novo[0]:7.2f} ms   p95 {novo[1]:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark do envio de um aviso para muitos destinatários: 'send_email' por destinatário
+(render_template + commit a cada mensagem) contra 'send_email_em_lote' (template
+compilado uma vez, corpos gerados sob demanda e gravados na outbox em blocos).
+
+Reporta o tempo total e o pico de memória alocada (tracemalloc) de cada abordagem.
+
+Uso:
+    python scripts/bench_notificacoes.py [--destinatarios 10000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.email import send_email, send_email_em_lote
+from app.models import EmailPendente
+
+AVISO = SimpleNamespace(titulo='Recesso de fim de ano', conteudo='O escritório estará fechado entre os dias 24/12 e 01/01. ' * 5)
+
+
+def destinatarios(n):
+    for i in range(n):
+        usuario = SimpleNamespace(email=f'func{i}@example.com', funcionario=SimpleNamespace(nome=f'Funcionário {i}'))
+        yield usuario.email, {'user': usuario}
+
+
+def por_destinatario(n):
+    for email, contexto in destinatarios(n):
+        send_email(email, f"Novo Aviso no Mural: {AVISO.titulo}", 'email/novo_aviso', aviso=AVISO, **contexto)
+        db.session.commit()
+
+
+def em_lote(n):
+    send_email_em_lote(f"Novo Aviso no Mural: {AVISO.titulo}", 'email/novo_aviso', destinatarios(n), aviso=AVISO)
+    db.session.commit()
+
+
+def medir(funcao, n):
+    EmailPendente.query.delete()
+    db.session.commit()
+    db.session.expunge_all()
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcao(n)
+    decorrido = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert EmailPendente.query.count() == n
+    return decorrido, pico / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--destinatarios', type=int, default=10000)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context(), app.test_request_context('/'):
+        db.create_all()
+        resultados = {
+            'Antes (send_email por destinatário)': medir(por_destinatario, args.destinatarios),
+            'Depois (send_email_em_lote)': medir(em_lote, args.destinatarios),
+        }
+
+    for nome, (decorrido, pico) in resultados.items():
+        print(f"{nome:38s} {decorrido:7.2f} s   pico {pico:7.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark da renderização de 'base.html' comparando a checagem de permissões
+antiga (varredura linear de 'usuario.permissoes') com o cache por requisição (frozenset com isdisjoint).
+
+Uso:
+    python scripts/bench_permissoes.py [--repeticoes 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import render_template_string
+from flask_login import login_user
+
+from app import create_app, db
+from app.models import Usuario, Funcionario, Permissao
+
+TEMPLATE = "{% extends 'base.html' %}"
+
+
+def tem_permissao_legado(self, nome_permissao):
+    """Implementação anterior, mantida aqui apenas para comparação."""
+    if isinstance(nome_permissao, list):
+        return any(p.nome in nome_permissao for p in self.permissoes)
+    return any(p.nome == nome_permissao for p in self.permissoes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        permissoes = [Permissao(nome=n) for n in ('colaborador', 'supervisor', 'admin_ti', 'depto_pessoal', 'admin_rh')]
+        funcionario = Funcionario(nome='Bench Usuario', cpf='000', email='bench@local')
+        usuario = Usuario(username='bench', email='bench@local', funcionario=funcionario,
+                          data_consentimento=datetime.utcnow())
+        usuario.set_password('bench')
+        usuario.permissoes.extend(permissoes)
+        db.session.add_all(permissoes + [funcionario, usuario])
+        db.session.commit()
+
+        with app.test_request_context('/'):
+            login_user(usuario)
+            render_template_string(TEMPLATE)  # aquecimento do Jinja
+
+            def renderizar():
+                # Simula uma requisição nova: o cache começa vazio a cada página
+                usuario.invalidar_cache_permissoes()
+                render_template_string(TEMPLATE)
+
+            atual = timeit.timeit(renderizar, number=args.repeticoes)
+
+            original = Usuario.tem_permissao
+            Usuario.tem_permissao = tem_permissao_legado
+            try:
+                legado = timeit.timeit(renderizar, number=args.repeticoes)
+            finally:
+                Usuario.tem_permissao = original
+
+    por_render = lambda total: total * 1e6 / args.repeticoes
+    print(f"Antes (varredura linear): {por_render(legado):8.1f} us por render")
+    print(f"Depois (frozenset):       {por_render(atual):8.1f} us por render")
+
+
+if __name__ == '__main__':
+    main()
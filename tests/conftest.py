@@ -18,4 +18,45 @@ def app():
 @pytest.fixture(scope='function')
 def client(app):
     """Um cliente de teste para a aplicação."""
-    return app.test_client()
\ No newline at end of file
+    return app.test_client()
+
+@pytest.fixture(scope='function')
+def ad_mock(app):
+    """
+    Active Directory simulado (ldap3 MOCK_SYNC) para testar o pool e as rotinas de AD offline.
+    O DIT fica no objeto Server, compartilhado por todas as conexões do pool.
+    """
+    from ldap3 import Server, Connection, MOCK_SYNC, MOCK_ASYNC, OFFLINE_AD_2012_R2
+    from app.ad_pool import PoolConexoesAD
+    from app.ad_diretorio import init_diretorio_ad
+
+    app.config.update(
+        LDAP_BASE_DN='DC=mdr,DC=local',
+        LDAP_USERS_DN='OU=Usuarios,DC=mdr,DC=local',
+        LDAP_BIND_USER_DN='CN=svc_mdrh,OU=Servico,DC=mdr,DC=local',
+        LDAP_BIND_USER_PASSWORD='senha-servico',
+        # O bind do mock só reconhece DNs existentes no DIT (não resolve UPNs)
+        LDAP_FORMATO_BIND='CN={username},OU=Usuarios,DC=mdr,DC=local',
+    )
+    servidor = Server('ad-mock', get_info=OFFLINE_AD_2012_R2)
+    carga = Connection(servidor, client_strategy=MOCK_SYNC)
+    carga.strategy.add_entry(app.config['LDAP_BIND_USER_DN'], {
+        'objectClass': ['top', 'user'], 'sAMAccountName': 'svc_mdrh', 'userPassword': 'senha-servico'
+    })
+
+    init_diretorio_ad(app, servidor=servidor, estrategia=MOCK_SYNC)
+    pool = PoolConexoesAD(lambda: servidor, app.config['LDAP_BIND_USER_DN'], app.config['LDAP_BIND_USER_PASSWORD'],
+                          tamanho_maximo=2, espera_maxima=1, base_verificacao=app.config['LDAP_BASE_DN'],
+                          estrategia=MOCK_SYNC, estrategia_dedicada=MOCK_ASYNC)
+    app.extensions['pool_ad'] = pool
+
+    class ADSimulado:
+        def __init__(self):
+            self.pool = pool
+            self.servidor = servidor
+
+        def adicionar_usuario(self, dn, atributos):
+            carga.strategy.add_entry(dn, atributos)
+
+    yield ADSimulado()
+    pool.fechar()
@@ -0,0 +1,83 @@
+# tests/test_ad_diretorio.py
+
+import pytest
+from ldap3 import MODIFY_REPLACE
+from ldap3.core.exceptions import LDAPBindError, LDAPException
+
+from app.ad_diretorio import dominio_de_base_dn, get_diretorio_ad
+from app import db
+from app.models import Funcionario, RequisicaoDocumento, TipoDocumento, Usuario
+
+
+def test_dominio_derivado_do_base_dn():
+    assert dominio_de_base_dn('DC=mdr,DC=local') == 'mdr.local'
+    assert dominio_de_base_dn('OU=Usuarios, dc=mdr, dc=gov ,DC=br') == 'mdr.gov.br'
+    assert dominio_de_base_dn(None) == ''
+
+
+def test_login_pelo_ad_usa_server_compartilhado(app, client, ad_mock):
+    """O login faz bind + busca no Server do app e provisiona o usuário local na primeira vez."""
+    ad_mock.adicionar_usuario('CN=ana.lima,OU=Usuarios,DC=mdr,DC=local', {
+        'objectClass': ['top', 'person', 'user'], 'cn': 'Ana Lima', 'sAMAccountName': 'ana.lima',
+        'mail': 'ana.lima@mdr.gov.br', 'userPassword': 'senha-ana'
+    })
+    diretorio = get_diretorio_ad()
+    assert diretorio.dominio == 'mdr.local'
+    assert diretorio.servidor is ad_mock.servidor
+
+    resposta = client.post('/auth/login', data={'username': 'ana.lima', 'password': 'senha-ana'})
+    assert resposta.status_code == 302
+    assert '/login' not in resposta.headers['Location']
+    usuario = Usuario.query.filter_by(username='ana.lima').one()
+    assert usuario.email == 'ana.lima@mdr.gov.br'
+    assert usuario.funcionario.nome == 'Ana Lima'
+
+    resposta = client.post('/auth/login', data={'username': 'ana.lima', 'password': 'errada'})
+    assert resposta.headers['Location'].endswith('/login')
+
+
+def test_atributos_do_login_ficam_em_cache(app, ad_mock):
+    """Com os atributos em cache o login é só o bind: a senha continua sendo validada no AD."""
+    dn = 'CN=rui.costa,OU=Usuarios,DC=mdr,DC=local'
+    ad_mock.adicionar_usuario(dn, {
+        'objectClass': ['top', 'person', 'user'], 'cn': 'Rui Costa', 'sAMAccountName': 'rui.costa',
+        'userPassword': 'senha-rui'
+    })
+    diretorio = get_diretorio_ad()
+    assert diretorio.autenticar('rui.costa', 'senha-rui') == {
+        'nome': 'Rui Costa', 'email': 'rui.costa@mdr.local', 'username': 'rui.costa'
+    }
+
+    conexao = ad_mock.pool.adquirir()
+    conexao.modify(dn, {'cn': [(MODIFY_REPLACE, ['Rui da Costa'])]})
+    ad_mock.pool.liberar(conexao)
+    assert diretorio.autenticar('RUI.COSTA', 'senha-rui')['nome'] == 'Rui Costa'
+    with pytest.raises(LDAPBindError):
+        diretorio.autenticar('rui.costa', 'errada')
+
+    diretorio.invalidar_atributos('rui.costa')
+    assert diretorio.autenticar('rui.costa', 'senha-rui')['nome'] == 'Rui da Costa'
+
+
+def test_primeiro_login_local_gera_so_as_pendencias_que_faltam(app, client, monkeypatch):
+    """Fallback local: lookup sem diferenciar maiúsculas e pendências criadas sem duplicar as existentes."""
+    def ad_fora_do_ar(username, senha):
+        raise LDAPException('AD indisponível')
+    monkeypatch.setattr(get_diretorio_ad(), 'autenticar', ad_fora_do_ar)
+    funcionario = Funcionario(nome='Bia Reis', cpf='222.222.222-22', email='bia@example.com')
+    usuario = Usuario(username='bia.reis', email='bia@example.com', funcionario=funcionario)
+    usuario.set_password('senha-bia')
+    rg, cpf, opcional = (TipoDocumento(nome='RG', obrigatorio_na_admissao=True),
+                         TipoDocumento(nome='CPF', obrigatorio_na_admissao=True),
+                         TipoDocumento(nome='Certificado', obrigatorio_na_admissao=False))
+    db.session.add_all([funcionario, usuario, rg, cpf, opcional])
+    db.session.flush()
+    db.session.add(RequisicaoDocumento(destinatario_id=funcionario.id, tipo_documento_id=rg.id, status='Enviado'))
+    db.session.commit()
+
+    resposta = client.post('/auth/login', data={'username': 'Bia.Reis', 'password': 'senha-bia'})
+    assert '/login' not in resposta.headers['Location']
+
+    requisicoes = RequisicaoDocumento.query.filter_by(destinatario_id=funcionario.id).all()
+    assert sorted((r.tipo_documento_id, r.status) for r in requisicoes) == [(rg.id, 'Enviado'), (cpf.id, 'Pendente')]
+    assert db.session.get(Usuario, usuario.id).primeiro_login_completo
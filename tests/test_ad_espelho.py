@@ -0,0 +1,127 @@
+# tests/test_ad_espelho.py
+
+import uuid
+from datetime import datetime, timedelta
+
+from app import db
+from app.ad_espelho import sincronizar_espelho, get_espelho_ad, _gravar_novas
+from app.ad_sync import desabilitar_usuario_ad, remover_usuario_ad, verificar_usuario_ad
+from app.models import UsuarioADEspelho, EstadoEspelhoAD
+
+USUARIOS_DN = 'OU=Usuarios,DC=mdr,DC=local'
+
+
+def _conta(sam, nome, usn, **extras):
+    atributos = {
+        'objectClass': ['top', 'person', 'organizationalPerson', 'user'],
+        'objectGUID': str(uuid.uuid4()),
+        'sAMAccountName': sam, 'displayName': nome, 'userAccountControl': '512', 'uSNChanged': str(usn),
+    }
+    atributos.update(extras)
+    return f'CN={nome},{USUARIOS_DN}', atributos
+
+
+def test_sincronizacao_completa_e_incremental(app, ad_mock, monkeypatch):
+    """A primeira sincronização é completa; as seguintes aplicam só o delta acima da marca d'água."""
+    # O MOCK_SYNC do ldap3 não aceita controles sem valor; ele já devolve os tombstones sem o show-deleted
+    monkeypatch.setattr('app.ad_espelho.CONTROLES_DELTA', [])
+    dn_joao, joao = _conta('joao.silva', 'Joao Silva', 100)
+    ad_mock.adicionar_usuario(dn_joao, joao)
+    ad_mock.adicionar_usuario(*_conta('ana.lima', 'Ana Lima', 101))
+    ad_mock.adicionar_usuario('CN=PC01,OU=Computadores,DC=mdr,DC=local', {
+        'objectClass': ['top', 'person', 'user', 'computer'], 'objectGUID': str(uuid.uuid4()),
+        'sAMAccountName': 'PC01$', 'uSNChanged': '102'
+    })
+
+    with app.app_context():
+        resultado = sincronizar_espelho()
+        assert resultado.completa and resultado.inseridos == 2
+        assert db.session.get(EstadoEspelhoAD, 1).usn_maximo == 101
+
+        # Nada mudou: o delta vem vazio e a geração não avança
+        geracao = db.session.get(EstadoEspelhoAD, 1).geracao
+        resultado = sincronizar_espelho()
+        assert not resultado.completa and resultado.alteracoes == 0
+        assert db.session.get(EstadoEspelhoAD, 1).geracao == geracao
+
+        ad_mock.adicionar_usuario(*_conta('maria.souza', 'Maria Souza', 103))
+        ad_mock.adicionar_usuario('CN=Joao Silva\\0ADEL,CN=Deleted Objects,DC=mdr,DC=local',
+                                  {**joao, 'isDeleted': 'TRUE', 'uSNChanged': '104'})
+        resultado = sincronizar_espelho()
+        assert (resultado.inseridos, resultado.removidos) == (1, 1)
+        assert sorted(u.sam_account_name for u in UsuarioADEspelho.query) == ['ana.lima', 'maria.souza']
+
+
+def test_verificacao_de_username_responde_pelo_espelho(app, ad_mock, monkeypatch):
+    monkeypatch.setattr('app.ad_espelho.CONTROLES_DELTA', [])
+    ad_mock.adicionar_usuario(*_conta('Joao.Silva', 'João Silva', 10))
+
+    with app.app_context():
+        # Espelho nunca sincronizado: consulta direta ao AD
+        assert verificar_usuario_ad('joao.silva')['existe']
+
+        sincronizar_espelho()
+        emprestimos = ad_mock.pool.metricas()['emprestimos']
+        assert verificar_usuario_ad('joao.silva') == {'existe': True, 'displayName': 'João Silva'}
+        assert verificar_usuario_ad('JOAO.SILVA')['existe']
+        assert verificar_usuario_ad('maria.souza') == {'existe': False}
+
+        # As consultas só leem a tabela: nem o AD nem o banco são alterados por elas
+        ad_mock.adicionar_usuario(*_conta('maria.souza', 'Maria Souza', 11))
+        get_espelho_ad().invalidar()
+        assert verificar_usuario_ad('maria.souza') == {'existe': False}
+        assert ad_mock.pool.metricas()['emprestimos'] == emprestimos
+
+        # A conta aparece depois da sincronização seguinte (flask ad-espelho-sync)
+        sincronizar_espelho()
+        assert verificar_usuario_ad('maria.souza')['existe']
+
+
+def test_alteracoes_feitas_pelo_sistema_chegam_ao_espelho(app, ad_mock, monkeypatch):
+    """Desabilitar ou remover uma conta atualiza o espelho na hora, sem esperar a sincronização."""
+    monkeypatch.setattr('app.ad_espelho.CONTROLES_DELTA', [])
+    ad_mock.adicionar_usuario(*_conta('joao.silva', 'Joao Silva', 10, userPrincipalName='joao.silva@mdr.local'))
+
+    with app.app_context():
+        sincronizar_espelho()
+        geracao = db.session.get(EstadoEspelhoAD, 1).geracao
+
+        assert desabilitar_usuario_ad('joao.silva')[0]
+        db.session.commit()
+        assert UsuarioADEspelho.query.one().user_account_control == 514
+        assert db.session.get(EstadoEspelhoAD, 1).geracao == geracao + 1
+        assert get_espelho_ad().obter('joao.silva')['userAccountControl'] == 514
+
+        assert remover_usuario_ad('joao.silva@mdr.local')[0]
+        db.session.commit()
+        assert UsuarioADEspelho.query.count() == 0
+        assert db.session.get(EstadoEspelhoAD, 1).geracao == geracao + 2
+
+
+def test_espelho_parado_volta_a_consultar_o_ad(app, ad_mock, monkeypatch):
+    monkeypatch.setattr('app.ad_espelho.CONTROLES_DELTA', [])
+
+    with app.app_context():
+        sincronizar_espelho()
+        ad_mock.adicionar_usuario(*_conta('maria.souza', 'Maria Souza', 11))
+        assert verificar_usuario_ad('maria.souza') == {'existe': False}
+
+        # Sem sincronizar há mais de ESPELHO_AD_ATRASO_MAXIMO: a resposta vem do AD
+        estado = db.session.get(EstadoEspelhoAD, 1)
+        estado.ultima_sincronizacao = datetime.utcnow() - timedelta(seconds=app.config['ESPELHO_AD_ATRASO_MAXIMO'] + 1)
+        db.session.commit()
+        get_espelho_ad().invalidar()
+        assert verificar_usuario_ad('maria.souza')['existe']
+
+
+def test_guid_inserido_por_outro_processo_e_atualizado(app):
+    """Duas sincronizações simultâneas que veem a mesma conta nova não colidem no object_guid."""
+    guid = str(uuid.uuid4())
+    conta = {'object_guid': guid, 'sam_account_name': 'ana.lima', 'display_name': 'Ana',
+             'mail': None, 'user_account_control': 512, 'usn_changed': 5,
+             'distinguished_name': f'CN=Ana,{USUARIOS_DN}', 'atualizado_em': datetime.utcnow()}
+    _gravar_novas([conta])
+    _gravar_novas([{**conta, 'display_name': 'Ana Lima', 'usn_changed': 6}])
+    db.session.commit()
+    registro = UsuarioADEspelho.query.one()
+    assert (registro.display_name, registro.usn_changed) == ('Ana Lima', 6)
@@ -0,0 +1,89 @@
+# tests/test_ad_lote.py
+
+from datetime import datetime
+
+from ldap3 import SUBTREE
+
+from app import db
+from app.ad_lote import sincronizar_funcionarios_ad
+from app.models import Funcionario, Usuario, Cargo, Setor, Permissao
+
+
+def _atributos_ad(ad_mock, sam):
+    conexao = ad_mock.pool.adquirir()
+    try:
+        conexao.search('DC=mdr,DC=local', f'(sAMAccountName={sam})', search_scope=SUBTREE,
+                       attributes=['title', 'department', 'userAccountControl'])
+        return conexao.entries[0].entry_attributes_as_dict
+    finally:
+        ad_mock.pool.liberar(conexao)
+
+
+def test_sincronizacao_em_lote_aplica_so_as_diferencas(app, ad_mock):
+    for sam, uac in [('joao.silva', '512'), ('ana.lima', '66050'), ('maria.souza', '512')]:
+        ad_mock.adicionar_usuario(f'CN={sam},OU=Usuarios,DC=mdr,DC=local', {
+            'objectClass': ['top', 'person', 'user'], 'sAMAccountName': sam, 'displayName': sam,
+            'title': 'Analista', 'department': 'Jurídico', 'userAccountControl': uac,
+        })
+
+    with app.app_context():
+        analista, juridico = Cargo(nome='Analista'), Setor(nome='Jurídico')
+        dados = [('joao.silva', 'Joao Silva', 'Ativo'), ('ana.lima', 'Ana Lima', 'Ativo'),
+                 ('maria.souza', 'Maria Souza', 'Suspenso'), ('pedro.alves', 'Pedro Alves', 'Ativo'), (None, 'Sem Usuario', 'Ativo')]
+        for i, (username, nome, status) in enumerate(dados):
+            funcionario = Funcionario(nome=nome, cpf=f'{i:011d}', email=f'f{i}@example.com', status=status,
+                                      cargo=analista, setor=juridico)
+            db.session.add(funcionario)
+            if username:
+                usuario = Usuario(username=username, email=f'f{i}@example.com', funcionario=funcionario)
+                usuario.set_password('x')
+                db.session.add(usuario)
+        db.session.commit()
+        ids = [f.id for f in Funcionario.query.order_by(Funcionario.id)]
+
+        relatorio = sincronizar_funcionarios_ad(ids, concorrencia=2)
+        situacoes = {r.username or r.nome: (r.situacao, r.alteracoes) for r in relatorio.resultados}
+        assert situacoes == {
+            'joao.silva': ('atualizado', ['displayName']),
+            # 66050 = 65536 (senha não expira) + 512 + 2 (desabilitada): reabilita preservando os outros bits
+            'ana.lima': ('atualizado', ['displayName', 'userAccountControl']),
+            'maria.souza': ('atualizado', ['displayName', 'userAccountControl']),
+            'pedro.alves': ('nao_encontrado', []),
+            'Sem Usuario': ('sem_usuario', []),
+        }
+        assert _atributos_ad(ad_mock, 'ana.lima')['userAccountControl'] == [66048]
+        assert _atributos_ad(ad_mock, 'maria.souza')['userAccountControl'] == [514]
+
+        # Uma segunda passada não encontra diferenças; a remoção em lote desabilita todas
+        assert sincronizar_funcionarios_ad(ids).resumo == {'sem_alteracao': 3, 'nao_encontrado': 1, 'sem_usuario': 1}
+        relatorio = sincronizar_funcionarios_ad(ids[:2], forcar_desabilitado=True)
+        assert [r.alteracoes for r in relatorio.resultados] == [['userAccountControl'], ['userAccountControl']]
+        assert _atributos_ad(ad_mock, 'joao.silva')['userAccountControl'] == [514]
+
+
+def test_edicao_em_lote_leva_so_cargo_e_setor_ao_ad(app, client, ad_mock):
+    ad_mock.adicionar_usuario('CN=ana.lima,OU=Usuarios,DC=mdr,DC=local', {
+        'objectClass': ['top', 'person', 'user'], 'sAMAccountName': 'ana.lima', 'displayName': 'ana.lima',
+        'title': 'Analista', 'department': 'Jurídico', 'userAccountControl': '66050',
+    })
+    gerente, financeiro = Cargo(nome='Gerente'), Setor(nome='Financeiro')
+    funcionario = Funcionario(nome='Ana Lima', cpf='00000000001', email='ana@example.com', status='Ativo')
+    usuario = Usuario(username='ana.lima', email='ana@example.com', funcionario=funcionario)
+    usuario.set_password('x')
+    rh = Usuario(username='rh', email='rh@example.com', data_consentimento=datetime.utcnow(), senha_provisoria=False)
+    rh.set_password('x')
+    rh.permissoes.append(Permissao(nome='admin_rh'))
+    db.session.add_all([gerente, financeiro, funcionario, usuario, rh])
+    db.session.commit()
+    with client.session_transaction() as sessao:
+        sessao['_user_id'] = rh.id
+        sessao['_fresh'] = True
+
+    resposta = client.post('/api/funcionarios/editar-em-lote',
+                           json={'ids': [funcionario.id], 'cargo': gerente.id, 'setor': financeiro.id})
+    assert resposta.get_json()['ad'][0]['alteracoes'] == ['department', 'title']
+
+    atributos = _atributos_ad(ad_mock, 'ana.lima')
+    assert atributos['title'] == ['Gerente'] and atributos['department'] == ['Financeiro']
+    # A conta desabilitada continua desabilitada (e com os demais bits) apesar do status 'Ativo'
+    assert atributos['userAccountControl'] == [66050]
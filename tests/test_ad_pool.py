@@ -0,0 +1,71 @@
+# tests/test_ad_pool.py
+
+import threading
+import time
+
+import pytest
+
+from app.ad_pool import PoolADEsgotado
+from app.ad_sync import buscar_usuario_ad
+
+
+def test_pool_reutiliza_conexao_autenticada(app, ad_mock):
+    """Chamadas seguidas reaproveitam a mesma conexão, sem novo bind."""
+    ad_mock.adicionar_usuario('CN=Joao Silva,OU=Usuarios,DC=mdr,DC=local', {
+        'objectClass': ['top', 'person', 'user'], 'sAMAccountName': 'joao.silva', 'displayName': 'João Silva'
+    })
+    with app.app_context():
+        assert buscar_usuario_ad('joao.silva') == {'existe': True, 'displayName': 'João Silva'}
+        assert buscar_usuario_ad('maria.souza') == {'existe': False}
+        assert buscar_usuario_ad('joao.silva')['existe']
+
+    metricas = ad_mock.pool.metricas()
+    assert metricas['criadas'] == 1
+    assert metricas['reutilizadas'] == 2
+    assert metricas['em_uso'] == 0
+    assert metricas['livres'] == 1
+
+
+def test_pool_limita_e_isola_conexoes_concorrentes(app, ad_mock):
+    """Nunca abre mais que o tamanho máximo e nunca empresta a mesma conexão a dois usuários."""
+    em_uso, erros = set(), []
+    trava = threading.Lock()
+
+    def trabalhar():
+        for _ in range(5):
+            conexao = ad_mock.pool.adquirir()
+            with trava:
+                if id(conexao) in em_uso:
+                    erros.append('conexão compartilhada')
+                em_uso.add(id(conexao))
+            time.sleep(0.002)
+            with trava:
+                em_uso.discard(id(conexao))
+            ad_mock.pool.liberar(conexao)
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    metricas = ad_mock.pool.metricas()
+    assert erros == []
+    assert metricas['criadas'] <= 2
+    assert metricas['emprestimos'] == 30
+    assert metricas['esperas'] > 0
+
+
+def test_pool_descarta_conexao_quebrada_e_esgota(app, ad_mock):
+    """Conexões fechadas não voltam para o pool; sem conexões livres, 'adquirir' desiste após a espera máxima."""
+    conexao = ad_mock.pool.adquirir()
+    conexao.unbind()  # simula o AD encerrando a conexão
+    ad_mock.pool.liberar(conexao)
+    assert ad_mock.pool.metricas()['descartadas'] == 1
+
+    primeira, segunda = ad_mock.pool.adquirir(), ad_mock.pool.adquirir()
+    with pytest.raises(PoolADEsgotado):
+        ad_mock.pool.adquirir()
+    ad_mock.pool.liberar(primeira)
+    ad_mock.pool.liberar(segunda)
+    assert ad_mock.pool.metricas()['esgotamentos'] == 1
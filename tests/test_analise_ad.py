@@ -0,0 +1,75 @@
+# tests/test_analise_ad.py
+
+import uuid
+from datetime import datetime
+
+from app import db
+from app.ad_espelho import sincronizar_espelho
+from app.models import Usuario, Funcionario, Permissao, VinculoADSugestao, AnaliseVinculoAD
+
+
+def _conta_ad(ad_mock, sam, nome, usn):
+    ad_mock.adicionar_usuario(f'CN={nome},OU=Usuarios,DC=mdr,DC=local', {
+        'objectClass': ['top', 'person', 'organizationalPerson', 'user'], 'objectGUID': str(uuid.uuid4()),
+        'sAMAccountName': sam, 'displayName': nome, 'userAccountControl': '512', 'uSNChanged': str(usn),
+    })
+
+
+def _admin_ti():
+    admin = Usuario(username='ti', email='ti@example.com', data_consentimento=datetime.utcnow())
+    admin.set_password('senha')
+    admin.permissoes.append(Permissao(nome='admin_ti'))
+    db.session.add(admin)
+    return admin
+
+
+def test_analise_em_segundo_plano_gera_sugestoes_e_reporta_progresso(app, client, ad_mock, monkeypatch, caplog):
+    monkeypatch.setattr('app.ad_espelho.CONTROLES_DELTA', [])
+    _conta_ad(ad_mock, 'joao.silva', 'Joao Silva', 1)
+    _conta_ad(ad_mock, 'maria.souza', 'Maria Souza', 2)
+
+    with app.app_context():
+        admin = _admin_ti()
+        for i, (nome, username) in enumerate([('João da Silva', 'jsilva'), ('Maria Souza', 'maria.souza'),
+                                              ('Pedro Alves', 'palves')]):
+            usuario = Usuario(username=username, email=f'f{i}@example.com')
+            usuario.set_password('x')
+            db.session.add(Funcionario(nome=nome, cpf=f'{i:011d}', email=f'f{i}@example.com', usuario=usuario))
+        db.session.add(VinculoADSugestao(funcionario_id=1, funcionario_nome='Antiga', ad_username='x',
+                                         ad_display_name='X', pontuacao=90))
+        db.session.commit()
+        admin_id = admin.id
+        # A análise só lê o espelho; quem o mantém é o 'flask ad-espelho-sync'
+        sincronizar_espelho()
+
+    with client.session_transaction() as session:
+        session['_user_id'] = admin_id
+
+    caplog.set_level('INFO')
+    resposta = client.post('/vinculo-ad/executar-analise', headers={'Accept': 'application/json'})
+    assert resposta.status_code == 202
+    # Uma linha de log por execução, com o tempo de cada etapa
+    resumo = next(r.getMessage() for r in caplog.records if 'concluída' in r.getMessage())
+    assert all(etapa in resumo for etapa in ('AD', 'banco', 'pontuação', 'gravação'))
+    status = client.get(resposta.headers['Location']).get_json()
+    assert status['status'] == 'concluida'
+    assert (status['progresso'], status['total_funcionarios'], status['sugestoes']) == (100, 2, 1)
+
+    with app.app_context():
+        # A sugestão antiga foi substituída; 'maria.souza' já está vinculada e não é analisada
+        assert [(s.funcionario_nome, s.ad_username) for s in VinculoADSugestao.query] == [('João da Silva', 'joao.silva')]
+
+
+def test_nao_inicia_duas_analises_ao_mesmo_tempo(app, client):
+    with app.app_context():
+        admin = _admin_ti()
+        db.session.add(AnaliseVinculoAD(status='executando', iniciado_em=datetime.utcnow()))
+        db.session.commit()
+        admin_id = admin.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = admin_id
+
+    resposta = client.post('/vinculo-ad/executar-analise', headers={'Accept': 'application/json'})
+    assert resposta.status_code == 409
+    assert resposta.get_json()['status'] == 'executando'
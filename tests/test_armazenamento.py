@@ -0,0 +1,248 @@
+# tests/test_armazenamento.py
+
+import hashlib
+import io
+import os
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import NotFound
+
+from app.armazenamento import (ArquivoGrandeDemais, caminho_arquivo, get_armazenamento, init_armazenamento,
+                               remover_arquivo, salvar_upload)
+from app.models import ArquivoArmazenado, ArquivoBlob, Documento, Funcionario, Usuario, db
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), ARMAZENAMENTO_TAMANHO_BLOCO=4096,
+                      ARMAZENAMENTO_TAMANHO_MAXIMO=64 * 1024)
+    init_armazenamento(app)
+    return tmp_path
+
+
+def _arquivo(conteudo, nome='rg.pdf'):
+    return FileStorage(stream=io.BytesIO(conteudo), filename=nome)
+
+
+def test_conteudo_repetido_e_gravado_uma_vez(app, uploads):
+    conteudo = os.urandom(10_000)  # vários blocos de 4 KB
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+
+    primeiro = salvar_upload(_arquivo(conteudo))
+    segundo = salvar_upload(_arquivo(conteudo, 'RG (cópia).PDF'), 'fotos_perfil')
+    db.session.commit()
+
+    assert primeiro != segundo and segundo.endswith('.pdf')
+    blob = ArquivoBlob.query.one()
+    assert (blob.sha256, blob.tamanho, blob.referencias) == (sha256, 10_000, 2)
+    assert blob.caminho.startswith(f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}-')
+    caminho_blob = blob.caminho
+    assert caminho_arquivo(primeiro) == caminho_arquivo(segundo, 'fotos_perfil')
+    with open(caminho_arquivo(primeiro), 'rb') as f:
+        assert f.read() == conteudo
+    assert os.listdir(uploads / 'tmp') == []
+
+    # Removida uma referência, o arquivo continua; um rollback também o preserva
+    remover_arquivo(primeiro)
+    db.session.commit()
+    remover_arquivo(segundo, 'fotos_perfil')
+    db.session.rollback()
+    assert os.path.exists(caminho_arquivo(segundo, 'fotos_perfil'))
+
+    remover_arquivo(segundo, 'fotos_perfil')
+    db.session.commit()
+    assert ArquivoBlob.query.count() == 0 and ArquivoArmazenado.query.count() == 0
+    assert not os.path.exists(uploads / caminho_blob)
+
+
+def test_reenvio_do_conteudo_enquanto_a_ultima_referencia_e_removida(app, uploads):
+    """O arquivo apagado após o commit da remoção é o da geração antiga, nunca o do novo upload."""
+    antigo = salvar_upload(_arquivo(b'holerite de maio'))
+    db.session.commit()
+    caminho_antigo = caminho_arquivo(antigo)
+
+    remover_arquivo(antigo)
+    novo = salvar_upload(_arquivo(b'holerite de maio'))
+    db.session.commit()
+
+    assert not os.path.exists(caminho_antigo)
+    with open(caminho_arquivo(novo), 'rb') as f:
+        assert f.read() == b'holerite de maio'
+    assert ArquivoBlob.query.one().referencias == 1
+
+
+def test_rollback_apaga_o_arquivo_recem_publicado(app, uploads):
+    """Sem o commit, a linha do blob some e o arquivo publicado não fica órfão no disco."""
+    confirmado = salvar_upload(_arquivo(b'contrato assinado'))
+    db.session.commit()
+    caminho_confirmado = caminho_arquivo(confirmado)
+
+    salvar_upload(_arquivo(b'rascunho descartado'))
+    publicado = ArquivoBlob.query.filter(ArquivoBlob.tamanho == len(b'rascunho descartado')).one().caminho
+    assert (uploads / publicado).exists()
+    db.session.rollback()
+
+    assert not (uploads / publicado).exists()
+    assert os.path.exists(caminho_confirmado)
+
+
+def test_arquivo_acima_do_limite_e_recusado(app, uploads):
+    with pytest.raises(ArquivoGrandeDemais):
+        salvar_upload(_arquivo(b'x' * (64 * 1024 + 1)))
+    assert ArquivoBlob.query.count() == 0
+    assert os.listdir(uploads / 'tmp') == []
+    assert get_armazenamento().tamanho_maximo == 64 * 1024
+
+
+def test_foto_de_perfil_nova_e_antiga(app, client, uploads):
+    funcionario = Funcionario(nome='Lia Prado', cpf='333.333.333-33', email='lia@example.com')
+    usuario = Usuario(username='lia', email='lia@example.com', funcionario=funcionario,
+                      data_consentimento=datetime.utcnow(), senha_provisoria=False)
+    usuario.set_password('x')
+    db.session.add_all([funcionario, usuario])
+    db.session.commit()
+    with client.session_transaction() as sessao:
+        sessao['_user_id'] = usuario.id
+        sessao['_fresh'] = True
+
+    # Arquivo gravado antes do armazenamento por conteúdo: continua em fotos_perfil/<nome>
+    (uploads / 'fotos_perfil').mkdir()
+    (uploads / 'fotos_perfil' / 'antiga.png').write_bytes(b'foto antiga')
+    funcionario.foto_perfil = 'antiga.png'
+    db.session.commit()
+    assert client.get('/perfil/uploads/fotos_perfil/antiga.png').data == b'foto antiga'
+
+    dados = {'nome': 'Lia Prado', 'email': 'lia@example.com',
+             'foto_perfil': (io.BytesIO(b'foto nova'), 'eu.png')}
+    resposta = client.post('/perfil/editar', data=dados, content_type='multipart/form-data')
+    assert resposta.status_code == 302
+
+    nova = db.session.get(Funcionario, funcionario.id).foto_perfil
+    resposta = client.get(f'/perfil/uploads/fotos_perfil/{nova}')
+    assert resposta.data == b'foto nova' and resposta.mimetype == 'image/png'
+    assert not (uploads / 'fotos_perfil' / 'antiga.png').exists()
+
+
+def test_migracao_dos_arquivos_antigos(app, uploads):
+    from app.armazenamento import migrar_arquivos_legados
+
+    funcionario = Funcionario(nome='Rui Lima', cpf='444.444.444-44', email='rui@example.com', foto_perfil='rui.png')
+    db.session.add(funcionario)
+    db.session.flush()
+    for nome in ('a.pdf', 'b.pdf', 'sumiu.pdf'):
+        db.session.add(Documento(nome_arquivo=nome, tipo_documento='RG', path_armazenamento=nome,
+                                 funcionario_id=funcionario.id))
+    db.session.commit()
+    (uploads / 'a.pdf').write_bytes(b'mesmo conteudo')
+    (uploads / 'b.pdf').write_bytes(b'mesmo conteudo')
+    (uploads / 'fotos_perfil').mkdir()
+    (uploads / 'fotos_perfil' / 'rui.png').write_bytes(b'foto')
+
+    assert migrar_arquivos_legados(tamanho_lote=2, simular=True)['documento'] == {'migrados': 2, 'ausentes': 1}
+    assert ArquivoArmazenado.query.count() == 0
+
+    resumo = migrar_arquivos_legados(tamanho_lote=2)
+    assert resumo['documento'] == {'migrados': 2, 'ausentes': 1}
+    assert resumo['funcionario'] == {'migrados': 1, 'ausentes': 0}
+    assert not (uploads / 'a.pdf').exists() and not (uploads / 'b.pdf').exists() and not (uploads / 'fotos_perfil' / 'rui.png').exists()
+    assert caminho_arquivo('a.pdf') == caminho_arquivo('b.pdf')
+    assert '/blobs/' in caminho_arquivo('rui.png', 'fotos_perfil')
+    with open(caminho_arquivo('rui.png', 'fotos_perfil'), 'rb') as f:
+        assert f.read() == b'foto'
+    assert ArquivoBlob.query.filter_by(referencias=2).count() == 1
+
+    # Uma segunda execução só encontra o arquivo que não existe em disco
+    assert migrar_arquivos_legados()['documento'] == {'migrados': 0, 'ausentes': 1}
+
+
+def test_download_com_etag_range_e_envio_pelo_servidor_web(app, uploads):
+    from app.armazenamento import enviar_arquivo
+
+    conteudo = b'%PDF-1.4 ' + os.urandom(3000)
+    nome = salvar_upload(_arquivo(conteudo, 'holerite.pdf'))
+    db.session.commit()
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+
+    with app.test_request_context():
+        resposta = enviar_arquivo(nome, as_attachment=True)
+        resposta.direct_passthrough = False
+        assert resposta.status_code == 200 and resposta.get_data() == conteudo
+        assert resposta.get_etag() == (sha256, False) and resposta.last_modified
+        assert resposta.cache_control.private and not resposta.cache_control.public
+        assert resposta.headers['Content-Disposition'] == f'attachment; filename={nome}'
+        resposta.close()
+
+    with app.test_request_context(headers={'If-None-Match': f'"{sha256}"'}):
+        assert enviar_arquivo(nome).status_code == 304
+
+    with app.test_request_context(headers={'Range': 'bytes=0-99', 'If-Range': f'"{sha256}"'}):
+        resposta = enviar_arquivo(nome)
+        resposta.direct_passthrough = False
+        assert resposta.status_code == 206 and resposta.get_data() == conteudo[:100]
+        assert resposta.headers['Content-Range'] == f'bytes 0-99/{len(conteudo)}'
+        resposta.close()
+
+    get_armazenamento().envio = 'x-accel'
+    with app.test_request_context(headers={'Range': 'bytes=0-99'}):
+        resposta = enviar_arquivo(nome)
+        assert resposta.status_code == 200 and 'Content-Range' not in resposta.headers
+        assert resposta.headers['X-Accel-Redirect'] == '/_uploads/' + ArquivoBlob.query.one().caminho
+        assert 'X-Sendfile' not in resposta.headers and resposta.get_etag() == (sha256, False)
+    with app.test_request_context(headers={'If-None-Match': f'"{sha256}"'}):
+        assert enviar_arquivo(nome).status_code == 304
+
+    with app.test_request_context():
+        with pytest.raises(NotFound):
+            enviar_arquivo('../../etc/passwd')
+
+
+def test_cada_rota_so_enxerga_a_sua_pasta(app, client, uploads):
+    from app.models import Permissao
+
+    permissoes = [Permissao(nome='admin_rh'), Permissao(nome='depto_pessoal')]
+    usuario = Usuario(username='rh', email='rh@example.com', data_consentimento=datetime.utcnow(), senha_provisoria=False)
+    usuario.set_password('x')
+    usuario.permissoes.extend(permissoes)
+    funcionario = Funcionario(nome='Equipe RH', cpf='888.888.888-88', email='rh@example.com', usuario=usuario)
+    db.session.add_all(permissoes + [usuario, funcionario])
+    documento = salvar_upload(_arquivo(b'RG escaneado', 'rg.jpg'))
+    anexo_denuncia = salvar_upload(_arquivo(b'anexo anonimo', 'prova.pdf'), 'denuncias')
+    db.session.commit()
+    usuario_id = usuario.id
+
+    with client.session_transaction() as sessao:
+        sessao['_user_id'] = usuario_id
+        sessao['_fresh'] = True
+
+    # A rota das fotos é pública: não pode servir documentos nem anexos de denúncia
+    assert client.get(f'/perfil/uploads/fotos_perfil/{documento}').status_code == 404
+    assert client.get(f'/perfil/uploads/fotos_perfil/{anexo_denuncia}').status_code == 404
+    assert client.get(f'/ponto/download_assinado/{documento}').status_code == 404
+    assert client.get(f'/denuncias/anexo/{documento}').status_code == 404
+    assert client.get(f'/documentos/download/{anexo_denuncia}').status_code == 404
+    assert client.get(f'/documentos/download/{ArquivoBlob.query.first().caminho}').status_code == 404
+    assert client.get(f'/documentos/download/{documento}').data == b'RG escaneado'
+    assert client.get(f'/denuncias/anexo/{anexo_denuncia}').data == b'anexo anonimo'
+
+
+def test_remover_funcionario_libera_a_foto_de_perfil(app, client, uploads):
+    from app.models import Permissao
+
+    rh = Usuario(username='rh', email='rh@example.com', data_consentimento=datetime.utcnow(), senha_provisoria=False)
+    rh.set_password('x')
+    rh.permissoes.append(Permissao(nome='admin_rh'))
+    funcionario = Funcionario(nome='Caio Reis', cpf='777.777.777-77', email='caio@example.com',
+                              foto_perfil=salvar_upload(_arquivo(b'foto do caio', 'caio.png'), 'fotos_perfil'))
+    db.session.add_all([rh, funcionario])
+    db.session.commit()
+    caminho_foto = caminho_arquivo(funcionario.foto_perfil, 'fotos_perfil')
+    with client.session_transaction() as sessao:
+        sessao['_user_id'] = rh.id
+        sessao['_fresh'] = True
+
+    resposta = client.delete(f'/api/funcionario/{funcionario.id}/remover')
+    assert resposta.get_json()['success']
+    assert ArquivoArmazenado.query.count() == 0 and ArquivoBlob.query.count() == 0
+    assert not os.path.exists(caminho_foto)
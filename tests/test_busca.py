@@ -0,0 +1,100 @@
+# tests/test_busca.py
+
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models import Usuario, Permissao, Funcionario, Cargo, db
+from app.busca import CacheSugestoes, GerenciadorIndiceBusca, buscar_funcionarios
+
+
+def test_busca_ignora_acentos_e_ranqueia(app):
+    """'Joao' encontra 'João'; quem começa uma palavra com o termo vem antes de quem só o contém."""
+    with app.app_context():
+        analista = Cargo(nome='Analista Jurídico')
+        db.session.add_all([
+            analista,
+            Funcionario(nome='Maria Sanjoão', cpf='222.222.222-22', email='maria@example.com'),
+            Funcionario(nome='João Araújo', cpf='111.111.111-11', email='joao@example.com', cargo=analista),
+            Funcionario(nome='Pedro Lima', cpf='333.333.333-33', email='pedro@example.com'),
+        ])
+        db.session.commit()
+
+        assert [f.nome for f in buscar_funcionarios('Joao')] == ['João Araújo', 'Maria Sanjoão']
+        assert [f.nome for f in buscar_funcionarios('araujo')] == ['João Araújo']
+        assert [f.nome for f in buscar_funcionarios('111.111')] == ['João Araújo']
+        assert [f.nome for f in buscar_funcionarios('juridico')] == ['João Araújo']
+        assert len(buscar_funcionarios('a', limite=2)) == 2
+
+        # Edições refletem na próxima busca (o índice em memória é invalidado no flush)
+        pedro = Funcionario.query.filter_by(nome='Pedro Lima').one()
+        pedro.nome = 'Pedro Simões'
+        db.session.commit()
+        assert [f.nome for f in buscar_funcionarios('simoes')] == ['Pedro Simões']
+
+
+def test_typeahead_usa_cache_e_etag(app, client):
+    """Prefixos repetidos vêm do cache; o ETag permite 304 até que um funcionário seja alterado."""
+    with app.app_context():
+        p_admin_rh = Permissao(nome='admin_rh')
+        admin = Usuario(username='admin', email='admin@example.com', data_consentimento=datetime.utcnow())
+        admin.set_password('admin123')
+        admin.permissoes.append(p_admin_rh)
+        db.session.add_all([
+            p_admin_rh, admin,
+            Funcionario(nome='Admin RH', cpf='999.999.999-99', email='admin@example.com', usuario=admin),
+            Funcionario(nome='João Araújo', cpf='111.111.111-11', email='joao@example.com'),
+        ])
+        db.session.commit()
+        admin_id = admin.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = admin_id
+        session['_fresh'] = True
+
+    response = client.get('/api/funcionarios/typeahead?q=joao')
+    assert response.status_code == 200
+    assert [f['nome'] for f in response.get_json()] == ['João Araújo']
+    etag = response.headers['ETag']
+
+    response = client.get('/api/funcionarios/typeahead?q=joao', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    with app.app_context():
+        joao = Funcionario.query.filter_by(cpf='111.111.111-11').one()
+        joao.nome = 'João Araújo Filho'
+        db.session.commit()
+
+    response = client.get('/api/funcionarios/typeahead?q=joao', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [f['nome'] for f in response.get_json()] == ['João Araújo Filho']
+
+
+def test_cache_de_sugestoes_expira_apos_o_ttl(monkeypatch):
+    """Alterações feitas por outro processo não invalidam o cache local: o TTL limita o atraso."""
+    agora = [1000.0]
+    monkeypatch.setattr('app.busca.time.monotonic', lambda: agora[0])
+    cache = CacheSugestoes(GerenciadorIndiceBusca(), ttl=30)
+    cache.guardar(('joao', 10), 0, [{'nome': 'João'}], 'etag')
+    assert cache.obter(('joao', 10)) == ([{'nome': 'João'}], 'etag')
+    agora[0] += 31
+    assert cache.obter(('joao', 10)) is None
+
+
+def test_indice_em_memoria_refeito_apos_o_ttl(app, monkeypatch):
+    """Gravações de outro processo (sem os eventos deste) aparecem na busca após o TTL do índice."""
+    agora = [1000.0]
+    monkeypatch.setattr('app.busca.time.monotonic', lambda: agora[0])
+    with app.app_context():
+        db.session.add(Funcionario(nome='João Araújo', cpf='111', email='joao@example.com'))
+        db.session.commit()
+        assert [f.nome for f in buscar_funcionarios('joao')] == ['João Araújo']
+
+        # INSERT direto: nada invalida o índice deste processo
+        db.session.execute(insert(Funcionario.__table__).values(
+            nome='Joana Lima', cpf='222', email='joana@example.com', status='Ativo', busca='joana lima 222'))
+        db.session.commit()
+        assert [f.nome for f in buscar_funcionarios('joa')] == ['João Araújo']
+
+        agora[0] += app.config['BUSCA_INDICE_TTL'] + 1
+        assert sorted(f.nome for f in buscar_funcionarios('joa')) == ['Joana Lima', 'João Araújo']
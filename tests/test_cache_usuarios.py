@@ -0,0 +1,58 @@
+# tests/test_cache_usuarios.py
+
+from datetime import datetime
+from sqlalchemy import event
+from app.models import Usuario, Permissao, Funcionario, db
+from app.cache_usuarios import carregar_usuario, get_cache_usuarios
+
+
+def _criar_admin():
+    p = Permissao(nome='admin_rh')
+    f = Funcionario(nome='Admin RH', cpf='999', email='admin@example.com')
+    u = Usuario(username='admin', email='admin@example.com', funcionario=f, data_consentimento=datetime.utcnow())
+    u.set_password('123')
+    u.permissoes.append(p)
+    db.session.add_all([p, f, u])
+    db.session.commit()
+    return u.id
+
+
+def test_user_loader_sem_consultas_com_cache_quente(app):
+    """Após o primeiro carregamento, a identidade é servida sem ir ao banco."""
+    with app.app_context():
+        user_id = _criar_admin()
+        db.session.remove()
+
+        carregar_usuario(user_id)
+        db.session.remove()
+
+        consultas = []
+        contar = lambda *args, **kwargs: consultas.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            u = carregar_usuario(user_id)
+            assert u.tem_permissao('admin_rh')
+            assert u.funcionario.nome == 'Admin RH'
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+        assert consultas == []
+
+
+def test_user_loader_invalida_ao_alterar_usuario(app):
+    """Gravar o usuário incrementa sua versão e o próximo carregamento reflete a mudança."""
+    with app.app_context():
+        user_id = _criar_admin()
+        db.session.remove()
+
+        u = carregar_usuario(user_id)
+        versao_inicial = get_cache_usuarios().versao(user_id)
+        u.theme = 'dark'
+        u.permissoes = []
+        db.session.commit()
+        db.session.remove()
+
+        assert get_cache_usuarios().versao(user_id) > versao_inicial
+        u = carregar_usuario(user_id)
+        assert u.theme == 'dark'
+        assert not u.tem_permissao('admin_rh')
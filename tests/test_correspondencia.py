@@ -0,0 +1,51 @@
+# tests/test_correspondencia.py
+
+import random
+
+from thefuzz import fuzz
+
+from app.correspondencia import IndiceCorrespondencia
+from app.utils import normalizar_nome
+
+
+def _referencia(nome_funcionario, contas):
+    """Laço original: token_sort_ratio contra todas as contas, a primeira de maior pontuação vence."""
+    melhor_pontuacao, melhor = 0, None
+    for conta in contas:
+        if not conta['displayName']:
+            continue
+        pontuacao = fuzz.token_sort_ratio(normalizar_nome(nome_funcionario), normalizar_nome(conta['displayName']))
+        if pontuacao > melhor_pontuacao:
+            melhor_pontuacao, melhor = pontuacao, conta
+    return (melhor['sAMAccountName'], melhor_pontuacao) if melhor and melhor_pontuacao >= 80 else None
+
+
+def test_sugestoes_iguais_as_do_produto_cartesiano():
+    rng = random.Random(3)
+    nomes = ['João', 'Maria', 'José', 'Ana', 'Conceição', 'Luís']
+    sobrenomes = ['Silva', 'Souza', 'Araújo', 'Simões', 'Brandão', 'Lopes', 'Magalhães']
+    funcionarios = [f"{rng.choice(nomes)} {rng.choice(['da ', 'dos ', ''])}{rng.choice(sobrenomes)} {rng.choice(sobrenomes)}"
+                    for _ in range(150)]
+    contas = [{'sAMAccountName': 'sem.nome', 'displayName': None}]
+    for i, nome in enumerate(rng.sample(funcionarios, 100)):
+        partes = nome.replace(' da ', ' ').replace(' dos ', ' ').split()
+        variacao = rng.choice([' '.join(partes), f'{partes[0]} {partes[-1]}', ' '.join(partes)[:-1], nome.upper()])
+        contas.append({'sAMAccountName': f'conta{i}', 'displayName': variacao})
+
+    indice = IndiceCorrespondencia(contas)
+    for nome in funcionarios:
+        item, pontuacao = indice.melhor(nome)
+        assert ((item['sAMAccountName'], pontuacao) if item else None) == _referencia(nome, contas), nome
+
+
+def test_empate_fica_com_a_primeira_conta_e_nomes_identicos_pontuam_100():
+    contas = [
+        {'sAMAccountName': 'joao.silva', 'displayName': 'João Silva'},
+        {'sAMAccountName': 'joao.silva2', 'displayName': 'Joao SILVA'},
+        {'sAMAccountName': 'maria.souza', 'displayName': 'Maria Souza'},
+    ]
+    indice = IndiceCorrespondencia(contas)
+    assert indice.melhor('Silva João') == (contas[0], 100)
+    assert indice.melhor('Maria Souza Lima')[0] is contas[2]
+    assert indice.melhor('Pedro Alves') == (None, 0)
+    assert [nome for nome, _, _ in indice.correspondencias(['João Silva', 'Pedro', 'João Silva'])] == ['João Silva', 'João Silva']
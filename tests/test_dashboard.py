@@ -0,0 +1,105 @@
+# tests/test_dashboard.py
+
+from datetime import datetime, date
+from app.models import Usuario, Permissao, Funcionario, Aviso, LogCienciaAviso, db
+from app.dashboard import montar_dashboard, aniversariantes_da_semana, dias_da_semana
+
+
+def _criar_usuario(nome='Colaborador', cpf='111', permissao='colaborador'):
+    p = Permissao.query.filter_by(nome=permissao).first() or Permissao(nome=permissao)
+    f = Funcionario(nome=nome, cpf=cpf, email=f'{cpf}@teste.com')
+    u = Usuario(username=cpf, email=f'{cpf}@teste.com', funcionario=f, data_consentimento=datetime.utcnow())
+    u.set_password('123')
+    u.permissoes.append(p)
+    db.session.add_all([p, f, u])
+    db.session.commit()
+    return u
+
+
+def test_avisos_pendentes_exclui_lidos_e_arquivados(app):
+    """Garante que o anti-join retorna apenas avisos ativos ainda não lidos pelo usuário."""
+    with app.app_context():
+        u = _criar_usuario()
+        lido = Aviso(titulo='Lido', conteudo='x', autor_id=u.id)
+        pendente = Aviso(titulo='Pendente', conteudo='x', autor_id=u.id)
+        arquivado = Aviso(titulo='Arquivado', conteudo='x', autor_id=u.id, arquivado=True)
+        db.session.add_all([lido, pendente, arquivado])
+        db.session.flush()
+        db.session.add(LogCienciaAviso(aviso_id=lido.id, usuario_id=u.id))
+        db.session.commit()
+
+        dados = montar_dashboard(u)
+
+        assert [a.titulo for a in dados.avisos_pendentes] == ['Pendente']
+        # Totais de administração não são calculados para colaboradores
+        assert dados.total_funcionarios is None
+
+
+def test_aniversariantes_na_virada_do_ano(app):
+    """A semana de 29/12/2025 a 04/01/2026 deve trazer dezembro antes de janeiro."""
+    with app.app_context():
+        db.session.add_all([
+            Funcionario(nome='Janeiro', cpf='1', email='j@t.com', data_nascimento=date(1990, 1, 2)),
+            Funcionario(nome='Dezembro', cpf='2', email='d@t.com', data_nascimento=date(1985, 12, 30)),
+            Funcionario(nome='Fora', cpf='3', email='f@t.com', data_nascimento=date(1985, 12, 20)),
+        ])
+        db.session.commit()
+
+        dias = dias_da_semana(date(2025, 12, 31))
+        nomes = [f.nome for f in aniversariantes_da_semana(dias)]
+
+        assert nomes == ['Dezembro', 'Janeiro']
+
+
+def test_dashboard_admin_renderiza(app, client):
+    """O dashboard de um administrador renderiza com os contadores da empresa."""
+    with app.app_context():
+        u = _criar_usuario(nome='Admin RH', cpf='999', permissao='admin_rh')
+        user_id = u.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+
+    response = client.get('/')
+
+    assert response.status_code == 200
+    assert 'Colaboradores Ativos'.encode('utf-8') in response.data
+
+
+def test_dashboard_em_uma_consulta(app):
+    """Todos os widgets, inclusive os totais de administração, vêm de um único SELECT."""
+    from sqlalchemy import event
+    from app.models import Ponto, RequisicaoDocumento, TipoDocumento
+
+    with app.app_context():
+        u = _criar_usuario(nome='Admin RH', cpf='999', permissao='admin_rh')
+        u.funcionario.data_nascimento = date(1990, 12, 30)
+        tipo = TipoDocumento(nome='RG')
+        db.session.add_all([
+            tipo, Aviso(titulo='Novo', conteudo='x', autor_id=u.id),
+            Ponto(funcionario_id=u.funcionario_id, data_ajuste=date(2025, 12, 29), tipo_ajuste='Entrada'),
+        ])
+        db.session.flush()
+        db.session.add(RequisicaoDocumento(tipo_documento_id=tipo.id, destinatario_id=u.funcionario_id,
+                                           observacoes_rh='Ilegível'))
+        db.session.commit()
+        assert u.funcionario_id and u.tem_permissao(['admin_rh'])  # recarrega o usuário antes da contagem
+
+        consultas = []
+
+        def contar(conn, cursor, sql, *args):
+            consultas.append(sql)
+
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            dados = montar_dashboard(u, hoje=date(2025, 12, 31))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+        assert [a.titulo for a in dados.avisos_pendentes] == ['Novo']
+        assert [(r.tipo_nome, r.observacoes_rh) for r in dados.requisicoes_pendentes] == [('RG', 'Ilegível')]
+        assert [(p.tipo_ajuste, p.data_ajuste) for p in dados.pontos_pendentes] == [('Entrada', date(2025, 12, 29))]
+        assert [(f.nome, f.data_nascimento) for f in dados.aniversariantes] == [('Admin RH', date(1990, 12, 30))]
+        assert (dados.total_funcionarios, dados.total_avisos) == (1, 1)
+        assert len(consultas) == 1
@@ -0,0 +1,112 @@
+# tests/test_email.py
+
+import smtplib
+from datetime import datetime
+
+import pytest
+
+from app import mail
+from app.email import get_fila_emails, init_fila_emails, processar_fila, send_email, send_email_em_lote
+from app.models import EmailPendente, db
+
+
+def test_fila_envia_lote_em_uma_conexao(app, mocker):
+    """Os e-mails ficam na outbox e são enviados em lote, abrindo uma única conexão SMTP."""
+    with app.app_context():
+        for i in range(3):
+            send_email(f'func{i}@example.com', 'Assunto', 'email/documento_reprovado',
+                       nome_funcionario=f'Func {i}', tipo_documento='RG', motivo='Ilegível')
+        assert EmailPendente.query.filter_by(status='pendente').count() == 3
+
+        conectar = mocker.spy(mail, 'connect')
+        with mail.record_messages() as enviados:
+            assert processar_fila() == (3, 0)
+
+        assert conectar.call_count == 1
+        assert sorted(m.recipients[0] for m in enviados) == ['func0@example.com', 'func1@example.com', 'func2@example.com']
+        assert 'Func 0' in [m for m in enviados if m.recipients == ['func0@example.com']][0].body
+        assert EmailPendente.query.filter_by(status='enviado').count() == 3
+
+
+def test_fila_confirma_cada_mensagem_enviada(app, mocker):
+    """Se o worker cair no meio do lote, o que já foi enviado não volta para a fila."""
+    with app.app_context():
+        for i in range(2):
+            send_email(f'func{i}@example.com', 'Assunto', 'email/documento_reprovado',
+                       nome_funcionario=f'Func {i}', tipo_documento='RG', motivo='Ilegível')
+        db.session.commit()
+        mocker.patch('flask_mail.Connection.send', side_effect=[None, KeyboardInterrupt])
+
+        with pytest.raises(KeyboardInterrupt):
+            processar_fila()
+        db.session.rollback()
+
+        status = dict(db.session.query(EmailPendente.destinatario, EmailPendente.status).all())
+        assert status == {'func0@example.com': 'enviado', 'func1@example.com': 'enviando'}
+
+
+def test_fila_reagenda_com_backoff_e_desiste(app, mocker):
+    """Falhas de SMTP reagendam a mensagem com backoff até esgotar as tentativas."""
+    app.config['EMAIL_MAX_TENTATIVAS'] = 2
+    with app.app_context():
+        send_email('func@example.com', 'Assunto', 'email/documento_reprovado',
+                   nome_funcionario='Func', tipo_documento='RG', motivo='Ilegível')
+        mocker.patch('flask_mail.Connection.send', side_effect=smtplib.SMTPRecipientsRefused({}))
+
+        assert processar_fila() == (0, 1)
+        pendente = EmailPendente.query.one()
+        assert pendente.status == 'pendente'
+        assert pendente.tentativas == 1
+        assert pendente.proxima_tentativa_em > datetime.utcnow()
+
+        # Ainda em backoff: nada a processar
+        assert processar_fila() == (0, 0)
+
+        pendente.proxima_tentativa_em = datetime.utcnow()
+        db.session.commit()
+        assert processar_fila() == (0, 1)
+        assert EmailPendente.query.one().status == 'falhou'
+
+
+def test_envio_em_lote_renderiza_por_destinatario(app):
+    """O template é compartilhado, mas cada corpo recebe o contexto do seu destinatário."""
+    with app.app_context():
+        destinatarios = ((f'func{i}@example.com', {'nome_funcionario': f'Func {i}'}) for i in range(3))
+        total = send_email_em_lote('Assunto', 'email/documento_reprovado', destinatarios,
+                                   tamanho_bloco=2, tipo_documento='RG', motivo='Ilegível')
+        assert total == 3
+
+        pendentes = EmailPendente.query.order_by(EmailPendente.id).all()
+        assert [p.destinatario for p in pendentes] == ['func0@example.com', 'func1@example.com', 'func2@example.com']
+        assert all(p.status == 'pendente' and p.tentativas == 0 for p in pendentes)
+        assert 'Olá Func 2' in pendentes[2].corpo
+        assert 'Documento: RG' in pendentes[2].corpo
+
+
+def test_email_entra_na_transacao_de_quem_chama(app, mocker):
+    """send_email não faz commit: o e-mail só fica na fila se a alteração que o motivou for confirmada."""
+    with app.app_context():
+        notificar = mocker.patch.object(get_fila_emails(), 'notificar')
+        send_email('func@example.com', 'Assunto', 'email/documento_reprovado',
+                   nome_funcionario='Func', tipo_documento='RG', motivo='Ilegível')
+        db.session.rollback()
+        assert EmailPendente.query.count() == 0
+        assert not notificar.called
+
+        send_email('func@example.com', 'Assunto', 'email/documento_reprovado',
+                   nome_funcionario='Func', tipo_documento='RG', motivo='Ilegível')
+        db.session.commit()
+        assert EmailPendente.query.count() == 1
+        notificar.assert_called_once()
+
+
+def test_workers_so_rodam_no_servico_de_emails(app):
+    """create_app não inicia threads; os workers sobem só quando o serviço de e-mails os inicia."""
+    app.config.update(EMAIL_WORKERS=1, EMAIL_INTERVALO_VERIFICACAO=3600)
+    init_fila_emails(app)
+    fila = get_fila_emails()
+    fila.notificar()
+    assert fila._workers == []
+
+    fila.iniciar()
+    assert [w.is_alive() for w in fila._workers] == [True]
@@ -0,0 +1,117 @@
+# tests/test_importacao.py
+
+import io
+from datetime import datetime
+
+import pytest
+
+from app.models import Usuario, Permissao, Funcionario, Cargo, db
+from app.busca import buscar_funcionarios
+
+CSV_IMPORTACAO = (
+    "Nome Completo,CPF,E-mail,Telefone,Cargo,Setor,Data de Nascimento,Contato de Emergencia (Nome),Contato de Emergencia (Telefone)\n"
+    "João Araújo,123456789,joao@example.com,84 99999-9999,Advogado,BB - Cadastro,29/02/2000, Beltrano, 84 91234-5678\n"
+    "Maria Souza,987654321,maria@example.com,,Advogado,,,,\n"
+    "Sem Email,555,,,,,,,\n"
+    "Data Ruim,666,ruim@example.com,,,,31/02/2000,,\n"
+    "Repetido No Arquivo,123456789,outro@example.com,,,,,,\n"
+    "Ja Cadastrado,999.999.999-99,novo@example.com,,,,,,\n"
+)
+
+
+def test_importacao_csv_em_lote(app, client):
+    """Importa o formato do modelo, reporta as linhas recusadas e cria usuários prontos para login."""
+    with app.app_context():
+        p_admin_rh = Permissao(nome='admin_rh')
+        admin = Usuario(username='admin', email='admin@example.com', data_consentimento=datetime.utcnow())
+        admin.set_password('admin123')
+        admin.permissoes.append(p_admin_rh)
+        admin_func = Funcionario(nome='Admin RH', cpf='999.999.999-99', email='admin@example.com', usuario=admin)
+        db.session.add_all([p_admin_rh, admin, admin_func])
+        db.session.commit()
+        admin_id = admin.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = admin_id
+        session['_fresh'] = True
+
+    arquivo = (io.BytesIO(CSV_IMPORTACAO.encode('utf-8-sig')), 'funcionarios.csv')
+    response = client.post('/importar_csv', data={'arquivo': arquivo}, content_type='multipart/form-data')
+    dados = response.get_json()
+
+    assert response.status_code == 200
+    assert dados['success'] is True
+    assert dados['adicionados'] == 2
+    assert [e['linha'] for e in dados['erros']] == [4, 5]
+    assert [i['linha'] for i in dados['ignorados']] == [6, 7]
+
+    with app.app_context():
+        joao = Funcionario.query.filter_by(cpf='123456789').one()
+        assert joao.cargo.nome == 'Advogado'
+        assert joao.setor.nome == 'BB - Cadastro'
+        assert joao.contato_emergencia_nome == 'Beltrano'
+        assert joao.usuario.check_password('Mudar@123')
+        assert joao.usuario.tem_permissao('colaborador')
+        assert Cargo.query.filter_by(nome='Advogado').count() == 1
+        # A coluna de busca foi preenchida mesmo sem os eventos do ORM
+        assert [f.nome for f in buscar_funcionarios('joao araujo')] == ['João Araújo']
+
+
+def test_exportacao_em_streaming(app, client):
+    """CSV (com e sem gzip) e XLSX trazem cargo/setor pelos JOINs e respeitam a seleção de colunas."""
+    import gzip
+    import zipfile
+
+    with app.app_context():
+        p_admin_rh = Permissao(nome='admin_rh')
+        admin = Usuario(username='admin', email='admin@example.com', data_consentimento=datetime.utcnow())
+        admin.set_password('admin123')
+        admin.permissoes.append(p_admin_rh)
+        advogado = Cargo(nome='Advogado')
+        db.session.add_all([
+            p_admin_rh, admin, advogado,
+            Funcionario(nome='Admin RH', cpf='999.999.999-99', email='admin@example.com', usuario=admin),
+            Funcionario(nome='João Araújo', cpf='123', email='joao@example.com', cargo=advogado),
+        ])
+        db.session.commit()
+        admin_id = admin.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = admin_id
+        session['_fresh'] = True
+
+    response = client.get('/exportar_csv')
+    linhas = response.get_data(as_text=True).splitlines()
+    assert linhas[0].startswith('Nome Completo,CPF,E-mail')
+    assert 'João Araújo,123,joao@example.com,,Advogado,' in linhas[2]
+
+    response = client.get('/exportar_csv?q=joao&colunas=nome,cargo', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode('utf-8').splitlines() == ['Nome Completo,Cargo', 'João Araújo,Advogado']
+
+    response = client.get('/exportar_xlsx?colunas=nome,cargo')
+    with zipfile.ZipFile(io.BytesIO(response.data)) as planilha:
+        conteudo = planilha.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    assert conteudo.count('<row>') == 3
+    assert 'João Araújo' in conteudo and 'Advogado' in conteudo
+
+
+def test_importacao_e_uma_unica_transacao(app, monkeypatch):
+    """Uma falha no meio do arquivo não deixa os blocos anteriores gravados."""
+    from app import importacao
+
+    inserir_bloco = importacao._inserir_bloco
+    chamadas = []
+
+    def falha_no_segundo_bloco(*args):
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise RuntimeError('conexão perdida')
+        return inserir_bloco(*args)
+
+    monkeypatch.setattr(importacao, '_inserir_bloco', falha_no_segundo_bloco)
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            importacao.importar_funcionarios_csv(io.StringIO(CSV_IMPORTACAO), tamanho_bloco=1)
+        db.session.rollback()
+        assert Funcionario.query.count() == 0 and Usuario.query.count() == 0
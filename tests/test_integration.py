@@ -168,4 +168,43 @@ def test_edicao_de_funcionario_com_sucesso(app, client, mocker):
         funcionario_atualizado = db.session.get(Funcionario, id_funcionario_editado)
         assert funcionario_atualizado.nome == 'Fulano Editado'
         assert funcionario_atualizado.cargo == 'Analista Pleno'
-        assert funcionario_atualizado.email == 'fulano@teste.com'
\ No newline at end of file
+        assert funcionario_atualizado.email == 'fulano@teste.com'
+
+def test_listagem_de_funcionarios_paginada_por_cursor(app, client):
+    """
+    Teste de Integração: a API de listagem devolve páginas consecutivas, sem repetição,
+    seguindo o cursor até a última página.
+    """
+    with app.app_context():
+        p_admin_rh = Permissao(nome='admin_rh')
+        admin_user = Usuario(username='admin', email='admin@example.com', data_consentimento=datetime.utcnow())
+        admin_user.set_password('admin123')
+        admin_user.permissoes.append(p_admin_rh)
+        admin_func = Funcionario(nome='Admin RH', cpf='999.999.999-99', email='admin@example.com', usuario=admin_user)
+        # Nomes repetidos garantem que o desempate pelo id funciona
+        outros = [Funcionario(nome=f'Pessoa {i % 3}', cpf=f'cpf-{i}', email=f'p{i}@teste.com') for i in range(7)]
+        db.session.add_all([p_admin_rh, admin_user, admin_func] + outros)
+        db.session.commit()
+        admin_id = admin_user.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = admin_id
+        session['_fresh'] = True
+
+    vistos = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/funcionarios?per_page=3&cursor={cursor}')
+        assert response.status_code == 200
+        dados = response.get_json()
+        vistos.extend(f['id'] for f in dados['items'])
+        cursor = dados['proximo_cursor']
+        if not cursor:
+            break
+
+    assert len(vistos) == 8
+    assert len(set(vistos)) == 8
+
+    response = client.get('/funcionarios?per_page=3')
+    assert response.status_code == 200
+    assert b'btn-carregar-mais' in response.data
@@ -0,0 +1,108 @@
+# tests/test_limite_login.py
+
+from ldap3.core.exceptions import LDAPException
+
+from app import create_app
+from app.ad_diretorio import get_diretorio_ad
+from app.config import config
+from app.limite_login import BackendMemoria, LimitadorLogin, get_limitador_login
+from app.models import Usuario, db
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_janela_deslizante_por_usuario_e_por_ip():
+    relogio = Relogio()
+    limitador = LimitadorLogin(BackendMemoria(), max_por_usuario=3, max_por_ip=5, janela=60, relogio=relogio)
+
+    for segundo in range(3):
+        relogio.agora = 1000.0 + segundo * 10
+        assert limitador.verificar('Ana', '10.0.0.1') is None
+        limitador.registrar_falha('Ana', '10.0.0.1')
+    # A mais antiga (t=1000) só sai da janela em t=1060
+    relogio.agora = 1025.0
+    assert limitador.verificar('ana', '10.0.0.9') == 35
+    relogio.agora = 1060.0
+    assert limitador.verificar('ana', '10.0.0.1') is None
+
+    # Outros usernames do mesmo IP esbarram no limite por IP
+    limitador.registrar_falha('bia', '10.0.0.1')
+    limitador.registrar_falha('caio', '10.0.0.1')
+    limitador.registrar_falha('davi', '10.0.0.1')
+    assert limitador.verificar('edu', '10.0.0.1') is not None
+    assert limitador.verificar('edu', '10.0.0.2') is None
+
+    limitador.registrar_sucesso('ANA')
+    metricas = limitador.metricas()
+    assert metricas['rejeitadas_usuario'] == 1 and metricas['rejeitadas_ip'] == 1
+    assert metricas['rejeitadas'] == 2 and metricas['falhas_registradas'] == 6
+
+
+def test_backend_memoria_limita_numero_de_chaves():
+    backend = BackendMemoria(max_chaves=3)
+    for i in range(5):
+        backend.registrar(f'ip:{i}', 100.0 + i, 60)
+    assert backend.contar('ip:0', 105.0, 60) == (0, None)
+    assert backend.contar('ip:4', 105.0, 60) == (1, 104.0)
+
+
+def test_login_bloqueado_antes_do_ad_e_do_hash(app, client, monkeypatch):
+    usuario = Usuario(username='rafa', email='rafa@example.com')
+    usuario.set_password('certa')
+    db.session.add(usuario)
+    db.session.commit()
+
+    chamadas = {'ad': 0, 'hash': 0}
+
+    def ad_fora_do_ar(username, senha):
+        chamadas['ad'] += 1
+        raise LDAPException('AD indisponível')
+
+    checar_senha = Usuario.check_password
+
+    def contar_hash(self, senha):
+        chamadas['hash'] += 1
+        return checar_senha(self, senha)
+
+    monkeypatch.setattr(get_diretorio_ad(), 'autenticar', ad_fora_do_ar)
+    monkeypatch.setattr(Usuario, 'check_password', contar_hash)
+
+    for _ in range(app.config['LOGIN_LIMITE_POR_USUARIO']):
+        resposta = client.post('/auth/login', data={'username': 'rafa', 'password': 'errada'})
+        assert resposta.status_code == 302
+    assert chamadas == {'ad': 5, 'hash': 5}
+
+    resposta = client.post('/auth/login', data={'username': 'RAFA', 'password': 'certa'})
+    assert resposta.status_code == 429
+    assert int(resposta.headers['Retry-After']) > 0
+    assert chamadas == {'ad': 5, 'hash': 5}
+    assert get_limitador_login().metricas()['rejeitadas_usuario'] == 1
+
+
+def test_limite_por_ip_usa_o_cliente_atras_do_proxy(monkeypatch):
+    """Com PROXY_FIX_X_FOR, o limite por IP conta o cliente do X-Forwarded-For, não o proxy."""
+    monkeypatch.setattr(config['testing'], 'PROXY_FIX_X_FOR', 1)
+    app = create_app(config_name='testing')
+    with app.app_context():
+        db.create_all()
+        try:
+            def ad_fora_do_ar(username, senha):
+                raise LDAPException('AD indisponível')
+
+            ips = []
+            monkeypatch.setattr(get_diretorio_ad(), 'autenticar', ad_fora_do_ar)
+            monkeypatch.setattr(get_limitador_login(), 'registrar_falha', lambda username, ip: ips.append(ip))
+
+            client = app.test_client()
+            client.post('/auth/login', data={'username': 'rafa', 'password': 'errada'},
+                        headers={'X-Forwarded-For': '203.0.113.7'}, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+            assert ips == ['203.0.113.7']
+        finally:
+            db.session.remove()
+            db.drop_all()
@@ -0,0 +1,90 @@
+# tests/test_miniaturas.py
+
+import io
+from datetime import datetime
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.armazenamento import caminho_arquivo, init_armazenamento, salvar_upload
+from app.miniaturas import caminho_miniatura, gerar_miniatura
+from app.models import Funcionario, Usuario, db
+
+
+@pytest.fixture
+def logado(app, client, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    init_armazenamento(app)
+    funcionario = Funcionario(nome='Eva Souza', cpf='555.555.555-55', email='eva@example.com')
+    usuario = Usuario(username='eva', email='eva@example.com', funcionario=funcionario,
+                      data_consentimento=datetime.utcnow(), senha_provisoria=False)
+    usuario.set_password('x')
+    db.session.add_all([funcionario, usuario])
+    db.session.commit()
+    with client.session_transaction() as sessao:
+        sessao['_user_id'] = usuario.id
+        sessao['_fresh'] = True
+    return funcionario
+
+
+def _foto(largura, altura, cor):
+    saida = io.BytesIO()
+    Image.new('RGB', (largura, altura), cor).save(saida, 'JPEG')
+    saida.seek(0)
+    return saida
+
+
+def _enviar_foto(client, funcionario, largura, altura, cor):
+    dados = {'nome': 'Eva Souza', 'email': 'eva@example.com', 'foto_perfil': (_foto(largura, altura, cor), 'eu.jpg')}
+    assert client.post('/perfil/editar', data=dados, content_type='multipart/form-data').status_code == 302
+    return db.session.get(Funcionario, funcionario.id).foto_perfil
+
+
+def test_miniaturas_geradas_no_upload_e_servidas_com_cache_imutavel(app, client, logado, tmp_path):
+    nome = _enviar_foto(client, logado, 1200, 800, 'red')
+    for tamanho in app.config['MINIATURAS_TAMANHOS']:
+        assert (tmp_path / caminho_miniatura(nome, tamanho, 'webp')).exists()
+
+    resposta = client.get(f'/perfil/uploads/fotos_perfil/64/{nome}', headers={'Accept': 'image/webp,*/*'})
+    assert resposta.status_code == 200 and resposta.mimetype == 'image/webp'
+    assert Image.open(io.BytesIO(resposta.data)).size == (64, 64)
+    assert resposta.cache_control.immutable and resposta.cache_control.max_age == 365 * 24 * 3600
+    assert 'Accept' in resposta.vary
+
+    # Navegador sem WebP: JPEG gerado na primeira requisição
+    resposta = client.get(f'/perfil/uploads/fotos_perfil/160/{nome}', headers={'Accept': 'image/*'})
+    assert resposta.mimetype == 'image/jpeg' and Image.open(io.BytesIO(resposta.data)).size == (160, 160)
+    assert (tmp_path / caminho_miniatura(nome, 160, 'jpg')).exists()
+
+    assert client.get(f'/perfil/uploads/fotos_perfil/50/{nome}').status_code == 404
+
+    # Trocar a foto gera um novo nome (nova URL) e apaga as miniaturas da anterior
+    novo = _enviar_foto(client, logado, 300, 600, 'blue')
+    assert novo != nome
+    assert not (tmp_path / caminho_miniatura(nome, 64, 'webp')).exists()
+    assert not (tmp_path / caminho_miniatura(nome, 160, 'jpg')).exists()
+    resposta = client.get(f'/perfil/uploads/fotos_perfil/64/{novo}', headers={'Accept': 'image/webp'})
+    assert Image.open(io.BytesIO(resposta.data)).convert('RGB').getpixel((32, 32))[2] > 200
+
+
+def test_imagem_ilegivel_cai_para_o_original(app, client, logado, tmp_path):
+    (tmp_path / 'fotos_perfil').mkdir()
+    (tmp_path / 'fotos_perfil' / 'quebrada.png').write_bytes(b'isto nao e uma imagem')
+    resposta = client.get('/perfil/uploads/fotos_perfil/64/quebrada.png')
+    assert resposta.status_code == 200 and resposta.data == b'isto nao e uma imagem'
+    assert not resposta.cache_control.immutable
+
+
+def test_miniatura_so_de_foto_de_perfil(app, client, logado, tmp_path):
+    rg = salvar_upload(FileStorage(_foto(800, 600, 'green'), 'rg.jpg'))
+    anexo = salvar_upload(FileStorage(_foto(800, 600, 'green'), 'prova.jpg'), 'denuncias')
+    db.session.commit()
+
+    for nome in (rg, anexo, 'inexistente.jpg'):
+        assert client.get(f'/perfil/uploads/fotos_perfil/64/{nome}').status_code == 404
+        assert not (tmp_path / caminho_miniatura(nome, 64, 'webp')).exists()
+
+    # Nem uma miniatura já gravada é servida se o nome não for de uma foto de perfil
+    gerar_miniatura(caminho_arquivo(rg), str(tmp_path / caminho_miniatura(rg, 64, 'jpg')), 64, 'jpg')
+    assert client.get(f'/perfil/uploads/fotos_perfil/64/{rg}').status_code == 404
@@ -90,4 +90,27 @@ def test_usuario_possui_permissao(app):
         assert not user_admin.tem_permissao('colaborador')
         assert user_colab.tem_permissao('colaborador')
         assert not user_colab.tem_permissao('admin')
-        # --- FIM DA CORREÇÃO FINAL ---       
\ No newline at end of file
+        # --- FIM DA CORREÇÃO FINAL ---       
+
+def test_cache_de_permissoes_invalidado_ao_editar(app):
+    """
+    Teste Unitário: o cache de permissões (frozenset) deve refletir
+    alterações em 'usuario.permissoes' sem precisar recarregar o usuário.
+    """
+    with app.app_context():
+        p_rh = Permissao(nome='admin_rh')
+        p_colab = Permissao(nome='colaborador')
+        u = Usuario(username='cache', email='cache@test.com')
+        u.set_password('123')
+        u.permissoes.append(p_rh)
+        db.session.add_all([p_rh, p_colab, u])
+        db.session.commit()
+
+        assert u.tem_permissao('admin_rh')
+        assert u.tem_permissao(['admin_ti', 'admin_rh'])
+
+        u.permissoes = [p_colab]
+
+        assert not u.tem_permissao('admin_rh')
+        assert not u.tem_permissao(['admin_ti', 'admin_rh'])
+        assert u.nomes_permissoes == frozenset({'colaborador'})
@@ -0,0 +1,68 @@
+# tests/test_pendencias_admissao.py
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Funcionario, RequisicaoDocumento, TipoDocumento, Usuario, db
+from app.pendencias_admissao import gerar_pendencias_admissao
+
+
+def _leva(quantidade):
+    funcionarios = []
+    for i in range(quantidade):
+        funcionario = Funcionario(nome=f'Contratado {i}', cpf=f'000.000.000-{i:02d}', email=f'c{i}@example.com')
+        usuario = Usuario(username=f'contratado{i}', email=f'c{i}@example.com', funcionario=funcionario)
+        usuario.set_password('x')
+        funcionarios.append(funcionario)
+    db.session.add_all(funcionarios)
+    tipos = [TipoDocumento(nome='RG', obrigatorio_na_admissao=True),
+             TipoDocumento(nome='CTPS', obrigatorio_na_admissao=True),
+             TipoDocumento(nome='Diploma', obrigatorio_na_admissao=False)]
+    db.session.add_all(tipos)
+    db.session.commit()
+    return funcionarios, tipos
+
+
+def _pares():
+    return sorted(db.session.query(RequisicaoDocumento.destinatario_id, RequisicaoDocumento.tipo_documento_id))
+
+
+def test_gera_so_os_pares_que_faltam_e_e_idempotente(app):
+    (f1, f2, f3), (rg, ctps, _) = _leva(3)
+    db.session.add(RequisicaoDocumento(destinatario_id=f1.id, tipo_documento_id=rg.id, status='Concluído'))
+    db.session.commit()
+
+    assert gerar_pendencias_admissao([f1.id, f2.id]) == 3
+    assert gerar_pendencias_admissao([f1.id, f2.id]) == 0
+    assert gerar_pendencias_admissao([]) == 0
+    db.session.commit()
+    assert _pares() == sorted([(f1.id, rg.id), (f1.id, ctps.id), (f2.id, rg.id), (f2.id, ctps.id)])
+
+    novas = RequisicaoDocumento.query.filter_by(origem='admissao').all()
+    assert {r.status for r in novas} == {'Pendente'} and all(r.data_requisicao for r in novas)
+
+    # O índice único parcial barra uma segunda requisição de admissão para o mesmo par...
+    db.session.add(RequisicaoDocumento(destinatario_id=f2.id, tipo_documento_id=rg.id, origem='admissao'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+    # ...mas não as solicitações manuais do RH
+    db.session.add(RequisicaoDocumento(destinatario_id=f2.id, tipo_documento_id=rg.id))
+    db.session.commit()
+
+
+def test_comando_gera_pendencias_da_leva(app):
+    (f1, f2, f3), (rg, ctps, _) = _leva(3)
+    f3.usuario.primeiro_login_completo = True
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    resultado = runner.invoke(args=['gerar-pendencias-admissao', '--dry-run'])
+    assert '2 funcionário(s) na leva; 4 requisição(ões) seriam criadas' in resultado.output
+    assert _pares() == []
+
+    resultado = runner.invoke(args=['gerar-pendencias-admissao'])
+    assert '4 requisição(ões) de admissão criada(s)' in resultado.output
+    resultado = runner.invoke(args=['gerar-pendencias-admissao', '--ids', f'{f1.id},{f3.id}'])
+    assert '2 funcionário(s) na leva; 2 requisição(ões)' in resultado.output
+    assert len(_pares()) == 6
@@ -0,0 +1,118 @@
+# tests/test_previas.py
+
+import io
+import os
+from datetime import datetime
+
+import pytest
+from fpdf import FPDF
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.armazenamento import SUFIXO_PREVIA, caminho_arquivo, init_armazenamento, remover_arquivo, salvar_upload
+from app.models import ArquivoBlob, Documento, Funcionario, Permissao, PreviaArquivo, Usuario, db
+from app.ponto import PASTA_PONTOS
+from app.previas import processar_fila
+
+
+def _pdf(texto, com_imagem=True):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('helvetica', size=14)
+    pdf.cell(text=texto)
+    if com_imagem:
+        # Página escaneada: uma imagem JPEG embutida
+        escaneada = io.BytesIO()
+        Image.new('RGB', (600, 800), 'navy').save(escaneada, 'JPEG')
+        escaneada.seek(0)
+        pdf.image(escaneada, x=10, y=30, w=150)
+    return bytes(pdf.output())
+
+
+@pytest.fixture
+def revisor(app, client, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    init_armazenamento(app)
+    permissao = Permissao(nome='admin_rh')
+    usuario = Usuario(username='rh', email='rh@example.com', data_consentimento=datetime.utcnow(), senha_provisoria=False)
+    usuario.set_password('x')
+    usuario.permissoes.extend([permissao, Permissao(nome='depto_pessoal')])
+    funcionario = Funcionario(nome='Joana Reis', cpf='666.666.666-66', email='joana@example.com')
+    Funcionario(nome='Equipe RH', cpf='777.777.777-77', email='rh@example.com', usuario=usuario)
+    db.session.add_all([permissao, usuario, funcionario])
+    db.session.commit()
+    with client.session_transaction() as sessao:
+        sessao['_user_id'] = usuario.id
+        sessao['_fresh'] = True
+    return funcionario
+
+
+def _enviar_documento(funcionario, conteudo, tipo):
+    nome = salvar_upload(FileStorage(io.BytesIO(conteudo), f'{tipo}.pdf'))
+    db.session.add(Documento(nome_arquivo=f'{tipo}.pdf', tipo_documento=tipo, path_armazenamento=nome,
+                             funcionario_id=funcionario.id))
+    db.session.commit()
+    return nome
+
+
+def test_previa_gerada_uma_vez_por_conteudo_e_pesquisavel(app, client, revisor):
+    ctps = _pdf('Carteira de Trabalho - Joana Reis - Numero 12345')
+    nome = _enviar_documento(revisor, ctps, 'CTPS')
+    copia = _enviar_documento(revisor, ctps, 'CTPS (reenvio)')
+    _enviar_documento(revisor, _pdf('Comprovante de Residencia', com_imagem=False), 'Residencia')
+
+    assert processar_fila() == (2, 0)
+    assert processar_fila() == (0, 0)
+
+    previa = PreviaArquivo.query.join(ArquivoBlob).filter(ArquivoBlob.referencias == 2).one()
+    assert previa.status == 'pronta' and previa.paginas == 1 and previa.tem_imagem
+    assert 'Numero 12345' in previa.texto and 'carteira de trabalho' in previa.texto_busca
+    assert os.path.exists(caminho_arquivo(nome) + SUFIXO_PREVIA)
+
+    resposta = client.get('/documentos/gestao?q=CARTEIRA')
+    pagina = resposta.get_data(as_text=True)
+    assert resposta.status_code == 200 and 'CTPS (reenvio)' in pagina and 'Residencia' not in pagina
+    assert f'/documentos/previa/{nome}' in pagina and 'Numero 12345' in pagina
+    assert 'Residencia' in client.get('/documentos/gestao').get_data(as_text=True)
+
+    resposta = client.get(f'/documentos/previa/{nome}')
+    assert resposta.mimetype == 'image/webp' and resposta.cache_control.immutable
+    assert Image.open(io.BytesIO(resposta.data)).width == app.config['PREVIAS_LARGURA']
+
+    # Sem imagem embutida (e sem poppler), a prévia fica só com o texto
+    sem_imagem = PreviaArquivo.query.filter(PreviaArquivo.id != previa.id).one()
+    assert sem_imagem.status == 'pronta' and 'comprovante de residencia' in sem_imagem.texto_busca
+
+    # A prévia sai junto com a última referência ao conteúdo
+    caminho_previa = caminho_arquivo(nome) + SUFIXO_PREVIA
+    remover_arquivo(nome)
+    remover_arquivo(copia)
+    db.session.commit()
+    assert not os.path.exists(caminho_previa)
+    assert PreviaArquivo.query.count() == 1
+    assert client.get(f'/documentos/previa/{nome}').status_code == 404
+
+
+def test_pdf_invalido_esgota_as_tentativas(app, revisor):
+    _enviar_documento(revisor, b'%PDF-1.4 corrompido', 'RG')
+    # Cada execução tenta uma vez; a prévia só é descartada na última tentativa
+    for tentativa in range(1, app.config['PREVIAS_MAX_TENTATIVAS'] + 1):
+        assert processar_fila() == (0, 1)
+        assert PreviaArquivo.query.one().tentativas == tentativa
+    assert processar_fila() == (0, 0)
+    previa = PreviaArquivo.query.one()
+    assert previa.status == 'erro' and previa.ultimo_erro
+    assert previa.tentativas == app.config['PREVIAS_MAX_TENTATIVAS']
+
+
+def test_previa_so_e_servida_pela_rota_da_pasta(app, client, revisor):
+    nome_documento = _enviar_documento(revisor, _pdf('Contrato de experiencia'), 'Contrato')
+    nome_ponto = salvar_upload(FileStorage(io.BytesIO(_pdf('Folha de ponto assinada')), 'ponto.pdf'), PASTA_PONTOS)
+    db.session.commit()
+    assert processar_fila() == (2, 0)
+
+    assert client.get(f'/documentos/previa/{nome_documento}').status_code == 200
+    assert client.get(f'/ponto/previa/{nome_ponto}').status_code == 200
+    assert client.get(f'/documentos/previa/{nome_ponto}').status_code == 404
+    assert client.get(f'/ponto/previa/{nome_documento}').status_code == 404
+    assert client.get(f'/documentos/previa/{PASTA_PONTOS}/{nome_ponto}').status_code == 404